@@ -2,16 +2,19 @@
 
 # --- BLOQUE 1: IMPORTACIONES Y CONFIGURACIÓN ---
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import io
+import numpy as np
 import base64
-from pypfopt import expected_returns, risk_models, EfficientFrontier
 
-import fundamental_analysis
-import portfolio_optimization
-import strategy_analysis
-import technical_analysis
+import price_store
+import optimization
+import ticker_metadata
+import export
+import session_prices
+import profiling
+import prefetch
+import shared_cache
+# Las páginas (y sus dependencias pesadas: pypfopt, bt, matplotlib, plotly) se importan al seleccionarlas en el BLOQUE 4.
 
 st.set_page_config(page_title="Analytix Pro", layout="wide", initial_sidebar_state="expanded")
 
@@ -22,7 +25,7 @@ if 'analysis_started' not in st.session_state:
     st.session_state.analysis_started = False
 
 # --- BLOQUE 2: BARRA LATERAL (SIDEBAR) ---
-@st.cache_data
+@st.cache_resource
 def get_img_as_base64(file):
     with open(file, "rb") as f: data = f.read()
     return base64.b64encode(data).decode()
@@ -62,22 +65,68 @@ intervalo = "1d" if frecuencia == 'Diario' else "1mo"
 st.sidebar.subheader("Parámetros de Optimización y Backtesting")
 risk_free_rate = st.sidebar.number_input("Tasa Libre de Riesgo Anual (%)", value=2.0, step=0.1)
 risk_free_rate_decimal = risk_free_rate / 100.0
+modelo_covarianza = st.sidebar.selectbox("Modelo de Covarianza", list(optimization.METODOS_COVARIANZA), format_func=optimization.METODOS_COVARIANZA.get, help="Para universos de cientos de activos, el modelo factorial mantiene la optimización tratable.")
+motor_backtesting = st.sidebar.selectbox("Motor de Backtesting", ("Vectorizado (NumPy)", "bt (basado en eventos)"), help="El motor vectorizado reproduce las métricas de bt con rebalanceo mensual en una fracción del tiempo.")
+motor_backtesting = 'bt' if motor_backtesting.startswith('bt') else 'vectorizado'
+walk_forward_activo = st.sidebar.checkbox("Validación Walk-Forward (fuera de muestra)", value=False, help="Re-optimiza el portafolio cada mes con una ventana móvil y evalúa el mes siguiente con datos no vistos.")
 
 st.sidebar.write("**Seleccione una Opción:**")
 tipo_analisis = st.sidebar.radio("Tipo de Análisis", 
-    ("Análisis Fundamental", "Optimización de Portafolio (Markowitz)", "Análisis y Backtesting de Estrategia", "Análisis Técnico (Post-Optimización)", "Descargar Precios"), 
+    ("Análisis Fundamental", "Screener Fundamental", "Optimización de Portafolio (Markowitz)", "Sensibilidad de la Optimización", "Análisis y Backtesting de Estrategia", "Análisis Técnico (Post-Optimización)", "Descargar Precios"), 
     label_visibility="collapsed")
 
 if tipo_analisis == "Análisis Fundamental": st.sidebar.caption("Evalúa la salud financiera y el valor intrínseco de las empresas para responder: **¿Qué comprar?**")
+elif tipo_analisis == "Screener Fundamental": st.sidebar.caption("Recorre un universo completo de empresas y las ordena por sus ratios fundamentales para responder: **¿Dónde buscar?**")
 elif tipo_analisis == "Optimización de Portafolio (Markowitz)": st.sidebar.caption("Calcula la combinación ideal de activos para maximizar el retorno ajustado al riesgo y responder: **¿Cuánto comprar?**")
+elif tipo_analisis == "Sensibilidad de la Optimización": st.sidebar.caption("Repite la optimización sobre una rejilla de tasas, ventanas y modelos de covarianza para responder: **¿Cuánto depende el portafolio de los supuestos?**")
 elif tipo_analisis == "Análisis y Backtesting de Estrategia": st.sidebar.caption("Analiza la composición de tu portafolio y simula su rendimiento histórico para responder: **¿Por qué funciona esta estrategia?**")
 elif tipo_analisis == "Análisis Técnico (Post-Optimización)": st.sidebar.caption("Analiza el momento del mercado para los activos de tu portafolio para responder: **¿Cuándo comprar?**")
 
+archivo_universo = None
+if tipo_analisis == "Screener Fundamental":
+    archivo_universo = st.sidebar.file_uploader("Universo de Tickers (CSV o TXT)", type=["csv", "txt"], help="Una lista de tickers o un CSV con una columna 'Ticker'. Si no se carga un archivo, se usan los tickers ingresados arriba.")
+
+tasas_sensibilidad, ventanas_sensibilidad, metodos_sensibilidad = [], [], []
+if tipo_analisis == "Sensibilidad de la Optimización":
+    import sensitivity
+    rango_tasas = st.sidebar.slider("Rango de Tasa Libre de Riesgo (%)", 0.0, 10.0, (0.0, 4.5), step=0.25)
+    puntos_tasa = st.sidebar.number_input("Puntos de Tasa", min_value=1, max_value=25, value=10)
+    tasas_sensibilidad = [t / 100.0 for t in np.linspace(rango_tasas[0], rango_tasas[1], int(puntos_tasa))]
+    ventanas_sensibilidad = st.sidebar.multiselect("Ventanas de Estimación (años)", sensitivity.VENTANAS_ANIOS, default=sensitivity.ventanas_disponibles(periodo), help="Cada ventana usa las últimas barras del período descargado.")
+    metodos_sensibilidad = st.sidebar.multiselect("Modelos de Covarianza", list(optimization.METODOS_COVARIANZA), default=[modelo_covarianza], format_func=optimization.METODOS_COVARIANZA.get)
+
+formato_exportacion, ohlcv_completo = 'xlsx', False
+if tipo_analisis == "Descargar Precios":
+    formato_exportacion = st.sidebar.selectbox("Formato de Descarga", list(export.FORMATOS), format_func=lambda f: export.FORMATOS[f]['nombre'], help="CSV y Parquet no tienen límite de filas y se generan por bloques; Parquet es el más compacto.")
+    ohlcv_completo = st.sidebar.checkbox("Incluir OHLCV completo", value=False, help="Exporta Open, High, Low, Close y Volume en formato largo (una fila por ticker y fecha) en lugar de solo los cierres.")
+
 st.sidebar.markdown('<div class="cta-container">', unsafe_allow_html=True)
 run_button = st.sidebar.button("🚀 Ejecutar Análisis")
 st.sidebar.markdown('</div>', unsafe_allow_html=True)
 
+# Precarga: con la configuración ya elegida, los tickers se validan y los precios se descargan en segundo plano
+# mientras el usuario termina de configurar; cada cambio cancela la precarga anterior de la sesión.
+tickers_precarga = [t.strip().upper() for t in tickers_input.split(",") if t.strip()]
+precarga_precios = tipo_analisis in ("Optimización de Portafolio (Markowitz)", "Sensibilidad de la Optimización", "Descargar Precios")
+if tipo_analisis != "Screener Fundamental" and not run_button:
+    prefetch.programar(tickers_precarga, periodo, intervalo, precarga_precios)
+    estado_precarga = prefetch.estado()
+    if estado_precarga in ('pendiente', 'validando', 'descargando'): st.sidebar.caption("⏳ Precargando datos en segundo plano...")
+    elif estado_precarga == 'listo': st.sidebar.caption("✅ Datos precargados.")
+
 st.sidebar.markdown("---")
+with st.sidebar.expander("🧠 Memoria de Sesiones"):
+    memoria = session_prices.reporte_memoria()
+    st.caption(f"Precios compartidos: {memoria['mb_total']:.1f} MB de {memoria['mb_presupuesto']:.0f} MB · {memoria['sesiones_activas']} sesiones activas")
+    if not memoria['entradas'].empty: st.dataframe(memoria['entradas'].style.format({'MB': "{:.2f}"}), hide_index=True)
+    cache = shared_cache.estadisticas()
+    if not cache.empty:
+        st.caption(f"Caché de peticiones compartida: {cache['MB'].sum():.1f} MB de {shared_cache.MEMORIA_MAXIMA / 1024 ** 2:.0f} MB")
+        st.dataframe(cache.style.format({'MB': "{:.2f}", 'Tasa de Acierto': "{:.0%}"}), hide_index=True)
+with st.sidebar.expander("🛠️ Perfilado de Ejecución"):
+    perfilado_activo = st.checkbox("Medir cada etapa", value=False, help="Registra tiempo, red vs. cálculo y filas de cada etapa de la próxima ejecución.")
+    medir_memoria = st.checkbox("Incluir pico de memoria (tracemalloc)", value=False, disabled=not perfilado_activo, help="Pico de memoria de todo el proceso (compartido con otras sesiones); ralentiza la ejecución.")
+    panel_perfilado = st.container()
 st.sidebar.info("© 2025 Analytix Pro. Todos los derechos reservados.")
 
 # --- BLOQUE 3: ÁREA PRINCIPAL ---
@@ -95,72 +144,102 @@ if not st.session_state.analysis_started:
     st.markdown("---")
 
 # --- BLOQUE 4: LÓGICA DE EJECUCIÓN ---
-if run_button:
+# Con ANALYTIX_TRACE_DIR definido se perfila siempre y cada traza se guarda en disco.
+ejecuta_analisis = run_button or (tipo_analisis == "Screener Fundamental" and st.session_state.get('screener_matriz') is not None)
+traza = profiling.iniciar(tipo_analisis, memoria=perfilado_activo and medir_memoria, activa=ejecuta_analisis and (perfilado_activo or bool(profiling.TRACE_DIR)))
+if run_button and tipo_analisis == "Screener Fundamental":
+    st.session_state.analysis_started = True
+    import screener
+    universo = screener.cargar_universo(archivo_universo) if archivo_universo is not None else [t.strip().upper() for t in tickers_input.split(",") if t.strip()]
+    screener.display_page(universo)
+elif tipo_analisis == "Screener Fundamental" and st.session_state.get('screener_matriz') is not None:
+    # Los filtros y la paginación vuelven a ejecutar el script: se reutiliza la matriz guardada en la sesión.
+    import screener
+    screener.display_page()
+elif run_button:
     st.session_state.analysis_started = True
     tickers_original = [ticker.strip().upper() for ticker in tickers_input.split(",")]
-    valid_tickers, invalid_tickers, ticker_names = [], [], {}
-    with st.spinner(f"Validando tickers..."):
-        for ticker in tickers_original:
-            if not ticker: continue
-            try:
-                info = yf.Ticker(ticker).info
-                if info.get('longName') is None and yf.Ticker(ticker).history(period="1d").empty: raise ValueError("Inválido")
-                valid_tickers.append(ticker)
-                ticker_names[ticker] = info.get('longName', ticker)
-            except Exception:
-                invalid_tickers.append(ticker)
+    with profiling.etapa("Espera de la precarga"): prefetch.esperar(tickers_original, periodo, intervalo, precarga_precios)
+    with st.spinner(f"Validando tickers..."), profiling.etapa("Validación de tickers", filas=len(tickers_original)):
+        metadata = ticker_metadata.fetch_metadata(tickers_original)
+    valid_tickers, invalid_tickers, ticker_names = metadata['valid_tickers'], metadata['invalid_tickers'], metadata['ticker_names']
     if invalid_tickers: st.warning(f"Tickers no encontrados o sin datos: {', '.join(invalid_tickers)}")
     if not valid_tickers:
         st.error("No hay tickers válidos para analizar.")
     else:
         st.success(f"Tickers válidos encontrados: {', '.join(valid_tickers)}")
         if tipo_analisis == "Análisis Fundamental":
-            fundamental_analysis.display_page(valid_tickers)
+            import fundamental_analysis
+            fundamental_analysis.display_page(valid_tickers, metadata['info'])
         elif tipo_analisis == "Optimización de Portafolio (Markowitz)":
+            with profiling.etapa("Importación de módulos (pypfopt, plotly)"): import portfolio_optimization
             with st.spinner("Descargando datos y optimizando portafolio..."):
-                all_prices = yf.download(valid_tickers, period=periodo, interval=intervalo, progress=False)
+                all_prices = price_store.get_prices(valid_tickers, periodo, intervalo)
                 if not all_prices.empty and 'Close' in all_prices.columns:
                     close_prices = all_prices['Close'].dropna()
-                    mu = expected_returns.ema_historical_return(close_prices)
-                    S = risk_models.risk_matrix(close_prices, method='ledoit_wolf')
-                    ef = EfficientFrontier(mu, S)
-                    weights = ef.max_sharpe(risk_free_rate=risk_free_rate_decimal)
-                    cleaned_weights = ef.clean_weights()
-                    st.session_state.optimization_results = {
-                        'all_prices': all_prices, 'ticker_names': ticker_names, 'valid_tickers': valid_tickers,
-                        'weights': cleaned_weights, 'periodo': periodo, 'intervalo': intervalo, 
-                        'risk_free_rate_decimal': risk_free_rate_decimal
-                    }
-                    portfolio_optimization.display_page(close_prices, valid_tickers, frecuencia, risk_free_rate_decimal, ticker_names)
+                    try:
+                        resultado = optimization.optimize_portfolio(close_prices, valid_tickers, periodo, intervalo, risk_free_rate_decimal, modelo_covarianza)
+                    except Exception as e:
+                        # El error se muestra una sola vez: la página no vuelve a intentar la optimización (ni con otro modelo).
+                        resultado = None
+                        st.error("🔴 **Error en el cálculo de la optimización.**")
+                        st.warning(str(e))
+                    if resultado is not None:
+                        st.session_state.optimization_results = {
+                            'precios': session_prices.guardar(all_prices['Close'], valid_tickers, periodo, intervalo), 'ticker_names': ticker_names, 'valid_tickers': valid_tickers, 'sectors': metadata['sectors'],
+                            'weights': resultado['weights'], 'periodo': periodo, 'intervalo': intervalo, 
+                            'risk_free_rate_decimal': risk_free_rate_decimal, 'metodo_covarianza': modelo_covarianza, 'optimization_key': resultado['clave']
+                        }
+                        portfolio_optimization.display_page(close_prices, valid_tickers, frecuencia, risk_free_rate_decimal, ticker_names, resultado)
                 else: st.error("No se pudieron descargar datos de precios.")
+        elif tipo_analisis == "Sensibilidad de la Optimización":
+            if not ventanas_sensibilidad or not metodos_sensibilidad:
+                st.error("Seleccione al menos una ventana de estimación y un modelo de covarianza.")
+            else:
+                with st.spinner("Descargando datos de precios..."):
+                    all_prices = price_store.get_prices(valid_tickers, periodo, intervalo)
+                if all_prices.empty or 'Close' not in all_prices.columns:
+                    st.error("No se pudieron descargar datos de precios.")
+                else:
+                    try:
+                        sensitivity.display_page(all_prices['Close'].dropna(), tasas_sensibilidad, ventanas_sensibilidad, metodos_sensibilidad, intervalo, risk_free_rate_decimal, ticker_names)
+                    except ValueError as e:
+                        st.error(str(e))
         elif tipo_analisis == "Análisis y Backtesting de Estrategia":
             if st.session_state.optimization_results and st.session_state.optimization_results.get('weights'):
                 st.info("Mostrando análisis y backtesting para el último portafolio optimizado.")
-                strategy_analysis.display_page(st.session_state.optimization_results)
+                with profiling.etapa("Importación de módulos (backtesting)"): import strategy_analysis
+                strategy_analysis.display_page(st.session_state.optimization_results, motor_backtesting, walk_forward_activo)
             else:
                 st.error("Por favor, primero ejecute una 'Optimización de Portafolio' para poder realizar este análisis.")
         elif tipo_analisis == "Análisis Técnico (Post-Optimización)":
             if st.session_state.optimization_results and st.session_state.optimization_results.get('weights'):
                 st.info("Mostrando análisis técnico para el último portafolio optimizado.")
+                import technical_analysis
                 opt_data = st.session_state.optimization_results
                 pesos_df = pd.DataFrame.from_dict(opt_data['weights'], orient='index', columns=['Peso'])
-                technical_analysis.display_page(pesos_df, opt_data['all_prices']['Close'], opt_data['ticker_names'])
+                technical_analysis.display_page(pesos_df, session_prices.obtener(opt_data['precios']), opt_data['ticker_names'], opt_data['intervalo'], opt_data['precios']['periodo'])
             else: st.error("Primero ejecute una 'Optimización de Portafolio'.")
         elif tipo_analisis == "Descargar Precios":
             st.header(f"Precios Históricos de Cierre")
             with st.spinner("Descargando datos de precios..."):
-                data = yf.download(valid_tickers, period=periodo, interval=intervalo, progress=False)
+                data = price_store.get_prices(valid_tickers, periodo, intervalo)
             if data.empty or 'Close' not in data.columns:
                 st.error("No se pudieron descargar los datos de precios.")
             else:
-                precios_df = data['Close'].copy()
-                if len(valid_tickers) == 1: precios_df = precios_df.to_frame(name=valid_tickers[0])
-                st.dataframe(precios_df)
-                output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    precios_df.reset_index().to_excel(writer, index=False, sheet_name='Precios_Historicos')
-                st.download_button(
-                    label="📥 Descargar Precios como Excel", data=output.getvalue(),
-                    file_name=f"precios_{'_'.join(valid_tickers)}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
\ No newline at end of file
+                precios_df = data['Close']
+                if isinstance(precios_df, pd.Series): precios_df = precios_df.to_frame(name=valid_tickers[0])
+                # Solo se envía una vista previa al navegador; el archivo completo se genera por bloques al pulsar el botón.
+                st.caption(f"{len(precios_df):,} fechas x {precios_df.shape[1]:,} tickers. Vista previa de las últimas {min(len(precios_df), 500):,} fechas.")
+                st.dataframe(precios_df.tail(500))
+                nombre_base = f"precios_{'_'.join(valid_tickers[:10])}" + ("_ohlcv" if ohlcv_completo else "")
+                if ohlcv_completo and formato_exportacion == 'xlsx' and int(data['Close'].notna().to_numpy().sum()) >= export.MAX_FILAS_EXCEL:
+                    st.warning("El OHLCV completo supera el límite de filas de Excel. Elija CSV o Parquet.")
+                elif ohlcv_completo:
+                    export.boton_descarga(f"📥 Descargar OHLCV como {export.FORMATOS[formato_exportacion]['nombre']}", lambda: export.bloques_ohlcv(data), formato_exportacion, nombre_base, hoja='Precios_OHLCV')
+                else:
+                    export.boton_descarga(f"📥 Descargar Precios como {export.FORMATOS[formato_exportacion]['nombre']}", lambda: export.bloques_filas(precios_df), formato_exportacion, nombre_base, hoja='Precios_Historicos')
+
+if traza is not None: st.session_state.ultima_traza = profiling.finalizar(traza)
+if perfilado_activo and st.session_state.get('ultima_traza') is not None:
+    with panel_perfilado: profiling.display_panel(st.session_state.ultima_traza)
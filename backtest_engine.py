@@ -0,0 +1,111 @@
+# backtest_engine.py (Motor de Backtesting Vectorizado con NumPy)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import numpy as np
+import pandas as pd
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+# Períodos de rebalanceo por calendario: se rebalancea en la primera fecha de cada período nuevo, como bt.algos.RunMonthly.
+PERIODOS_REBALANCEO = {'monthly': 'M', 'quarterly': 'Q', 'yearly': 'Y'}
+NOMBRES_ESTRATEGIA = {'monthly': 'RebalanceoMensual', 'quarterly': 'RebalanceoTrimestral', 'yearly': 'RebalanceoAnual', 'threshold': 'RebalanceoPorUmbral'}
+UMBRAL_DERIVA = 0.05
+
+# --- SECCIÓN 2: FECHAS DE REBALANCEO ---
+def _indices_calendario(index, frecuencia):
+    periodos = index.to_period(PERIODOS_REBALANCEO[frecuencia]).asi8
+    return np.flatnonzero(np.r_[True, periodos[1:] != periodos[:-1]])
+
+def _indices_umbral(precios, pesos, umbral):
+    # Rebalancea cuando algún peso se desvía más de `umbral` del objetivo; cada salto se busca de forma vectorizada.
+    anclas, ancla, efectivo = [0], 0, 1.0 - pesos.sum()
+    while ancla < len(precios) - 1:
+        relativo = precios[ancla + 1:] / precios[ancla]
+        valor = relativo @ pesos + efectivo
+        deriva = np.abs(relativo * pesos / valor[:, None] - pesos).max(axis=1)
+        excedidos = np.flatnonzero(deriva > umbral)
+        if not len(excedidos): break
+        ancla = ancla + 1 + excedidos[0]; anclas.append(ancla)
+    return np.asarray(anclas)
+
+# --- SECCIÓN 3: NÚCLEO VECTORIZADO ---
+def _curva_capital(precios, pesos, anclas, capital_inicial):
+    # Entre dos rebalanceos el valor es V_ancla * (sum_i w_i * P_t,i / P_ancla,i + efectivo).
+    # Los factores de cada segmento se encadenan con un producto acumulado: sin bucles sobre fechas.
+    efectivo = 1.0 - pesos.sum(axis=-1)
+    segmento = np.searchsorted(anclas, np.arange(len(precios)), side='right') - 1
+    crecimiento = (precios / precios[anclas[segmento]]) @ pesos.T + efectivo
+    factores = (precios[anclas[1:]] / precios[anclas[:-1]]) @ pesos.T + efectivo
+    valor_anclas = capital_inicial * np.cumprod(np.vstack([np.ones((1,) + factores.shape[1:]), factores]), axis=0)
+    return valor_anclas[segmento] * crecimiento
+
+def _preparar(close_prices, weights):
+    close_prices = close_prices.dropna()
+    if isinstance(weights, pd.DataFrame): matriz = weights.reindex(columns=close_prices.columns).fillna(0.0)
+    else: matriz = pd.DataFrame([pd.Series(weights, dtype=float)]).reindex(columns=close_prices.columns).fillna(0.0)
+    return close_prices, matriz
+
+# --- SECCIÓN 4: ESTADÍSTICAS (MISMAS DEFINICIONES QUE ffn/bt) ---
+def calcular_estadisticas(equity):
+    diarios = equity.resample('D').last().dropna(how='all')
+    mensuales = equity.resample('ME').last().pct_change(fill_method=None)
+    vol_mensual = mensuales.std(ddof=1)
+    stats = pd.DataFrame({
+        'total_return': equity.iloc[-1] / equity.iloc[0] - 1,
+        'cagr': (diarios.iloc[-1] / diarios.iloc[0]) ** (1 / ((diarios.index[-1] - diarios.index[0]).days / 365.0)) - 1,
+        'max_drawdown': (diarios / diarios.cummax() - 1).min(),
+        'monthly_mean': mensuales.mean() * 12,
+        'monthly_vol': vol_mensual * np.sqrt(12),
+        'monthly_sharpe': mensuales.mean() / vol_mensual * np.sqrt(12),
+    }).T
+    stats.columns.name = None
+    return stats
+
+# --- SECCIÓN 5: API PÚBLICA ---
+def run_backtest(close_prices, weights, frecuencia='monthly', umbral=UMBRAL_DERIVA, initial_capital=10000.0):
+    # `weights` puede ser un dict (una estrategia) o un DataFrame con una fila de pesos por estrategia (lote).
+    # Devuelve {'equity', 'stats'}: la curva incluye el día previo al inicio con el capital inicial, igual que bt.
+    close_prices, matriz = _preparar(close_prices, weights)
+    precios = close_prices.to_numpy(dtype=float)
+    if isinstance(weights, pd.DataFrame): nombres = list(matriz.index)
+    else: nombres = [NOMBRES_ESTRATEGIA.get(frecuencia, frecuencia)]
+    if frecuencia == 'threshold':
+        curvas = [_curva_capital(precios, fila[None, :], _indices_umbral(precios, fila, umbral), initial_capital)[:, 0] for fila in matriz.to_numpy()]
+        valores = np.column_stack(curvas)
+    else:
+        valores = _curva_capital(precios, matriz.to_numpy(), _indices_calendario(close_prices.index, frecuencia), initial_capital)
+    inicio = pd.DatetimeIndex([close_prices.index[0] - pd.Timedelta(days=1)])
+    equity = pd.DataFrame(np.vstack([np.full((1, len(nombres)), initial_capital), valores]), index=inicio.append(close_prices.index), columns=nombres)
+    return {'equity': equity, 'stats': calcular_estadisticas(equity)}
+
+def run_backtest_dinamico(close_prices, pesos_rebalanceo, initial_capital=10000.0, nombre='WalkForward'):
+    # Rebalanceo en las fechas del índice de `pesos_rebalanceo` (una fila de pesos por fecha), p. ej. walk-forward.
+    # Mismo encadenamiento por segmentos que run_backtest, con un vector de pesos distinto en cada segmento.
+    close_prices = close_prices.dropna()
+    pesos_rebalanceo = pesos_rebalanceo.reindex(columns=close_prices.columns).fillna(0.0)
+    pesos_rebalanceo = pesos_rebalanceo[(pesos_rebalanceo.index >= close_prices.index[0]) & (pesos_rebalanceo.index <= close_prices.index[-1])]
+    close_prices = close_prices[close_prices.index >= pesos_rebalanceo.index[0]]
+    precios = close_prices.to_numpy(dtype=float)
+    posiciones = close_prices.index.searchsorted(pesos_rebalanceo.index)
+    anclas, ultimas = np.unique(posiciones[::-1], return_index=True)  # si dos fechas caen en la misma barra, manda la última
+    W = pesos_rebalanceo.to_numpy()[len(posiciones) - 1 - ultimas]
+    efectivo = 1.0 - W.sum(axis=1)
+    segmento = np.searchsorted(anclas, np.arange(len(precios)), side='right') - 1
+    crecimiento = np.einsum('ij,ij->i', precios / precios[anclas[segmento]], W[segmento]) + efectivo[segmento]
+    factores = np.einsum('ij,ij->i', precios[anclas[1:]] / precios[anclas[:-1]], W[:-1]) + efectivo[:-1]
+    valores = (initial_capital * np.cumprod(np.r_[1.0, factores]))[segmento] * crecimiento
+    inicio = pd.DatetimeIndex([close_prices.index[0] - pd.Timedelta(days=1)])
+    equity = pd.DataFrame({nombre: np.r_[initial_capital, valores]}, index=inicio.append(close_prices.index))
+    return {'equity': equity, 'stats': calcular_estadisticas(equity)}
+
+def validar_contra_bt(close_prices, weights, frecuencia='monthly', initial_capital=10000.0):
+    # Ejecuta la misma estrategia en bt (posiciones fraccionarias) y devuelve ambas estadísticas y su diferencia.
+    import bt
+    algo = {'monthly': bt.algos.RunMonthly, 'quarterly': bt.algos.RunQuarterly, 'yearly': bt.algos.RunYearly}[frecuencia]
+    close_prices, matriz = _preparar(close_prices, weights)
+    pesos = {t: w for t, w in matriz.iloc[0].items() if w != 0}
+    strategy = bt.Strategy(NOMBRES_ESTRATEGIA[frecuencia], [algo(), bt.algos.SelectAll(), bt.algos.WeighSpecified(**pesos), bt.algos.Rebalance()])
+    resultados = bt.run(bt.Backtest(strategy, close_prices, initial_capital=initial_capital, integer_positions=False))
+    filas = ['total_return', 'monthly_vol', 'max_drawdown', 'monthly_sharpe']
+    stats_bt = resultados.stats.loc[filas].iloc[:, 0].astype(float)
+    stats_np = run_backtest(close_prices, pesos, frecuencia, initial_capital=initial_capital)['stats'].loc[filas].iloc[:, 0]
+    return pd.DataFrame({'bt': stats_bt, 'vectorizado': stats_np, 'diferencia': stats_np - stats_bt})
@@ -0,0 +1,208 @@
+# batch_runner.py (Ejecución por Lotes sin Interfaz: Optimización, Backtesting, Riesgo y Análisis Técnico por Cartera)
+#
+# Uso: python batch_runner.py carteras.json --salida resultados/ [--workers 8] [--periodo 5y] [--intervalo 1d]
+#      [--tasa-libre 0.02] [--covarianza ledoit_wolf] [--rebalanceo monthly] [--sin-equity]
+# El archivo de carteras puede ser JSON (lista de objetos o {"carteras": [...]}), JSON Lines o CSV. Cada cartera
+# necesita 'tickers' (lista, o texto separado por comas, punto y coma o espacios) y puede fijar 'id', 'periodo',
+# 'intervalo', 'risk_free_rate', 'metodo_covarianza' y 'rebalanceo'; lo que falte se toma de la línea de comandos.
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+import price_store
+import optimization
+import backtest_engine
+import risk_analytics
+import indicators
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+DEFECTOS = {'periodo': '5y', 'intervalo': '1d', 'risk_free_rate': 0.02, 'metodo_covarianza': 'ledoit_wolf', 'rebalanceo': 'monthly'}
+CAMPOS_RIESGO = ['Volatilidad Anual', 'Sharpe Anual', 'VaR 95% Hist.', 'CVaR 95% Hist.', 'VaR 99% Hist.', 'CVaR 99% Hist.',
+                 'Max. Drawdown', 'Duración Máx. DD (barras)', 'Drawdown Actual']
+
+# --- SECCIÓN 2: CARTERAS DE ENTRADA ---
+def _lista_tickers(valor):
+    if isinstance(valor, str): valor = re.split(r"[,;|\s]+", valor)
+    return list(dict.fromkeys(str(t).strip().upper() for t in valor if str(t).strip()))
+
+def cargar_carteras(ruta, **defectos):
+    # Devuelve una lista de carteras normalizadas: id único, tickers en mayúsculas sin duplicados y todos los parámetros.
+    defectos = {**DEFECTOS, **{k: v for k, v in defectos.items() if v is not None}}
+    if ruta.lower().endswith(".csv"):
+        filas = pd.read_csv(ruta, dtype=str).to_dict('records')
+    elif ruta.lower().endswith((".jsonl", ".ndjson")):
+        with open(ruta, "r", encoding="utf-8") as f: filas = [json.loads(linea) for linea in f if linea.strip()]
+    else:
+        with open(ruta, "r", encoding="utf-8") as f: filas = json.load(f)
+        if isinstance(filas, dict): filas = filas['carteras']
+    carteras, vistos = [], set()
+    for i, fila in enumerate(filas):
+        fila = {k: v for k, v in fila.items() if not (isinstance(v, float) and np.isnan(v))}
+        cartera = {**defectos, **{k: fila[k] for k in DEFECTOS if k in fila}}
+        cartera['risk_free_rate'] = float(cartera['risk_free_rate'])
+        cartera['id'] = str(fila.get('id', f"cartera_{i + 1:04d}"))
+        cartera['tickers'] = _lista_tickers(fila.get('tickers', []))
+        if cartera['id'] in vistos: raise ValueError(f"Identificador de cartera repetido: {cartera['id']}")
+        vistos.add(cartera['id']); carteras.append(cartera)
+    return carteras
+
+# --- SECCIÓN 3: PRECIOS COMPARTIDOS ---
+def precios_compartidos(carteras):
+    # Una sola descarga por (período, intervalo) con la unión de los tickers de todas las carteras; los trabajos solo
+    # seleccionan sus columnas de ese panel de cierres.
+    universos = {}
+    for cartera in carteras: universos.setdefault((cartera['periodo'], cartera['intervalo']), {}).update(dict.fromkeys(cartera['tickers']))
+    paneles = {}
+    for (periodo, intervalo), tickers in universos.items():
+        datos = price_store.get_prices(list(tickers), periodo, intervalo)
+        paneles[(periodo, intervalo)] = datos['Close'] if not datos.empty and 'Close' in datos.columns else pd.DataFrame()
+    return paneles
+
+# --- SECCIÓN 4: CÁLCULO DE UNA CARTERA (SIN STREAMLIT) ---
+def _resumen_tecnico(precios, pesos):
+    # Mismo veredicto que la página de Análisis Técnico, para los activos con peso.
+    from technical_analysis import interpretar_indicadores
+    activos = [t for t, w in pesos.items() if w > 0 and t in precios.columns]
+    if not activos: return []
+    precios = precios[activos].dropna(how='all')
+    ultimos = indicators.latest_values(indicators.compute_indicator_panel(precios, rsi_length=14, sma_lengths=(50, 200)), precios)
+    filas = []
+    for ticker in activos:
+        rsi, sma_50, sma_200, cierre = ultimos.loc[ticker, ['RSI_14', 'SMA_50', 'SMA_200', 'Close']]
+        resumen, veredicto = interpretar_indicadores(rsi, sma_50, sma_200, cierre)
+        filas.append({'Ticker': ticker, 'Close': cierre, 'RSI_14': rsi, 'SMA_50': sma_50, 'SMA_200': sma_200,
+                      'Resumen': resumen.replace("**", ""), 'Veredicto': veredicto.replace("**", "")})
+    return filas
+
+def ejecutar_cartera(cartera, panel, incluir_equity=True):
+    # Optimización de Markowitz -> backtest vectorizado -> analítica de riesgo -> análisis técnico, como en app.py.
+    # Los errores de una cartera se devuelven en el resultado y no detienen el lote.
+    inicio = time.perf_counter()
+    resultado = {'id': cartera['id'], 'estado': 'ok', 'error': None, 'parametros': {k: cartera[k] for k in DEFECTOS}}
+    try:
+        validos = [t for t in cartera['tickers'] if t in panel.columns and panel[t].notna().any()]
+        resultado['tickers_validos'], resultado['tickers_sin_datos'] = validos, [t for t in cartera['tickers'] if t not in validos]
+        if not validos: raise ValueError("No hay tickers válidos para analizar.")
+        precios = panel[validos].dropna(how='all')
+        close_prices = precios.dropna()
+        opt = optimization.calcular_optimizacion(close_prices, cartera['risk_free_rate'], cartera['metodo_covarianza'])
+        resultado.update({'pesos': opt['weights'], 'rendimiento': opt['rendimiento'], 'volatilidad': opt['volatilidad'], 'sharpe': opt['sharpe']})
+        backtest = backtest_engine.run_backtest(close_prices, opt['weights'], cartera['rebalanceo'])
+        equity = backtest['equity'].iloc[:, 0]
+        resultado['backtest'] = backtest['stats'].iloc[:, 0].to_dict()
+        riesgo = risk_analytics.analizar(close_prices, equity, cartera['intervalo'], cartera['risk_free_rate'])
+        resultado['riesgo'] = riesgo['resumen'].loc[risk_analytics.PORTAFOLIO, CAMPOS_RIESGO].to_dict()
+        resultado['tecnico'] = _resumen_tecnico(precios, opt['weights'])
+        if incluir_equity: resultado['equity'] = equity
+    except Exception as e:
+        resultado.update({'estado': 'error', 'error': f"{type(e).__name__}: {e}"})
+    resultado['segundos'] = time.perf_counter() - inicio
+    return resultado
+
+# --- SECCIÓN 5: POOL DE PROCESOS ---
+_paneles = None
+
+def _inicializar_worker(paneles):
+    # Los paneles de precios llegan una sola vez a cada proceso. Cada proceso usa un hilo de BLAS: con N procesos
+    # compitiendo por los núcleos, los hilos extra de BLAS solo añaden contención.
+    global _paneles
+    _paneles = paneles
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+def _ejecutar_en_worker(args):
+    cartera, incluir_equity = args
+    return ejecutar_cartera(cartera, _paneles[(cartera['periodo'], cartera['intervalo'])], incluir_equity)
+
+def ejecutar_lote(carteras, n_workers=None, incluir_equity=True):
+    # Devuelve (resultados en el orden de `carteras`, tiempos). Con un solo worker no se lanza ningún proceso.
+    inicio = time.perf_counter()
+    paneles = precios_compartidos(carteras)
+    descarga = time.perf_counter() - inicio
+    n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(carteras)))
+    tareas = [(cartera, incluir_equity) for cartera in carteras]
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_inicializar_worker, initargs=(paneles,)) as pool:
+            resultados = list(pool.map(_ejecutar_en_worker, tareas, chunksize=max(1, len(tareas) // (8 * n_workers))))
+    else:
+        _inicializar_worker(paneles)
+        resultados = [_ejecutar_en_worker(t) for t in tareas]
+    total = time.perf_counter() - inicio
+    return resultados, {'descarga_s': descarga, 'calculo_s': total - descarga, 'total_s': total, 'workers': n_workers,
+                        'carteras_por_segundo': len(carteras) / max(total - descarga, 1e-9)}
+
+# --- SECCIÓN 6: SALIDA EN PARQUET Y JSON ---
+def tablas_resultados(resultados):
+    # Resultados en formato largo, una tabla por tipo: resumen (una fila por cartera), pesos, técnico y capital.
+    resumen, pesos, tecnico, capital = [], [], [], []
+    for r in resultados:
+        fila = {'Cartera': r['id'], 'Estado': r['estado'], 'Error': r['error'], 'Tickers': len(r.get('tickers_validos', [])),
+                'Sin Datos': ", ".join(r.get('tickers_sin_datos', [])), 'Rendimiento Esperado': r.get('rendimiento'),
+                'Volatilidad Esperada': r.get('volatilidad'), 'Sharpe Esperado': r.get('sharpe'), 'Segundos': r['segundos']}
+        fila.update({f"bt_{k}": v for k, v in r.get('backtest', {}).items()})
+        fila.update(r.get('riesgo', {}))
+        resumen.append(fila)
+        pesos += [{'Cartera': r['id'], 'Ticker': t, 'Peso': w} for t, w in r.get('pesos', {}).items()]
+        tecnico += [{'Cartera': r['id'], **fila_tecnica} for fila_tecnica in r.get('tecnico', [])]
+        if r.get('equity') is not None:
+            capital.append(pd.DataFrame({'Cartera': r['id'], 'Date': r['equity'].index, 'Capital': r['equity'].to_numpy()}))
+    return {'resumen': pd.DataFrame(resumen), 'pesos': pd.DataFrame(pesos, columns=['Cartera', 'Ticker', 'Peso']),
+            'tecnico': pd.DataFrame(tecnico), 'equity': pd.concat(capital, ignore_index=True) if capital else pd.DataFrame(columns=['Cartera', 'Date', 'Capital'])}
+
+def _json_limpio(valor):
+    if isinstance(valor, dict): return {str(k): _json_limpio(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)): return [_json_limpio(v) for v in valor]
+    if isinstance(valor, (np.floating, float)): return None if np.isnan(valor) else float(valor)
+    if isinstance(valor, np.integer): return int(valor)
+    return valor
+
+def guardar_resultados(resultados, tiempos, salida, parametros=None):
+    # resumen/pesos/tecnico/equity.parquet, resultados.json (todo salvo las curvas de capital) y manifiesto.json.
+    os.makedirs(salida, exist_ok=True)
+    tablas = tablas_resultados(resultados)
+    for nombre, df in tablas.items(): df.to_parquet(os.path.join(salida, f"{nombre}.parquet"), index=False)
+    with open(os.path.join(salida, "resultados.json"), "w", encoding="utf-8") as f:
+        json.dump(_json_limpio([{k: v for k, v in r.items() if k != 'equity'} for r in resultados]), f, ensure_ascii=False, indent=1)
+    manifiesto = {'creado': time.strftime('%Y-%m-%dT%H:%M:%S'), 'carteras': len(resultados), 'ok': sum(r['estado'] == 'ok' for r in resultados),
+                  'errores': sum(r['estado'] != 'ok' for r in resultados), 'tiempos': tiempos, 'parametros': parametros or {}}
+    with open(os.path.join(salida, "manifiesto.json"), "w", encoding="utf-8") as f: json.dump(_json_limpio(manifiesto), f, ensure_ascii=False, indent=1)
+    return tablas
+
+# --- SECCIÓN 7: LÍNEA DE COMANDOS ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Optimización, backtesting, riesgo y análisis técnico para un lote de carteras, sin interfaz.")
+    parser.add_argument("carteras", help="Archivo JSON, JSON Lines o CSV con las carteras.")
+    parser.add_argument("--salida", default="resultados_lote", help="Carpeta donde se escriben los Parquet y JSON.")
+    parser.add_argument("--workers", type=int, help="Procesos en paralelo (por defecto, uno por núcleo).")
+    parser.add_argument("--periodo", help=f"Período por defecto ({DEFECTOS['periodo']}).")
+    parser.add_argument("--intervalo", help=f"Intervalo por defecto ({DEFECTOS['intervalo']}).")
+    parser.add_argument("--tasa-libre", type=float, help=f"Tasa libre de riesgo anual en decimal ({DEFECTOS['risk_free_rate']}).")
+    parser.add_argument("--covarianza", choices=list(optimization.METODOS_COVARIANZA), help=f"Modelo de covarianza ({DEFECTOS['metodo_covarianza']}).")
+    parser.add_argument("--rebalanceo", choices=list(backtest_engine.PERIODOS_REBALANCEO) + ['threshold'], help=f"Rebalanceo del backtest ({DEFECTOS['rebalanceo']}).")
+    parser.add_argument("--sin-equity", action="store_true", help="No guardar las curvas de capital.")
+    args = parser.parse_args(argv)
+    carteras = cargar_carteras(args.carteras, periodo=args.periodo, intervalo=args.intervalo, risk_free_rate=args.tasa_libre,
+                               metodo_covarianza=args.covarianza, rebalanceo=args.rebalanceo)
+    resultados, tiempos = ejecutar_lote(carteras, args.workers, incluir_equity=not args.sin_equity)
+    guardar_resultados(resultados, tiempos, args.salida, parametros=vars(args))
+    errores = [r for r in resultados if r['estado'] != 'ok']
+    print(f"{len(resultados) - len(errores)}/{len(resultados)} carteras en {tiempos['total_s']:.1f} s "
+          f"(descarga {tiempos['descarga_s']:.1f} s, {tiempos['carteras_por_segundo']:.1f} carteras/s con {tiempos['workers']} workers) -> {args.salida}")
+    for r in errores[:10]: print(f"  {r['id']}: {r['error']}")
+    # Código de salida para cron/CI: 0 si todas las carteras terminaron, 1 si alguna falló y 2 si no terminó ninguna.
+    if errores and len(errores) == len(resultados): return 2
+    return 1 if errores else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+# chart_data.py (Reducción de Series para Gráficos con LTTB y Presupuesto Fijo de Puntos)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import numpy as np
+import pandas as pd
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+# Puntos por traza: más que los píxeles horizontales de un gráfico típico, así la forma se conserva a la vista.
+PUNTOS_MAXIMOS = 1500
+
+# --- SECCIÓN 2: ALGORITMO LTTB ---
+def lttb(x, y, puntos=PUNTOS_MAXIMOS):
+    # Largest-Triangle-Three-Buckets: conserva el primer y último punto y, en cada cubeta intermedia, el punto que forma
+    # el triángulo de mayor área con el elegido anterior y el centroide de la cubeta siguiente (picos y valles incluidos).
+    # Devuelve los índices elegidos, en orden.
+    n = len(y)
+    if puntos >= n or puntos < 3: return np.arange(n)
+    bordes = np.linspace(1, n - 1, puntos - 1).astype(np.int64)
+    # Centroides de todas las cubetas en una pasada; la cubeta que sigue a la última es el punto final.
+    inicios = np.r_[bordes[:-1], n - 1]
+    tamanos = np.diff(np.r_[inicios, n])
+    cx, cy = np.add.reduceat(x, inicios) / tamanos, np.add.reduceat(y, inicios) / tamanos
+    seleccion = np.empty(puntos, dtype=np.int64)
+    seleccion[0], seleccion[-1] = 0, n - 1
+    a = 0
+    for i in range(puntos - 2):
+        ini, fin = bordes[i], bordes[i + 1]
+        area = np.abs((x[a] - cx[i + 1]) * (y[ini:fin] - y[a]) - (x[a] - x[ini:fin]) * (cy[i + 1] - y[a]))
+        a = ini + int(np.argmax(area)); seleccion[i + 1] = a
+    return seleccion
+
+# --- SECCIÓN 3: API PÚBLICA ---
+def reducir_serie(serie, puntos=PUNTOS_MAXIMOS):
+    # Serie indexada por fecha (o numérica) reducida a lo sumo a `puntos` valores; los NaN se descartan antes.
+    serie = serie.dropna()
+    if len(serie) <= puntos: return serie
+    indice = serie.index
+    x = (indice.asi8 - indice.asi8[0]) / 1e9 if isinstance(indice, pd.DatetimeIndex) else np.arange(len(serie), dtype=float)
+    return serie.iloc[lttb(x, serie.to_numpy(dtype=float), puntos)]
+
+def figura_lineas(df, titulo=None, puntos=PUNTOS_MAXIMOS, estilos=None, nombres=None, **layout):
+    # Una traza por columna, cada una reducida por separado: el peso del gráfico no depende de la longitud del histórico.
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    for columna in df.columns:
+        serie = reducir_serie(df[columna], puntos)
+        if serie.empty: continue
+        fig.add_trace(go.Scatter(x=serie.index, y=serie.to_numpy(), mode='lines', name=(nombres or {}).get(columna, str(columna)),
+                                 line=(estilos or {}).get(columna)))
+    fig.update_layout(title=titulo, **layout)
+    return fig
@@ -0,0 +1,246 @@
+# data_providers.py (Capa de Proveedores de Datos de Mercado: Yahoo Finanzas y Reproducción Local)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import os
+import json
+import zlib
+import numpy as np
+import pandas as pd
+
+import profiling
+import shared_cache
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+# ANALYTIX_DATA_PROVIDER = "yfinance" (por defecto) o "replay"; ANALYTIX_REPLAY_DIR indica la carpeta de datos grabados.
+# Si se define ANALYTIX_RECORD_DIR, las respuestas de Yahoo Finanzas se graban allí en el formato de reproducción.
+PERIOD_OFFSETS = {
+    "1d": pd.DateOffset(days=1), "5d": pd.DateOffset(days=5), "1mo": pd.DateOffset(months=1), "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6), "1y": pd.DateOffset(years=1), "2y": pd.DateOffset(years=2), "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10)
+}
+CAMPOS_OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+def inicio_periodo(period, referencia=None):
+    if period not in PERIOD_OFFSETS: return None
+    referencia = pd.Timestamp.today() if referencia is None else pd.Timestamp(referencia)
+    return referencia.normalize() - PERIOD_OFFSETS[period]
+
+def combinar_por_ticker(frames):
+    # Formato de yf.download: columnas MultiIndex (Campo, Ticker).
+    if not frames: return pd.DataFrame()
+    precios = pd.concat(frames, axis=1).swaplevel(0, 1, axis=1)
+    precios = precios[[(campo, t) for campo in CAMPOS_OHLCV for t in frames if (campo, t) in precios.columns]]
+    precios.columns.names = ['Price', 'Ticker']
+    return precios
+
+# --- SECCIÓN 2: PROVEEDOR YAHOO FINANZAS ---
+class YFinanceProvider:
+    name = "yfinance"
+
+    def fecha_referencia(self):
+        return pd.Timestamp.today().normalize()
+
+    @profiling.medido("yfinance.download", tipo='red')
+    def download(self, tickers, interval, period=None, start=None):
+        import yfinance as yf
+        kwargs = {"start": start} if start is not None else {"period": period}
+        return yf.download(tickers, interval=interval, progress=False, **kwargs)
+
+    @profiling.medido("yfinance.info", tipo='red')
+    def info(self, ticker):
+        import yfinance as yf
+        return yf.Ticker(ticker).info or {}
+
+    @profiling.medido("yfinance.history", tipo='red')
+    def history(self, ticker, period):
+        import yfinance as yf
+        return yf.Ticker(ticker).history(period=period)
+
+    @profiling.medido("yfinance.financials", tipo='red')
+    def financials(self, ticker):
+        import yfinance as yf
+        return yf.Ticker(ticker).financials
+
+# --- SECCIÓN 3: PROVEEDOR DE REPRODUCCIÓN LOCAL ---
+# Estructura de la carpeta: prices/{ticker}_{intervalo}.parquet, info/{ticker}.json, financials/{ticker}.csv
+def _nombre_archivo(ticker):
+    return ticker.replace(os.sep, '_')
+
+class ReplayProvider:
+    name = "replay"
+
+    def __init__(self, root, as_of=None):
+        self.root = root
+        self._as_of = pd.Timestamp(as_of).normalize() if as_of is not None else None
+
+    def _ruta(self, carpeta, ticker, extension):
+        return os.path.join(self.root, carpeta, f"{_nombre_archivo(ticker)}{extension}")
+
+    def _precios(self, ticker, interval):
+        try: return pd.read_parquet(self._ruta("prices", ticker, f"_{interval}.parquet"))
+        except (FileNotFoundError, OSError): return None
+
+    def fecha_referencia(self):
+        # Los períodos se miden desde la última barra grabada, así la reproducción es determinista.
+        if self._as_of is None:
+            carpeta = os.path.join(self.root, "prices"); ultimas = []
+            for archivo in (os.listdir(carpeta) if os.path.isdir(carpeta) else []):
+                if archivo.endswith(".parquet"): ultimas.append(pd.read_parquet(os.path.join(carpeta, archivo), columns=["Close"]).index.max())
+            self._as_of = max(ultimas).normalize() if ultimas else pd.Timestamp.today().normalize()
+        return self._as_of
+
+    @profiling.medido("replay.download", tipo='disco')
+    def download(self, tickers, interval, period=None, start=None):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        desde = pd.Timestamp(start) if start is not None else inicio_periodo(period, self.fecha_referencia())
+        frames = {}
+        for ticker in tickers:
+            df = self._precios(ticker, interval)
+            if df is None: continue
+            df = df[df.index <= self.fecha_referencia() + pd.Timedelta(days=1)]
+            frames[ticker] = df[df.index >= desde] if desde is not None else df
+        return combinar_por_ticker(frames)
+
+    def info(self, ticker):
+        try:
+            with open(self._ruta("info", ticker, ".json"), "r", encoding="utf-8") as f: return json.load(f)
+        except FileNotFoundError: return {}
+
+    def history(self, ticker, period):
+        data = self.download([ticker], "1d", period=period)
+        return data.xs(ticker, axis=1, level=1) if not data.empty else pd.DataFrame(columns=CAMPOS_OHLCV)
+
+    def financials(self, ticker):
+        try: df = pd.read_csv(self._ruta("financials", ticker, ".csv"), index_col=0)
+        except FileNotFoundError: return pd.DataFrame()
+        df.columns = pd.to_datetime(df.columns)
+        return df
+
+# --- SECCIÓN 4: GRABACIÓN Y DATOS SINTÉTICOS ---
+def _guardar_precios(root, ticker, interval, df):
+    os.makedirs(os.path.join(root, "prices"), exist_ok=True)
+    ruta = os.path.join(root, "prices", f"{_nombre_archivo(ticker)}_{interval}.parquet")
+    if os.path.exists(ruta): df = df.combine_first(pd.read_parquet(ruta))
+    df.to_parquet(ruta)
+
+def _guardar_info(root, ticker, info):
+    os.makedirs(os.path.join(root, "info"), exist_ok=True)
+    with open(os.path.join(root, "info", f"{_nombre_archivo(ticker)}.json"), "w", encoding="utf-8") as f: json.dump(info, f, default=str)
+
+def _guardar_financials(root, ticker, df):
+    os.makedirs(os.path.join(root, "financials"), exist_ok=True)
+    df.to_csv(os.path.join(root, "financials", f"{_nombre_archivo(ticker)}.csv"))
+
+class RecordingProvider:
+    # Envuelve otro proveedor y graba cada respuesta en formato de reproducción.
+    def __init__(self, base, root):
+        self.base, self.root, self.name = base, root, base.name
+
+    def fecha_referencia(self):
+        return self.base.fecha_referencia()
+
+    def download(self, tickers, interval, period=None, start=None):
+        data = self.base.download(tickers, interval, period=period, start=start)
+        if data is not None and not data.empty and isinstance(data.columns, pd.MultiIndex):
+            for ticker in data.columns.get_level_values(1).unique():
+                df = data.xs(ticker, axis=1, level=1).dropna(how='all')
+                if getattr(df.index, 'tz', None) is not None: df.index = df.index.tz_localize(None)
+                if not df.empty: _guardar_precios(self.root, ticker, interval, df)
+        return data
+
+    def info(self, ticker):
+        info = self.base.info(ticker)
+        if info: _guardar_info(self.root, ticker, info)
+        return info
+
+    def history(self, ticker, period):
+        return self.base.history(ticker, period)
+
+    def financials(self, ticker):
+        df = self.base.financials(ticker)
+        if df is not None and not df.empty: _guardar_financials(self.root, ticker, df)
+        return df
+
+SECTORES_SINTETICOS = ["Technology", "Financial Services", "Healthcare", "Consumer Cyclical", "Energy", "Industrials"]
+
+def write_synthetic_dataset(root, tickers, years=10, interval="1d", seed=0, as_of=None):
+    # Genera precios (movimiento browniano geométrico), info y estados financieros reproducibles para cada ticker.
+    fin = pd.Timestamp.today().normalize() if as_of is None else pd.Timestamp(as_of).normalize()
+    fechas = pd.bdate_range(end=fin, periods=int(252 * years)) if interval == "1d" else pd.date_range(end=fin, periods=int(12 * years), freq="MS")
+    paso = 1 / 252 if interval == "1d" else 1 / 12
+    for ticker in tickers:
+        rng = np.random.default_rng([seed, zlib.crc32(ticker.encode())])
+        drift, vol = rng.uniform(0.02, 0.15), rng.uniform(0.15, 0.45)
+        retornos = (drift - 0.5 * vol ** 2) * paso + vol * np.sqrt(paso) * rng.standard_normal(len(fechas))
+        close = rng.uniform(20, 300) * np.exp(np.cumsum(retornos))
+        ruido = np.abs(rng.standard_normal(len(fechas))) * vol * np.sqrt(paso) * close
+        df = pd.DataFrame({"Open": close * (1 + rng.normal(0, 0.002, len(fechas))), "High": close + ruido, "Low": close - ruido,
+                           "Close": close, "Volume": rng.integers(10**5, 10**7, len(fechas)).astype(float)}, index=pd.DatetimeIndex(fechas, name="Date"))
+        _guardar_precios(root, ticker, interval, df)
+        info = {
+            "longName": f"{ticker} Synthetic Corp.", "sector": SECTORES_SINTETICOS[zlib.crc32(ticker.encode()) % len(SECTORES_SINTETICOS)],
+            "trailingPE": rng.uniform(5, 60), "pegRatio": rng.uniform(0.5, 4), "priceToSalesTrailing12Months": rng.uniform(0.5, 15),
+            "priceToBook": rng.uniform(0.5, 20), "enterpriseToRevenue": rng.uniform(0.5, 15), "enterpriseToEbitda": rng.uniform(3, 40),
+            "returnOnAssets": rng.uniform(-0.05, 0.25), "returnOnEquity": rng.uniform(-0.1, 0.6), "profitMargins": rng.uniform(-0.1, 0.4),
+            "debtToEquity": rng.uniform(0, 3), "currentRatio": rng.uniform(0.5, 3), "quickRatio": rng.uniform(0.3, 2.5),
+            "dividendYield": rng.uniform(0, 0.06), "payoutRatio": rng.uniform(0, 1.2), "beta": rng.uniform(0.4, 2)
+        }
+        _guardar_info(root, ticker, info)
+        anios = pd.to_datetime([f"{fin.year - i - 1}-12-31" for i in range(4)])
+        ebit = rng.uniform(1e8, 1e11)
+        _guardar_financials(root, ticker, pd.DataFrame([ebit * rng.uniform(0.8, 1.2, 4), -ebit * rng.uniform(0.01, 0.2, 4)], index=["Ebit", "Interest Expense"], columns=anios))
+
+# --- SECCIÓN 5: CACHÉ COMPARTIDA ENTRE SESIONES ---
+class CachingProvider:
+    # Envuelve otro proveedor con la caché de proceso de shared_cache: las sesiones que piden los mismos tickers a la vez
+    # comparten una única llamada al proveedor. Las descargas se cachean por ticker, así una petición solo descarga
+    # (en un único lote) los tickers que nadie tiene ya en memoria ni en curso.
+    def __init__(self, base):
+        self.base, self.name = base, base.name
+
+    def fecha_referencia(self):
+        return self.base.fecha_referencia()
+
+    def download(self, tickers, interval, period=None, start=None):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        def cargar(faltantes):
+            data = self.base.download([t for t, _, _, _ in faltantes], interval, period=period, start=start)
+            frames = {}
+            if data is not None and not data.empty and isinstance(data.columns, pd.MultiIndex):
+                nivel = 1 if set(tickers) & set(data.columns.get_level_values(1)) else 0
+                frames = {t: data.xs(t, axis=1, level=nivel) for t in data.columns.get_level_values(nivel).unique()}
+            elif data is not None and not data.empty and len(faltantes) == 1:
+                frames = {faltantes[0][0]: data}
+            # Los tickers sin datos también se guardan (vacíos) para no repetir la consulta durante la vigencia.
+            return {clave: frames.get(clave[0], pd.DataFrame()) for clave in faltantes}
+        cacheados = shared_cache.obtener_varios('precios', [(t, interval, period, start) for t in tickers], cargar)
+        return combinar_por_ticker({clave[0]: df for clave, df in cacheados.items() if not df.empty})
+
+    def info(self, ticker):
+        return shared_cache.obtener('info', ticker, lambda: self.base.info(ticker))
+
+    def history(self, ticker, period):
+        return shared_cache.obtener('historial', (ticker, period), lambda: self.base.history(ticker, period))
+
+    def financials(self, ticker):
+        return shared_cache.obtener('financials', ticker, lambda: self.base.financials(ticker))
+
+# --- SECCIÓN 6: SELECCIÓN DEL PROVEEDOR ACTIVO ---
+_provider = None
+
+def _crear_provider():
+    if os.environ.get("ANALYTIX_DATA_PROVIDER", "yfinance") == "replay":
+        return ReplayProvider(os.environ.get("ANALYTIX_REPLAY_DIR", "replay_data"), os.environ.get("ANALYTIX_REPLAY_AS_OF"))
+    provider = YFinanceProvider()
+    if os.environ.get("ANALYTIX_RECORD_DIR"): provider = RecordingProvider(provider, os.environ["ANALYTIX_RECORD_DIR"])
+    # Solo las llamadas de red pasan por la caché compartida; la reproducción ya lee de disco.
+    return CachingProvider(provider)
+
+def get_provider():
+    global _provider
+    if _provider is None: _provider = _crear_provider()
+    return _provider
+
+def set_provider(provider):
+    global _provider
+    _provider = provider
@@ -0,0 +1,93 @@
+# export.py (Exportación por Bloques a CSV, Parquet y Excel sin Copias en Memoria)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import os
+import tempfile
+import pandas as pd
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+FORMATOS = {
+    'xlsx': {'nombre': 'Excel', 'extension': '.xlsx', 'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'},
+    'csv': {'nombre': 'CSV', 'extension': '.csv', 'mime': 'text/csv'},
+    'parquet': {'nombre': 'Parquet', 'extension': '.parquet', 'mime': 'application/vnd.apache.parquet'},
+}
+FILAS_POR_BLOQUE = 5000
+TICKERS_POR_BLOQUE = 25
+MAX_FILAS_EXCEL = 1_048_576
+
+# --- SECCIÓN 2: BLOQUES ---
+def bloques_filas(df, filas=FILAS_POR_BLOQUE):
+    # Formato ancho (fecha x ticker): se recorre por tramos de filas sin copiar el DataFrame completo.
+    for inicio in range(0, max(len(df), 1), filas): yield df.iloc[inicio:inicio + filas]
+
+def bloques_ohlcv(all_prices, tickers_por_bloque=TICKERS_POR_BLOQUE):
+    # Formato largo (Ticker, Fecha) x (Open, High, Low, Close, Volume), construido por grupos de tickers.
+    # Evita el límite de columnas y no materializa nunca la tabla larga completa.
+    tickers = all_prices.columns.get_level_values('Ticker').unique()
+    campos = all_prices.columns.get_level_values('Price').unique()
+    nombre_fecha = all_prices.index.name or 'Date'
+    for inicio in range(0, len(tickers), tickers_por_bloque):
+        parte = all_prices.loc[:, all_prices.columns.get_level_values('Ticker').isin(tickers[inicio:inicio + tickers_por_bloque])]
+        largo = parte.stack(level='Ticker', future_stack=True).dropna(how='all').reindex(columns=campos)
+        largo.index.names = [nombre_fecha, 'Ticker']
+        yield largo.swaplevel().sort_index()
+
+# --- SECCIÓN 3: ESCRITORES POR FORMATO ---
+def _escribir_csv(bloques, ruta, index, hoja):
+    with open(ruta, "w", encoding="utf-8", newline="") as f:
+        for i, bloque in enumerate(bloques): bloque.to_csv(f, header=(i == 0), index=index)
+
+def _escribir_parquet(bloques, ruta, index, hoja):
+    # Un row group por bloque: el archivo se escribe incrementalmente con el esquema del primer bloque.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    escritor = None
+    try:
+        for bloque in bloques:
+            bloque = bloque.rename(columns=str)
+            tabla = pa.Table.from_pandas(bloque, preserve_index=index, schema=escritor.schema if escritor else None)
+            if escritor is None: escritor = pq.ParquetWriter(ruta, tabla.schema)
+            escritor.write_table(tabla)
+    finally:
+        if escritor is not None: escritor.close()
+
+def _escribir_xlsx(bloques, ruta, index, hoja):
+    # Libro en modo write_only: openpyxl vuelca cada fila a disco en lugar de mantener todas las celdas en memoria.
+    from openpyxl import Workbook
+    libro = Workbook(write_only=True)
+    ws = libro.create_sheet(hoja)
+    filas = 0
+    for i, bloque in enumerate(bloques):
+        if index: bloque = bloque.reset_index()
+        for columna in bloque.columns[bloque.dtypes.map(lambda d: isinstance(d, pd.DatetimeTZDtype))]:
+            bloque[columna] = bloque[columna].dt.tz_localize(None)
+        if i == 0: ws.append([str(c) for c in bloque.columns])
+        filas += len(bloque)
+        if filas + 1 > MAX_FILAS_EXCEL:
+            raise ValueError(f"Excel admite hasta {MAX_FILAS_EXCEL:,} filas. Use CSV o Parquet para esta exportación.")
+        for fila in bloque.astype(object).where(bloque.notna(), None).itertuples(index=False, name=None): ws.append(fila)
+    libro.save(ruta)
+
+ESCRITORES = {'csv': _escribir_csv, 'parquet': _escribir_parquet, 'xlsx': _escribir_xlsx}
+
+# --- SECCIÓN 4: API PÚBLICA ---
+def exportar(bloques, formato, ruta, index=True, hoja='Datos'):
+    ESCRITORES[formato](bloques, ruta, index, hoja)
+    return ruta
+
+def exportar_bytes(generar_bloques, formato, index=True, hoja='Datos'):
+    # Escribe en un archivo temporal y lo lee una sola vez: la única copia en memoria es el resultado final
+    # (antes: libro completo + BytesIO + getvalue()).
+    descriptor, ruta = tempfile.mkstemp(suffix=FORMATOS[formato]['extension'])
+    os.close(descriptor)
+    try:
+        exportar(generar_bloques(), formato, ruta, index, hoja)
+        with open(ruta, "rb") as f: return f.read()
+    finally:
+        os.remove(ruta)
+
+def boton_descarga(etiqueta, generar_bloques, formato, nombre_base, index=True, hoja='Datos'):
+    # El archivo se genera al pulsar el botón (en otro hilo) y la página no se vuelve a ejecutar.
+    import streamlit as st
+    st.download_button(label=etiqueta, data=lambda: exportar_bytes(generar_bloques, formato, index, hoja),
+                       file_name=f"{nombre_base}{FORMATOS[formato]['extension']}", mime=FORMATOS[formato]['mime'], on_click="ignore")
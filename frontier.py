@@ -0,0 +1,63 @@
+# frontier.py (Frontera Eficiente Calculada una Vez, Cacheada y Graficada con Plotly)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from pypfopt import EfficientFrontier
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+PUNTOS_FRONTERA = 40
+MAX_ACTIVOS_CON_ETIQUETA = 50
+
+# --- SECCIÓN 2: CÁLCULO DE LA CURVA ---
+def _rango_rendimientos(mu, S, puntos):
+    # Igual que pypfopt.plotting: desde el rendimiento de mínima varianza hasta el máximo alcanzable.
+    ef_minvol = EfficientFrontier(mu, S); ef_minvol.min_volatility()
+    min_ret = ef_minvol.portfolio_performance()[0]
+    max_ret = EfficientFrontier(mu, S)._max_return()
+    return np.linspace(min_ret, max_ret - 0.0001, puntos)
+
+def _resolver_tramo(mu, S, objetivos):
+    # Un solo EfficientFrontier por tramo: pypfopt reutiliza el problema cvxpy y solo actualiza el parámetro
+    # `target_return`, de modo que cada punto parte de la solución compilada del anterior.
+    ef = EfficientFrontier(mu, S); cov = S.to_numpy(); puntos = []
+    for objetivo in objetivos:
+        try:
+            ef.efficient_return(float(objetivo))
+        except Exception:
+            continue
+        w = ef.weights
+        puntos.append((float(w @ mu.to_numpy()), float(np.sqrt(w @ cov @ w))))
+    return puntos
+
+def calcular_frontera(mu, S, puntos=PUNTOS_FRONTERA, n_workers=1):
+    objetivos = _rango_rendimientos(mu, S, puntos)
+    if n_workers > 1:
+        tramos = [t for t in np.array_split(objetivos, n_workers) if len(t)]
+        with ThreadPoolExecutor(max_workers=len(tramos)) as pool:
+            resultados = [p for tramo in pool.map(lambda t: _resolver_tramo(mu, S, t), tramos) for p in tramo]
+    else:
+        resultados = _resolver_tramo(mu, S, objetivos)
+    return pd.DataFrame(resultados, columns=['Rendimiento', 'Volatilidad']).sort_values('Volatilidad').reset_index(drop=True)
+
+def frontera_cacheada(resultado, puntos=PUNTOS_FRONTERA, n_workers=1):
+    # La curva se guarda dentro del resultado de optimization.optimize_portfolio, que ya está cacheado junto a mu/S.
+    if resultado.get('frontera') is None:
+        resultado['frontera'] = calcular_frontera(resultado['mu'], resultado['S'], puntos, n_workers)
+    return resultado['frontera']
+
+# --- SECCIÓN 3: GRÁFICO ---
+def figura_frontera(resultado, frontera):
+    import plotly.graph_objects as go
+    mu, S = resultado['mu'], resultado['S']
+    activos = pd.DataFrame({'Rendimiento': mu, 'Volatilidad': np.sqrt(np.diag(S.to_numpy()))}, index=mu.index)
+    con_etiqueta = len(activos) <= MAX_ACTIVOS_CON_ETIQUETA
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=frontera['Volatilidad'], y=frontera['Rendimiento'], mode='lines', name='Frontera Eficiente', line=dict(color='#3b82f6', width=2.5)))
+    fig.add_trace(go.Scatter(x=activos['Volatilidad'], y=activos['Rendimiento'], mode='markers+text' if con_etiqueta else 'markers', text=activos.index if con_etiqueta else None,
+                             textposition='top center', hovertext=activos.index, name='Activos', marker=dict(color='gray', size=7)))
+    fig.add_trace(go.Scatter(x=[resultado['volatilidad']], y=[resultado['rendimiento']], mode='markers', name='Portafolio Óptimo', marker=dict(color='red', size=16, symbol='star')))
+    fig.update_layout(title='Frontera Eficiente', xaxis_title='Volatilidad', yaxis_title='Rendimiento', xaxis_tickformat='.0%', yaxis_tickformat='.0%',
+                      height=420, margin=dict(l=10, r=10, t=40, b=10), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+    return fig
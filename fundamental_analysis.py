@@ -3,9 +3,11 @@
 # --- SECCIÓN 0: IMPORTACIONES ---
 import streamlit as st
 import pandas as pd
-import yfinance as yf
 import numpy as np
-import io
+
+import fundamentals_store
+import export
+import profiling
 
 # --- SECCIÓN 1: DICCIONARIOS DE CONFIGURACIÓN ---
 RATIO_MAP = {
@@ -18,6 +20,8 @@ RATIO_MAP = {
 }
 LOWER_IS_BETTER = {"P/E", "PEG (esperado 5 años)", "P/S", "P/B", "EV/Revenue", "EV/EBITDA", "Razón Deuda a Patrimonio (D/E)", "Beta (5 años, mensual)"}
 HIGHER_IS_BETTER = {"ROA", "ROE", "Margen de Utilidad", "Cobertura de Intereses", "Razón Corriente", "Prueba Ácida", "Rendimiento del Dividendo (Yield)"}
+# Campos de `info` que consume la página; su antigüedad decide si el snapshot se refresca en segundo plano.
+API_KEYS = ['longName'] + [k for rats in RATIO_MAP.values() for k in rats.values() if k != 'interestCoverage']
 
 # --- SECCIÓN 2: LÓGICA DE ANÁLISIS (IA NARRATIVA) ---
 def analizar_ratio_por_rango(ratio_name, valor):
@@ -42,31 +46,41 @@ def analizar_ratio_por_rango(ratio_name, valor):
         else: return f"ℹ️ **Sin Dividendo o Payout Negativo (Payout = {s_valor}):** No paga dividendos o tuvo pérdidas."
     return None
 
+def orientacion_ratios(index, neutros_como_menor=False):
+    # +1 si un valor mayor es mejor, -1 si es mejor uno menor y 0 si el ratio no tiene dirección (p. ej. Payout).
+    ratios = index.get_level_values('Ratio')
+    return np.select([ratios.isin(list(HIGHER_IS_BETTER)), ratios.isin(list(LOWER_IS_BETTER))], [1.0, -1.0], default=-1.0 if neutros_como_menor else 0.0)
+
+def matriz_mejores(df_numeric, neutros_como_menor=False):
+    # Máscara (ratio x ticker) con todos los tickers que empatan en el mejor valor de cada ratio, sin bucles por fila.
+    orientado = df_numeric.to_numpy(dtype=float) * orientacion_ratios(df_numeric.index, neutros_como_menor)[:, None]
+    mejor = np.nanmax(np.where(np.isnan(orientado), -np.inf, orientado), axis=1, keepdims=True)
+    mascara = (orientado == mejor) & np.isfinite(mejor) & (orientacion_ratios(df_numeric.index, neutros_como_menor)[:, None] != 0)
+    return pd.DataFrame(mascara, index=df_numeric.index, columns=df_numeric.columns)
+
+RESUMENES_LIDERES = [
+    ('Rentabilidad', "**Líder en Rentabilidad:** `{t}` destaca por su alta eficiencia y retornos."),
+    ('Valoración', "**Mejor Valoración:** `{t}` presenta la relación precio-valor más atractiva."),
+    (('Solvencia', 'Liquidez'), "**Perfil más Sólido/Seguro:** `{t}` opera con la estructura financiera más robusta."),
+]
+
 def generar_analisis_ia_por_rangos(df_numeric):
     analisis_individuales, conclusion_general = {}, ""
+    claves = [('Solvencia', 'Razón Deuda a Patrimonio (D/E)'), ('Rentabilidad', 'ROE'), ('Dividendos', 'Razón de Pago de Dividendos (Payout)')]
+    filas_clave = df_numeric.reindex(pd.MultiIndex.from_tuples(claves))
     for ticker in df_numeric.columns:
-        series = df_numeric[ticker]
-        analisis_clave = [
-            analizar_ratio_por_rango('Razón Deuda a Patrimonio (D/E)', series.get(('Solvencia', 'Razón Deuda a Patrimonio (D/E)'))),
-            analizar_ratio_por_rango('ROE', series.get(('Rentabilidad', 'ROE'))),
-            analizar_ratio_por_rango('Razón de Pago de Dividendos (Payout)', series.get(('Dividendos', 'Razón de Pago de Dividendos (Payout)')))
-        ]
+        analisis_clave = [analizar_ratio_por_rango(ratio, filas_clave.at[(cat, ratio), ticker]) for cat, ratio in claves]
         analisis_individuales[ticker] = "\n\n".join([f"- {a}" for a in analisis_clave if a])
     if len(df_numeric.columns) > 1:
-        mejor_valor = df_numeric.min(axis=1); peor_valor = df_numeric.max(axis=1)
-        for ratio in HIGHER_IS_BETTER:
-            if ratio in mejor_valor.index: mejor_valor.loc[ratio], peor_valor.loc[ratio] = peor_valor.loc[ratio], mejor_valor.loc[ratio]
-        perfiles = {t: [] for t in df_numeric.columns}
-        for (cat, ratio), best_val in mejor_valor.items():
-            if pd.isna(best_val): continue
-            ganadores = df_numeric.loc[(cat, ratio)][df_numeric.loc[(cat, ratio)] == best_val].index
-            for ganador in ganadores: perfiles[ganador].append(cat)
+        # Líderes por categoría: un ticker lidera una categoría si tiene el mejor valor en alguno de sus ratios.
+        # Los ratios sin dirección definida se comparan como "menor es mejor".
+        lideres = matriz_mejores(df_numeric, neutros_como_menor=True).groupby(level='Categoría').any()
         resumenes = {}
-        for ticker, cats in perfiles.items():
-            cats = set(cats)
-            if 'Rentabilidad' in cats: resumenes[ticker] = f"**Líder en Rentabilidad:** `{ticker}` destaca por su alta eficiencia y retornos."
-            elif 'Valoración' in cats: resumenes[ticker] = f"**Mejor Valoración:** `{ticker}` presenta la relación precio-valor más atractiva."
-            elif 'Solvencia' in cats or 'Liquidez' in cats: resumenes[ticker] = f"**Perfil más Sólido/Seguro:** `{ticker}` opera con la estructura financiera más robusta."
+        for ticker in df_numeric.columns:
+            cats = set(lideres.index[lideres[ticker]])
+            for categorias, plantilla in RESUMENES_LIDERES:
+                if cats & ({categorias} if isinstance(categorias, str) else set(categorias)):
+                    resumenes[ticker] = plantilla.format(t=ticker); break
         if resumenes:
             conclusion_general = "Al comparar las empresas, se observa el siguiente panorama:\n\n" + "\n".join([f"- {v}" for v in sorted(list(set(resumenes.values())))])
             conclusion_general += "\n\n**Recomendación:** La elección dependerá del perfil del inversor. Los que buscan **calidad** podrían preferir al líder en rentabilidad, mientras que los de **valor** se inclinarán por la mejor valoración. La opción más **segura** suele ser la de mayor solidez financiera."
@@ -75,9 +89,11 @@ def generar_analisis_ia_por_rangos(df_numeric):
     return analisis_individuales, conclusion_general
 
 # --- SECCIÓN 3: FUNCIONES DE SOPORTE ---
-def get_fundamental_data(ticker_str):
+def get_fundamental_data(ticker_str, info=None):
     try:
-        stock = yf.Ticker(ticker_str); info = stock.info
+        # Siempre se pasa por el almacén con los campos de los ratios: el `info` de la validación solo comprueba el TTL de
+        # nombre y sector, y así P/E, P/B, beta, etc. se refrescan en segundo plano al vencer su propio TTL.
+        info = fundamentals_store.get_info(ticker_str, campos=API_KEYS) or info
         if not info or info.get('longName') is None: return None
         data = {"Ticker": ticker_str, "Nombre": info.get('longName')}
         for cat, rats in RATIO_MAP.items():
@@ -85,47 +101,44 @@ def get_fundamental_data(ticker_str):
                 if api_key == 'pegRatio': data[d_name] = info.get(api_key, info.get('trailingPegRatio', np.nan))
                 elif api_key == 'interestCoverage':
                     try:
-                        fin = stock.financials; ebit = fin.loc['Ebit'].iloc[0]; ie = fin.loc['Interest Expense'].iloc[0]
+                        fin = fundamentals_store.get_financials(ticker_str); ebit = fin.loc['Ebit'].iloc[0]; ie = fin.loc['Interest Expense'].iloc[0]
                         data[d_name] = abs(ebit / ie) if pd.notna(ebit) and pd.notna(ie) and ie != 0 else np.nan
                     except (KeyError, IndexError): data[d_name] = np.nan
                 else: data[d_name] = info.get(api_key, np.nan)
         return data
     except Exception: return None
 
-def highlight_best(row):
-    style = [''] * len(row)
-    r_name = row.name[1]; vals = row.dropna().astype(float)
-    if vals.empty: return style
-    b_val = vals.min() if r_name in LOWER_IS_BETTER else vals.max() if r_name in HIGHER_IS_BETTER else None
-    if b_val is not None:
-        b_idx = vals[vals == b_val].index
-        if not b_idx.empty:
-            pos = row.index.get_loc(b_idx[0])
-            style[pos] = 'background-color: #3b82f6; font-weight: bold; color: white;'
-    return style
+def highlight_best(df):
+    # Estilo para Styler.apply(axis=None): resalta la primera celda con el mejor valor de cada fila.
+    mascara = matriz_mejores(df)
+    primera = mascara & (mascara.cumsum(axis=1) == 1)
+    return pd.DataFrame(np.where(primera, 'background-color: #3b82f6; font-weight: bold; color: white;', ''), index=df.index, columns=df.columns)
+
+def construir_matriz_ratios(successful_data):
+    # Tabla (Categoría, Ratio) x Ticker construida en una sola operación columnar a partir de los registros.
+    columnas = [(cat, rat) for cat, rats in RATIO_MAP.items() for rat in rats.keys()]
+    registros = pd.DataFrame.from_records(successful_data, index='Ticker')
+    df_numeric = registros.reindex(columns=[rat for _, rat in columnas]).apply(pd.to_numeric, errors='coerce').T
+    df_numeric.index = pd.MultiIndex.from_tuples(columnas, names=['Categoría', 'Ratio'])
+    df_numeric.columns = list(df_numeric.columns)
+    return df_numeric.dropna(how='all')
 
 def create_excel_download(df, filename):
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=True, sheet_name='Analisis_Fundamental')
-    st.download_button(label="📥 Descargar Tabla como Excel", data=output.getvalue(), file_name=filename, mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    export.boton_descarga("📥 Descargar Tabla como Excel", lambda: export.bloques_filas(df), 'xlsx', filename.removesuffix('.xlsx'), hoja='Analisis_Fundamental')
 
 # --- SECCIÓN 4: FUNCIÓN PRINCIPAL DE VISUALIZACIÓN (`display_page`) ---
-def display_page(tickers_list):
+def display_page(tickers_list, infos=None):
     if not tickers_list:
         st.warning("Por favor, ingrese al menos un ticker válido.")
         return
     with st.spinner(f"Obteniendo y procesando datos..."):
-        successful_data = [d for d in [get_fundamental_data(t) for t in tickers_list] if d is not None]
+        infos = infos or {}
+        with profiling.etapa("Ratios fundamentales", filas=len(tickers_list)):
+            successful_data = [d for d in [get_fundamental_data(t, infos.get(t)) for t in tickers_list] if d is not None]
         if not successful_data:
             st.error("No se pudieron obtener datos para ninguno de los tickers seleccionados.")
             return
-    df_numeric = pd.DataFrame(index=pd.MultiIndex.from_tuples([(cat, rat) for cat, rats in RATIO_MAP.items() for rat in rats.keys()], names=['Categoría', 'Ratio']))
-    for data in successful_data:
-        for cat, rats in RATIO_MAP.items():
-            for rat_name in rats.keys():
-                df_numeric.loc[(cat, rat_name), data['Ticker']] = data.get(rat_name)
-    df_numeric = df_numeric.apply(pd.to_numeric, errors='coerce').dropna(how='all')
+    df_numeric = construir_matriz_ratios(successful_data)
     if len(successful_data) > 1:
         st.header("Análisis Fundamental Comparativo")
         st.caption(", ".join([d['Nombre'] for d in successful_data]))
@@ -143,7 +156,7 @@ def display_page(tickers_list):
                 if cats_to_display:
                     df_filtered = df_numeric.loc[cats_to_display]
                     formatter = "{:.2%}" if tab_titles[i] == "🏆 Rentabilidad" else "{:.2f}"
-                    st.dataframe(df_filtered.style.apply(highlight_best, axis=1).format(formatter, na_rep="N/A"), use_container_width=True)
+                    st.dataframe(df_filtered.style.apply(highlight_best, axis=None).format(formatter, na_rep="N/A"), use_container_width=True)
                 else:
                     st.info("No hay datos disponibles para esta categoría para los tickers seleccionados.")
         st.markdown("<small>Nota: El valor óptimo en cada fila está resaltado.</small>", unsafe_allow_html=True)
@@ -154,7 +167,8 @@ def display_page(tickers_list):
         
         # --- CAMBIO CLAVE 2: MEJORA DE TÍTULOS EN ANÁLISIS IA ---
         st.subheader("🤖 Análisis IA Individual")
-        analisis_individuales, conclusion_general = generar_analisis_ia_por_rangos(df_numeric)
+        with profiling.etapa("Análisis IA", filas=len(df_numeric.columns)):
+            analisis_individuales, conclusion_general = generar_analisis_ia_por_rangos(df_numeric)
         for ticker in df_numeric.columns:
             with st.expander(f"**🧠 Análisis Detallado para {ticker}**"):
                 st.markdown(analisis_individuales[ticker])
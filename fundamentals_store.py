@@ -0,0 +1,129 @@
+# fundamentals_store.py (Almacén Local de Snapshots Fundamentales con Caducidad por Campo)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+import data_providers
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+# Un snapshot por ticker y fecha de descarga: {ticker}/info_AAAA-MM-DD.json y {ticker}/financials_AAAA-MM-DD.json.
+STORE_DIR = os.environ.get("ANALYTIX_FUNDAMENTALS_STORE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fundamentals_store"))
+DIA = 24 * 3600
+TTL_INFO = int(os.environ.get("ANALYTIX_FUNDAMENTALS_TTL", 7 * DIA))
+# Los campos que dependen del precio caducan antes que los contables.
+TTL_POR_CAMPO = {campo: DIA for campo in ("trailingPE", "pegRatio", "trailingPegRatio", "priceToSalesTrailing12Months", "priceToBook",
+                                          "enterpriseToRevenue", "enterpriseToEbitda", "dividendYield", "beta", "currentPrice", "marketCap")}
+TTL_FINANCIALS = 90 * DIA
+VERSIONES_CONSERVADAS = 4
+
+_lock = threading.Lock()
+_en_curso = set()
+_refrescos = ThreadPoolExecutor(max_workers=2, thread_name_prefix="fundamentals-refresh")
+
+# --- SECCIÓN 2: PERSISTENCIA EN DISCO ---
+def _directorio(ticker):
+    return os.path.join(STORE_DIR, data_providers.get_provider().name, ticker.replace(os.sep, '_'))
+
+def _versiones(ticker, tipo):
+    try: archivos = os.listdir(_directorio(ticker))
+    except FileNotFoundError: return []
+    return sorted(a for a in archivos if a.startswith(f"{tipo}_") and not a.endswith(".tmp"))
+
+def _escribir_atomico(ruta, escribir):
+    tmp = ruta + ".tmp"
+    escribir(tmp)
+    os.replace(tmp, ruta)
+
+def _podar(ticker, tipo):
+    for archivo in _versiones(ticker, tipo)[:-VERSIONES_CONSERVADAS]:
+        try: os.remove(os.path.join(_directorio(ticker), archivo))
+        except FileNotFoundError: pass
+
+def guardar_info(ticker, info, fetched_at=None):
+    if not info: return
+    fetched_at = time.time() if fetched_at is None else fetched_at
+    os.makedirs(_directorio(ticker), exist_ok=True)
+    ruta = os.path.join(_directorio(ticker), f"info_{time.strftime('%Y-%m-%d', time.localtime(fetched_at))}.json")
+    def escribir(tmp):
+        with open(tmp, "w", encoding="utf-8") as f: json.dump({'fetched_at': fetched_at, 'info': info}, f, default=str)
+    _escribir_atomico(ruta, escribir); _podar(ticker, "info")
+
+def guardar_financials(ticker, df, fetched_at=None):
+    if df is None: return
+    fetched_at = time.time() if fetched_at is None else fetched_at
+    os.makedirs(_directorio(ticker), exist_ok=True)
+    ruta = os.path.join(_directorio(ticker), f"financials_{time.strftime('%Y-%m-%d', time.localtime(fetched_at))}.json")
+    # Formato "split" en JSON: leerlo es mucho más rápido que un CSV cuando se recorre un universo de miles de tickers.
+    columnas = [c.isoformat() if hasattr(c, 'isoformat') else str(c) for c in df.columns]
+    numericos = df.apply(pd.to_numeric, errors='coerce').astype(float)
+    datos = numericos.astype(object).where(numericos.notna(), None).to_numpy().tolist() if not df.empty else []
+    def escribir(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({'fetched_at': fetched_at, 'index': [str(i) for i in df.index], 'columns': columnas, 'data': datos}, f)
+    _escribir_atomico(ruta, escribir); _podar(ticker, "financials")
+
+def _leer_info(ticker):
+    versiones = _versiones(ticker, "info")
+    if not versiones: return None
+    try:
+        with open(os.path.join(_directorio(ticker), versiones[-1]), "r", encoding="utf-8") as f: return json.load(f)
+    except (OSError, json.JSONDecodeError): return None
+
+def _leer_financials(ticker):
+    versiones = _versiones(ticker, "financials")
+    if not versiones: return None, None
+    try:
+        with open(os.path.join(_directorio(ticker), versiones[-1]), "r", encoding="utf-8") as f: snapshot = json.load(f)
+    except (OSError, json.JSONDecodeError): return None, None
+    columnas = pd.to_datetime(snapshot['columns'], errors='coerce', format='ISO8601')
+    df = pd.DataFrame(snapshot['data'] or None, index=snapshot['index'], columns=columnas, dtype=float)
+    return df, snapshot['fetched_at']
+
+# --- SECCIÓN 3: CADUCIDAD Y REFRESCO EN SEGUNDO PLANO ---
+def campos_vencidos(snapshot, campos=None, ahora=None):
+    ahora = time.time() if ahora is None else ahora
+    edad = ahora - snapshot['fetched_at']
+    campos = snapshot['info'].keys() if campos is None else campos
+    return [c for c in campos if edad > TTL_POR_CAMPO.get(c, TTL_INFO)]
+
+def _refrescar(ticker, tipo):
+    try:
+        provider = data_providers.get_provider()
+        if tipo == "info": guardar_info(ticker, provider.info(ticker))
+        else: guardar_financials(ticker, provider.financials(ticker))
+    except Exception:
+        pass
+    finally:
+        with _lock: _en_curso.discard((ticker, tipo))
+
+def _programar_refresco(ticker, tipo):
+    with _lock:
+        if (ticker, tipo) in _en_curso: return
+        _en_curso.add((ticker, tipo))
+    _refrescos.submit(_refrescar, ticker, tipo)
+
+# --- SECCIÓN 4: API PÚBLICA ---
+def get_info(ticker, campos=None):
+    # Sirve el último snapshot; si alguno de los `campos` está vencido se devuelve igualmente y se refresca en segundo plano.
+    # Solo se consulta la red de forma síncrona cuando no existe ningún snapshot.
+    snapshot = _leer_info(ticker)
+    if snapshot is None:
+        info = data_providers.get_provider().info(ticker) or {}
+        guardar_info(ticker, info)
+        return info
+    if campos_vencidos(snapshot, campos): _programar_refresco(ticker, "info")
+    return snapshot['info']
+
+def get_financials(ticker):
+    df, fetched_at = _leer_financials(ticker)
+    if df is None:
+        df = data_providers.get_provider().financials(ticker)
+        guardar_financials(ticker, df if df is not None else pd.DataFrame())
+        return df
+    if time.time() - fetched_at > TTL_FINANCIALS: _programar_refresco(ticker, "financials")
+    return df
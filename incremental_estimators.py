@@ -0,0 +1,153 @@
+# incremental_estimators.py (Estimación Incremental de mu y S en Ventanas Móviles: EMA y Contracción de Ledoit-Wolf)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import numpy as np
+import pandas as pd
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+# Mismos valores por defecto que expected_returns.ema_historical_return y risk_models.risk_matrix de pypfopt.
+SPAN_EMA = 500
+FRECUENCIA = 252
+METODOS_INCREMENTALES = ('ledoit_wolf', 'oracle_approximating', 'sample_cov')
+
+# --- SECCIÓN 2: ESTADO INCREMENTAL DE UNA VENTANA DE RETORNOS ---
+# Con las filas r_t de la ventana se mantienen n, s = Σ r_t, Q = Σ r_t r_tᵀ, u = Σ ‖r_t‖² r_t y Σ ‖r_t‖⁴. La covarianza
+# centrada es Q - s sᵀ / n y el término de cuarto orden de Ledoit-Wolf, Σ ‖r_t - m‖⁴, se desarrolla a partir de ellas.
+# La EMA (pandas ewm(adjust=True)) guarda su numerador: al entrar k filas se descuenta por (1 - α)^k y al salir la más
+# antigua se resta con su peso (1 - α)^(n - 1). Mover la ventana k filas cuesta O(k·N²) en lugar de O(T·N²).
+class IncrementalEstimator:
+    def __init__(self, retornos, span=SPAN_EMA, frequency=FRECUENCIA):
+        # `retornos`: DataFrame fecha x activo sin NaN (retornos simples, como expected_returns.returns_from_prices).
+        self.columnas = retornos.columns
+        self.fechas = retornos.index
+        self.R = np.ascontiguousarray(retornos.to_numpy(dtype=float))
+        self.alpha = 2.0 / (span + 1.0)
+        self.decaimiento = 1.0 - self.alpha
+        self.frequency = frequency
+        self.inicio = self.fin = 0
+        self._reiniciar()
+
+    def _reiniciar(self):
+        p = self.R.shape[1]
+        self.n, self.s, self.Q, self.u, self.a2 = 0, np.zeros(p), np.zeros((p, p)), np.zeros(p), 0.0
+        self.ema = np.zeros(p)
+        self.movidas = 0  # filas sumadas o restadas desde la última reconstrucción
+
+    def _acumular(self, filas, signo):
+        a = np.einsum('ij,ij->i', filas, filas)
+        self.n += signo * len(filas)
+        self.s += signo * filas.sum(axis=0)
+        self.Q += signo * (filas.T @ filas)
+        self.u += signo * (filas.T @ a)
+        self.a2 += signo * float(a @ a)
+        self.movidas += len(filas)
+
+    def _agregar(self, hasta):
+        filas = self.R[self.fin:hasta]
+        if not len(filas): return
+        k = len(filas)
+        self.ema = self.decaimiento ** k * self.ema + self.decaimiento ** np.arange(k - 1, -1, -1) @ filas
+        self._acumular(filas, 1); self.fin = hasta
+
+    def _quitar(self, hasta):
+        filas = self.R[self.inicio:hasta]
+        if not len(filas): return
+        self.ema -= self.decaimiento ** (self.n - 1 - np.arange(len(filas))) @ filas
+        self._acumular(filas, -1); self.inicio = hasta
+
+    def mover(self, inicio, fin):
+        # Ventana = filas [inicio, fin) de `retornos`. Si solo avanza, se suman las filas nuevas y se restan las que
+        # salen; si retrocede o no se solapa con la anterior, se reconstruye desde cero.
+        if inicio < self.inicio or fin < self.fin or inicio >= self.fin:
+            self._reiniciar(); self.inicio = self.fin = inicio
+        self._agregar(fin)
+        self._quitar(inicio)
+        return self
+
+    def actualizar(self, retornos):
+        # Cambia la matriz de retornos por la de un histórico más reciente (barras nuevas al final y, si el período se
+        # desplaza, menos barras al principio) conservando el estado de la ventana actual: se restan las filas anteriores
+        # al nuevo inicio y el resto debe coincidir con las primeras filas de `retornos`. Devuelve False si no coincide
+        # (otros activos, datos revisados o sin solape) y el estado no es reutilizable.
+        if list(retornos.columns) != list(self.columnas) or self.fin <= self.inicio or not len(retornos): return False
+        salen = int(self.fechas[self.inicio:self.fin].searchsorted(retornos.index[0]))
+        if self.inicio + salen >= self.fin: return False
+        self._quitar(self.inicio + salen)
+        nuevos = np.ascontiguousarray(retornos.to_numpy(dtype=float))
+        comunes = self.fin - self.inicio
+        if (len(nuevos) < comunes or not retornos.index[:comunes].equals(self.fechas[self.inicio:self.fin])
+                or not np.array_equal(nuevos[:comunes], self.R[self.inicio:self.fin])): return False
+        self.R, self.fechas, self.inicio, self.fin = nuevos, retornos.index, 0, comunes
+        # Tras muchas actualizaciones se reconstruye para no acumular error de redondeo (coste amortizado O(1) por fila).
+        if self.movidas > 2 * comunes: self.recalcular()
+        return True
+
+    def recalcular(self):
+        # Reconstruye el estado de la ventana actual; útil tras miles de actualizaciones para descartar el error acumulado.
+        inicio, fin = self.inicio, self.fin
+        self._reiniciar(); self.inicio = self.fin = inicio
+        return self.mover(inicio, fin)
+
+    def retornos_esperados(self, compounding=True):
+        # = expected_returns.ema_historical_return(precios de la ventana, span, frequency).
+        ema = self.ema * self.alpha / (1.0 - self.decaimiento ** self.n)
+        valores = (1 + ema) ** self.frequency - 1 if compounding else ema * self.frequency
+        return pd.Series(valores, index=self.columnas)
+
+    def _covarianza_empirica(self):
+        # Covarianza centrada con divisor n (la que usa scikit-learn antes de contraer).
+        m = self.s / self.n
+        return (self.Q - self.n * np.outer(m, m)) / self.n, m
+
+    def _ledoit_wolf(self):
+        # Mismas cuentas que sklearn.covariance.ledoit_wolf_shrinkage, con Σ x²ᵀx² reducido a Σ_t ‖x_t‖⁴.
+        n, p = self.n, len(self.s)
+        emp, m = self._covarianza_empirica()
+        traza = np.trace(emp); mu = traza / p
+        if p == 1: return emp, 0.0
+        c = m @ m
+        beta_ = self.a2 - 4 * (m @ self.u) + 2 * c * np.trace(self.Q) + 4 * (m @ self.Q @ m) - 3 * n * c * c
+        delta_ = (emp ** 2).sum()
+        beta = (beta_ / n - delta_) / (p * n)
+        delta = (delta_ - 2 * mu * traza + p * mu ** 2) / p
+        beta = min(beta, delta)
+        contraccion = 0.0 if beta == 0 else beta / delta
+        return (1 - contraccion) * emp + contraccion * mu * np.eye(p), contraccion
+
+    def _oracle_approximating(self):
+        # Mismas cuentas que sklearn.covariance.oas: solo depende de la covarianza empírica.
+        n, p = self.n, len(self.s)
+        emp, _ = self._covarianza_empirica()
+        alpha, mu = np.mean(emp ** 2), np.trace(emp) / p
+        num, den = alpha + mu ** 2, (n + 1) * (alpha - mu ** 2 / p)
+        contraccion = 1.0 if den == 0 else min(num / den, 1.0)
+        return (1 - contraccion) * emp + contraccion * mu * np.eye(p), contraccion
+
+    def covarianza(self, metodo='ledoit_wolf'):
+        # = risk_models.risk_matrix(precios de la ventana, method=metodo), anualizada.
+        if metodo == 'sample_cov':
+            emp, _ = self._covarianza_empirica()
+            S, contraccion = emp * self.n / (self.n - 1), None
+        elif metodo == 'ledoit_wolf': S, contraccion = self._ledoit_wolf()
+        elif metodo == 'oracle_approximating': S, contraccion = self._oracle_approximating()
+        else: raise ValueError(f"Método de covarianza sin versión incremental: {metodo}")
+        S = pd.DataFrame(S * self.frequency, index=self.columnas, columns=self.columnas)
+        # Con contracción > 0, S = (1 - δ)·emp + δ·μ·I es definida positiva: solo sin contracción hace falta la
+        # corrección espectral que aplica pypfopt.
+        if not contraccion:
+            from pypfopt.risk_models import fix_nonpositive_semidefinite
+            S = fix_nonpositive_semidefinite(S, fix_method="spectral")
+        return S
+
+# --- SECCIÓN 3: API PÚBLICA ---
+def retornos_de_precios(close_prices):
+    # Retornos simples sin la primera fila, como expected_returns.returns_from_prices; la fila i corresponde a la fecha i + 1.
+    return close_prices.pct_change(fill_method=None).iloc[1:]
+
+def estimar_ventanas(close_prices, ventanas, metodo_covarianza='ledoit_wolf', span=SPAN_EMA, frequency=FRECUENCIA):
+    # Para cada ventana de precios [inicio, fin) (en orden creciente) devuelve (mu, S) equivalentes a calcularlos con
+    # pypfopt sobre close_prices.iloc[inicio:fin]. Los retornos de esa ventana son las filas [inicio, fin - 1).
+    estimador = IncrementalEstimator(retornos_de_precios(close_prices), span, frequency)
+    for inicio, fin in ventanas:
+        estimador.mover(inicio, fin - 1)
+        yield estimador.retornos_esperados(), estimador.covarianza(metodo_covarianza)
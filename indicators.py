@@ -0,0 +1,184 @@
+# indicators.py (Motor de Indicadores Técnicos Vectorizado para Múltiples Tickers)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import json
+import threading
+from collections import deque, OrderedDict
+import numpy as np
+import pandas as pd
+
+# --- SECCIÓN 1: KERNELS 2D (TODAS LAS COLUMNAS A LA VEZ) ---
+# Mismas definiciones que pandas_ta: SMA = media móvil simple con `length` observaciones válidas,
+# RSI = 100 * RMA(ganancias) / (RMA(ganancias) + |RMA(pérdidas)|) con RMA = ewm(alpha=1/length, min_periods=length).
+def sma(close_prices, length):
+    valores = close_prices.to_numpy(dtype=float)
+    validos = ~np.isnan(valores)
+    suma = np.vstack([np.zeros((1, valores.shape[1])), np.cumsum(np.where(validos, valores, 0.0), axis=0)])
+    cuenta = np.vstack([np.zeros((1, valores.shape[1]), dtype=int), np.cumsum(validos, axis=0)])
+    resultado = np.full(valores.shape, np.nan)
+    if len(valores) >= length:
+        ventana_suma = suma[length:] - suma[:-length]
+        completas = (cuenta[length:] - cuenta[:-length]) == length
+        resultado[length - 1:] = np.where(completas, ventana_suma / length, np.nan)
+    return pd.DataFrame(resultado, index=close_prices.index, columns=close_prices.columns)
+
+def rsi(close_prices, length=14):
+    cambios = close_prices.astype(float).diff()
+    ganancias = cambios.clip(lower=0).ewm(alpha=1.0 / length, min_periods=length).mean()
+    perdidas = cambios.clip(upper=0).ewm(alpha=1.0 / length, min_periods=length).mean()
+    return 100 * ganancias / (ganancias + perdidas.abs())
+
+# --- SECCIÓN 2: PANEL DE INDICADORES ---
+def compute_indicator_panel(close_prices, rsi_length=14, sma_lengths=(50, 200)):
+    # Devuelve {'RSI_14': DataFrame, 'SMA_50': DataFrame, ...} con los mismos índices y columnas que `close_prices`.
+    if isinstance(close_prices, pd.Series): close_prices = close_prices.to_frame()
+    panel = {f"RSI_{rsi_length}": rsi(close_prices, rsi_length)}
+    for length in sma_lengths: panel[f"SMA_{length}"] = sma(close_prices, length)
+    return panel
+
+def latest_values(panel, close_prices):
+    # Último valor de cada indicador por ticker (fila = ticker), más el último precio de cierre.
+    if isinstance(close_prices, pd.Series): close_prices = close_prices.to_frame()
+    ultimos = pd.DataFrame({nombre: df.iloc[-1] for nombre, df in panel.items()}) if len(close_prices) else pd.DataFrame(columns=list(panel))
+    ultimos['Close'] = close_prices.iloc[-1] if len(close_prices) else np.nan
+    return ultimos
+
+# --- SECCIÓN 3: ESTADO INCREMENTAL (ACTUALIZACIÓN O(1) POR BARRA) ---
+# Reproduce exactamente la recursión de pandas ewm(adjust=True): media ponderada, peso acumulado y observaciones.
+class IndicatorState:
+    def __init__(self, rsi_length=14, sma_lengths=(50, 200)):
+        self.rsi_length, self.sma_lengths = rsi_length, tuple(sma_lengths)
+        self.factor = 1.0 - 1.0 / rsi_length
+        self.rma = {'ganancias': [np.nan, 1.0, 0], 'perdidas': [np.nan, 1.0, 0]}  # [media, peso, observaciones]
+        self.ventanas = {length: deque(maxlen=length) for length in self.sma_lengths}
+        self.sumas = {length: 0.0 for length in self.sma_lengths}
+        self.validos = {length: 0 for length in self.sma_lengths}
+        self.ultimo_precio, self.primera_fecha, self.ultima_fecha = np.nan, None, None
+
+    def _actualizar_rma(self, nombre, valor):
+        media, peso, obs = self.rma[nombre]
+        es_obs = not np.isnan(valor); obs += es_obs
+        if not np.isnan(media):
+            peso *= self.factor
+            if es_obs: media = (peso * media + valor) / (peso + 1.0); peso += 1.0
+        elif es_obs: media = valor
+        self.rma[nombre] = [media, peso, obs]
+
+    def update(self, precio, fecha=None):
+        precio = float(precio)
+        cambio = precio - self.ultimo_precio
+        self._actualizar_rma('ganancias', max(cambio, 0.0) if not np.isnan(cambio) else np.nan)
+        self._actualizar_rma('perdidas', min(cambio, 0.0) if not np.isnan(cambio) else np.nan)
+        for length, ventana in self.ventanas.items():
+            if len(ventana) == length:
+                saliente = ventana[0]
+                if not np.isnan(saliente): self.sumas[length] -= saliente; self.validos[length] -= 1
+            ventana.append(precio)
+            if not np.isnan(precio): self.sumas[length] += precio; self.validos[length] += 1
+        self.ultimo_precio = precio
+        if self.primera_fecha is None: self.primera_fecha = fecha
+        self.ultima_fecha = fecha
+        return self
+
+    def latest(self):
+        ganancia, _, obs_g = self.rma['ganancias']; perdida, _, obs_p = self.rma['perdidas']
+        rsi_actual = 100 * ganancia / (ganancia + abs(perdida)) if min(obs_g, obs_p) >= self.rsi_length and ganancia + abs(perdida) != 0 else np.nan
+        valores = {f"RSI_{self.rsi_length}": rsi_actual}
+        for length in self.sma_lengths:
+            valores[f"SMA_{length}"] = self.sumas[length] / length if self.validos[length] == length else np.nan
+        valores['Close'] = self.ultimo_precio
+        return valores
+
+    def to_dict(self):
+        return {'rsi_length': self.rsi_length, 'sma_lengths': list(self.sma_lengths), 'rma': self.rma,
+                'ventanas': {str(length): list(v) for length, v in self.ventanas.items()}, 'ultimo_precio': self.ultimo_precio,
+                'primera_fecha': None if self.primera_fecha is None else str(self.primera_fecha),
+                'ultima_fecha': None if self.ultima_fecha is None else str(self.ultima_fecha)}
+
+    @classmethod
+    def from_dict(cls, data):
+        estado = cls(data['rsi_length'], data['sma_lengths'])
+        estado.rma = {k: list(v) for k, v in data['rma'].items()}
+        for length in estado.sma_lengths:
+            valores = [float(v) for v in data['ventanas'][str(length)]]
+            estado.ventanas[length].extend(valores)
+            estado.sumas[length] = float(np.nansum(valores)); estado.validos[length] = int(np.sum(~np.isnan(valores)))
+        estado.ultimo_precio = float(data['ultimo_precio'])
+        estado.primera_fecha = pd.Timestamp(data['primera_fecha']) if data['primera_fecha'] else None
+        estado.ultima_fecha = pd.Timestamp(data['ultima_fecha']) if data['ultima_fecha'] else None
+        return estado
+
+def _estado_rma(valores, alpha):
+    # Estado final de ewm(adjust=True) para cada columna sin recorrer las barras en Python.
+    validos = ~np.isnan(valores); n = len(valores); factor = 1.0 - alpha
+    media = pd.DataFrame(valores).ewm(alpha=alpha).mean().to_numpy()[-1] if n else np.full(valores.shape[1], np.nan)
+    primera = np.where(validos.any(axis=0), validos.argmax(axis=0), n)
+    exponentes = (n - 1) - np.arange(n)[:, None]
+    peso = np.where(validos & (np.arange(n)[:, None] >= primera), factor ** exponentes, 0.0).sum(axis=0)
+    return media, np.where(validos.any(axis=0), peso, 1.0), validos.sum(axis=0)
+
+def seed_states(close_prices, rsi_length=14, sma_lengths=(50, 200)):
+    # Siembra un IndicatorState por ticker a partir del histórico completo, de forma vectorizada.
+    if isinstance(close_prices, pd.Series): close_prices = close_prices.to_frame()
+    valores = close_prices.to_numpy(dtype=float)
+    cambios = np.vstack([np.full((1, valores.shape[1]), np.nan), np.diff(valores, axis=0)]) if len(valores) else valores
+    rma_g = _estado_rma(np.where(np.isnan(cambios), np.nan, np.maximum(cambios, 0.0)), 1.0 / rsi_length)
+    rma_p = _estado_rma(np.where(np.isnan(cambios), np.nan, np.minimum(cambios, 0.0)), 1.0 / rsi_length)
+    estados = {}
+    for j, ticker in enumerate(close_prices.columns):
+        estado = IndicatorState(rsi_length, sma_lengths)
+        estado.rma = {'ganancias': [float(rma_g[0][j]), float(rma_g[1][j]), int(rma_g[2][j])],
+                      'perdidas': [float(rma_p[0][j]), float(rma_p[1][j]), int(rma_p[2][j])]}
+        for length in estado.sma_lengths:
+            ultimos = valores[-length:, j]
+            estado.ventanas[length].extend(ultimos.tolist())
+            estado.sumas[length] = float(np.nansum(ultimos)); estado.validos[length] = int(np.sum(~np.isnan(ultimos)))
+        if len(valores):
+            estado.ultimo_precio = float(valores[-1, j])
+            estado.primera_fecha, estado.ultima_fecha = close_prices.index[0], close_prices.index[-1]
+        estados[ticker] = estado
+    return estados
+
+# --- SECCIÓN 4: REGISTRO DE ESTADOS POR TICKER ---
+# LRU acotado: cada sesión/intervalo añade sus tickers y los que no se consultan acaban expulsados.
+MAX_ESTADOS = 2000
+_estados = OrderedDict()
+_lock_estados = threading.Lock()
+
+def _guardar_estado(clave, ticker, estado):
+    _estados[(clave, ticker)] = estado; _estados.move_to_end((clave, ticker))
+    while len(_estados) > MAX_ESTADOS: _estados.popitem(last=False)
+
+def update_states(close_prices, clave=None, rsi_length=14, sma_lengths=(50, 200)):
+    # Devuelve los últimos indicadores por ticker. `clave` suele ser el intervalo. Si ya hay un estado para (clave, ticker)
+    # cuya última barra sigue en la serie con el mismo precio, solo se le alimentan las barras nuevas; si no, se vuelve a
+    # sembrar. El inicio puede haber avanzado (el período es una ventana móvil): SMA y RSI dependen de las últimas barras,
+    # y el estado conserva además la historia anterior como calentamiento del RSI. Si la serie empieza antes que el estado,
+    # hay historia que el estado no vio y se siembra de nuevo.
+    if isinstance(close_prices, pd.Series): close_prices = close_prices.to_frame()
+    por_sembrar, filas = [], {}
+    with _lock_estados:
+        for ticker in close_prices.columns:
+            estado = _estados.get((clave, ticker)); serie = close_prices[ticker]
+            vigente = (estado is not None and len(serie) and estado.primera_fecha is not None and serie.index[0] >= estado.primera_fecha
+                       and estado.ultima_fecha in serie.index
+                       and (serie.loc[estado.ultima_fecha] == estado.ultimo_precio or (np.isnan(estado.ultimo_precio) and pd.isna(serie.loc[estado.ultima_fecha]))))
+            if not vigente: por_sembrar.append(ticker); continue
+            for fecha, precio in serie[serie.index > estado.ultima_fecha].items(): estado.update(precio, fecha)
+            _estados.move_to_end((clave, ticker)); filas[ticker] = estado.latest()
+    if por_sembrar:
+        sembrados = seed_states(close_prices[por_sembrar], rsi_length, sma_lengths)
+        with _lock_estados:
+            for ticker, estado in sembrados.items(): _guardar_estado(clave, ticker, estado); filas[ticker] = estado.latest()
+    return pd.DataFrame.from_dict(filas, orient='index').reindex(close_prices.columns)
+
+def save_states(ruta, clave=None):
+    with open(ruta, "w", encoding="utf-8") as f:
+        with _lock_estados: datos = {ticker: estado.to_dict() for (c, ticker), estado in _estados.items() if c == clave}
+        json.dump(datos, f)
+
+def load_states(ruta, clave=None):
+    with open(ruta, "r", encoding="utf-8") as f:
+        datos = json.load(f)
+    with _lock_estados:
+        for ticker, data in datos.items(): _guardar_estado(clave, ticker, IndicatorState.from_dict(data))
@@ -0,0 +1,84 @@
+# monte_carlo.py (Simulación Monte Carlo de Portafolios Aleatorios con Memoria Acotada)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+N_PORTAFOLIOS = 200_000
+# Memoria máxima por bloque (matriz de pesos más productos intermedios); fija el tamaño de cada bloque según el número de activos.
+MEMORIA_POR_BLOQUE = 64 * 1024 ** 2
+MAX_PUNTOS_GRAFICO = 20_000
+
+# --- SECCIÓN 2: EVALUACIÓN DE UN BLOQUE ---
+def _muestrear_pesos(rng, n, n_activos, alpha, max_peso):
+    # Dirichlet(alpha); con alpha = 1 basta normalizar exponenciales, que es bastante más rápido que gamma.
+    W = rng.standard_exponential((n, n_activos)) if alpha == 1.0 else rng.standard_gamma(alpha, (n, n_activos))
+    W /= W.sum(axis=1, keepdims=True)
+    if max_peso is not None: W = W[W.max(axis=1) <= max_peso]
+    return W
+
+def _evaluar_bloque(mu, S, n, semilla, risk_free_rate, alpha, max_peso, n_muestra):
+    rng = np.random.default_rng(semilla)
+    W = _muestrear_pesos(rng, n, len(mu), alpha, max_peso)
+    if not len(W): return {'n': 0}
+    rendimiento = W @ mu
+    volatilidad = np.sqrt(np.einsum('ij,ij->i', W @ S, W))
+    sharpe = (rendimiento - risk_free_rate) / volatilidad
+    muestra = rng.choice(len(W), size=min(n_muestra, len(W)), replace=False)
+    mejor, menor_vol = int(np.argmax(sharpe)), int(np.argmin(volatilidad))
+    return {'n': len(W), 'rendimiento': rendimiento[muestra], 'volatilidad': volatilidad[muestra], 'sharpe': sharpe[muestra],
+            'mejor': (sharpe[mejor], rendimiento[mejor], volatilidad[mejor], W[mejor]),
+            'menor_vol': (volatilidad[menor_vol], rendimiento[menor_vol], W[menor_vol])}
+
+def _evaluar_bloque_args(args):
+    return _evaluar_bloque(*args)
+
+# --- SECCIÓN 3: API PÚBLICA ---
+def simular_portafolios(mu, S, n_portafolios=N_PORTAFOLIOS, risk_free_rate=0.0, alpha=1.0, max_peso=None,
+                        n_workers=None, semilla=0, max_puntos=MAX_PUNTOS_GRAFICO):
+    # Evalúa `n_portafolios` en bloques de tamaño fijo repartidos en un pool de procesos. Solo se conserva una
+    # muestra acotada para el gráfico y los mejores portafolios, así la memoria no crece con `n_portafolios`.
+    tickers = list(mu.index)
+    mu_np, S_np = mu.to_numpy(dtype=float), S.loc[tickers, tickers].to_numpy(dtype=float)
+    bloque = int(max(1000, MEMORIA_POR_BLOQUE // (8 * 3 * len(tickers))))
+    tamanos = [bloque] * (n_portafolios // bloque) + ([n_portafolios % bloque] if n_portafolios % bloque else [])
+    n_muestra = max(1, -(-max_puntos // len(tamanos)))
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamanos))
+    tareas = [(mu_np, S_np, n, s, risk_free_rate, alpha, max_peso, n_muestra) for n, s in zip(tamanos, semillas)]
+    n_workers = n_workers or min(os.cpu_count() or 1, len(tareas))
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool: bloques = list(pool.map(_evaluar_bloque_args, tareas))
+    else:
+        bloques = [_evaluar_bloque(*t) for t in tareas]
+    bloques = [b for b in bloques if b['n']]
+    if not bloques: raise ValueError("Ningún portafolio aleatorio cumple las restricciones de peso.")
+    mejor = max((b['mejor'] for b in bloques), key=lambda m: m[0])
+    menor_vol = min((b['menor_vol'] for b in bloques), key=lambda m: m[0])
+    nube = pd.DataFrame({campo: np.concatenate([b[campo] for b in bloques]) for campo in ('rendimiento', 'volatilidad', 'sharpe')})
+    return {
+        'n_evaluados': sum(b['n'] for b in bloques),
+        'nube': nube.rename(columns={'rendimiento': 'Rendimiento', 'volatilidad': 'Volatilidad', 'sharpe': 'Sharpe'}),
+        'max_sharpe': {'sharpe': mejor[0], 'rendimiento': mejor[1], 'volatilidad': mejor[2], 'weights': dict(zip(tickers, mejor[3]))},
+        'min_volatilidad': {'volatilidad': menor_vol[0], 'rendimiento': menor_vol[1], 'weights': dict(zip(tickers, menor_vol[2]))},
+    }
+
+def simulacion_cacheada(resultado, n_portafolios=N_PORTAFOLIOS, n_workers=None):
+    # Igual que la frontera, la simulación se guarda en el resultado cacheado de optimization.optimize_portfolio.
+    if resultado.get('monte_carlo') is None:
+        resultado['monte_carlo'] = simular_portafolios(resultado['mu'], resultado['S'], n_portafolios, resultado['risk_free_rate'], n_workers=n_workers)
+    return resultado['monte_carlo']
+
+# --- SECCIÓN 4: GRÁFICO ---
+def agregar_nube(fig, simulacion):
+    # Añade la nube (coloreada por Sharpe) por debajo de las demás trazas de la figura de la frontera.
+    import plotly.graph_objects as go
+    nube = simulacion['nube']
+    traza = go.Scattergl(x=nube['Volatilidad'], y=nube['Rendimiento'], mode='markers', name=f"Portafolios Aleatorios ({simulacion['n_evaluados']:,})",
+                         marker=dict(color=nube['Sharpe'], colorscale='Viridis', size=3, opacity=0.5, colorbar=dict(title='Sharpe', thickness=12)))
+    # Plotly solo admite reordenar las trazas existentes: se añade al final y se mueve al principio.
+    fig.add_trace(traza)
+    fig.data = (fig.data[-1],) + tuple(fig.data[:-1])
+    return fig
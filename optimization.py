@@ -0,0 +1,122 @@
+# optimization.py (Optimización de Markowitz Calculada una Sola Vez y Cacheada por Huella de Datos)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+import profiling
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+# Resultados de optimización en memoria del proceso, compartidos entre sesiones; se expulsa el menos usado.
+MAX_ENTRADAS = 32
+# Estimadores incrementales de mu y S por (tickers, intervalo, método), para no recalcularlos sobre todo el histórico con cada barra nueva.
+MAX_ESTIMADORES = 16
+MIN_OBSERVACIONES = 60
+# Modelos de covarianza: los de contracción y el factorial mantienen S bien condicionada con cientos de activos.
+METODOS_COVARIANZA = {'ledoit_wolf': 'Ledoit-Wolf', 'oracle_approximating': 'Oracle Approximating', 'factor': 'Factorial (PCA)'}
+# Con universos grandes el solver por defecto puede agotar iteraciones; se reintenta con los siguientes.
+SOLVERS_ALTERNATIVOS = (None, 'CLARABEL', 'SCS')
+# pypfopt (y con él cvxpy) se importa dentro de cada función: la barra lateral usa este módulo y no debe pagar su importación.
+
+_cache = OrderedDict()
+_estimadores = OrderedDict()
+_lock = threading.Lock()
+
+# --- SECCIÓN 2: CLAVE DE CACHÉ ---
+def huella_precios(close_prices):
+    h = hashlib.sha1()
+    h.update(repr(list(close_prices.columns)).encode())
+    h.update(pd.util.hash_pandas_object(close_prices, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+def clave_optimizacion(close_prices, tickers, periodo, intervalo, risk_free_rate, metodo_covarianza='ledoit_wolf'):
+    return (tuple(tickers), periodo, intervalo, round(float(risk_free_rate), 10), metodo_covarianza, huella_precios(close_prices))
+
+# --- SECCIÓN 3: CÁLCULO ---
+def factor_covariance(close_prices, n_factores=None, frequency=252):
+    # Modelo de k factores estadísticos (PCA): S = B Bᵀ + D, con D la varianza idiosincrática de cada activo.
+    # Es definida positiva aunque haya más activos que observaciones.
+    from pypfopt import expected_returns
+    retornos = expected_returns.returns_from_prices(close_prices).fillna(0.0)
+    X = (retornos - retornos.mean()).to_numpy()
+    n_obs, n_activos = X.shape
+    if n_factores is None: n_factores = min(5 + n_activos // 50, 20)
+    n_factores = max(1, min(n_factores, n_activos - 1, n_obs - 1))
+    _, valores, vectores = np.linalg.svd(X, full_matrices=False)
+    cargas = vectores[:n_factores].T * (valores[:n_factores] / np.sqrt(n_obs - 1))
+    sistematica = cargas @ cargas.T
+    idiosincratica = np.maximum((X ** 2).sum(axis=0) / (n_obs - 1) - np.diag(sistematica), 1e-10)
+    S = (sistematica + np.diag(idiosincratica)) * frequency
+    return pd.DataFrame(S, index=close_prices.columns, columns=close_prices.columns)
+
+def matriz_covarianza(close_prices, metodo_covarianza='ledoit_wolf'):
+    if metodo_covarianza == 'factor': return factor_covariance(close_prices)
+    from pypfopt import risk_models
+    return risk_models.risk_matrix(close_prices, method=metodo_covarianza)
+
+def calcular_optimizacion(close_prices, risk_free_rate, metodo_covarianza='ledoit_wolf', mu=None, S=None):
+    # `mu` y `S` pueden llegar ya estimados (p. ej. de incremental_estimators en ventanas móviles); si no, se calculan aquí.
+    close_prices = close_prices.dropna(how='all').ffill()
+    if len(close_prices) < MIN_OBSERVACIONES:
+        raise ValueError("Datos históricos comunes insuficientes. Intente con un período más largo.")
+    from pypfopt import EfficientFrontier, expected_returns
+    from pypfopt.exceptions import OptimizationError
+    if mu is None:
+        with profiling.etapa("Retornos esperados (EMA)", filas=len(close_prices)):
+            mu = expected_returns.ema_historical_return(close_prices)
+    if S is None:
+        with profiling.etapa(f"Covarianza ({metodo_covarianza})", filas=len(close_prices)):
+            S = matriz_covarianza(close_prices, metodo_covarianza)
+    for solver in SOLVERS_ALTERNATIVOS:
+        ef = EfficientFrontier(mu, S, solver=solver)
+        try:
+            with profiling.etapa(f"max_sharpe ({solver or 'por defecto'})"): ef.max_sharpe(risk_free_rate=risk_free_rate)
+            break
+        except OptimizationError:
+            if solver == SOLVERS_ALTERNATIVOS[-1]: raise
+    cleaned_weights = ef.clean_weights()
+    rendimiento, volatilidad, sharpe = ef.portfolio_performance(verbose=False, risk_free_rate=risk_free_rate)
+    return {'mu': mu, 'S': S, 'weights': dict(cleaned_weights), 'rendimiento': rendimiento, 'volatilidad': volatilidad,
+            'sharpe': sharpe, 'risk_free_rate': risk_free_rate, 'metodo_covarianza': metodo_covarianza, 'frontera': None}
+
+def estimacion_incremental(close_prices, intervalo, metodo_covarianza='ledoit_wolf'):
+    # (mu, S) iguales a los de pypfopt sobre todo `close_prices`, manteniendo un IncrementalEstimator entre ejecuciones:
+    # con una barra nueva solo se suma esa barra (y se resta la que sale si el período desplaza su inicio). Devuelve
+    # (None, None) si el método no tiene versión incremental o hay huecos (pypfopt los trata de otra forma).
+    import incremental_estimators
+    close_prices = close_prices.dropna(how='all').ffill()
+    if metodo_covarianza not in incremental_estimators.METODOS_INCREMENTALES or close_prices.isna().to_numpy().any(): return None, None
+    retornos = incremental_estimators.retornos_de_precios(close_prices)
+    clave = (tuple(close_prices.columns), intervalo, metodo_covarianza)
+    # El estimador se saca de la caché mientras se usa: dos sesiones a la vez nunca modifican el mismo estado.
+    with _lock:
+        estimador = _estimadores.pop(clave, None)
+    with profiling.etapa("Estimación incremental de mu y S", filas=len(retornos)):
+        if estimador is None or not estimador.actualizar(retornos):
+            estimador = incremental_estimators.IncrementalEstimator(retornos)
+        estimador.mover(0, len(retornos))
+        mu, S = estimador.retornos_esperados(), estimador.covarianza(metodo_covarianza)
+    with _lock:
+        _estimadores[clave] = estimador
+        while len(_estimadores) > MAX_ESTIMADORES: _estimadores.popitem(last=False)
+    return mu, S
+
+# --- SECCIÓN 4: API PÚBLICA ---
+def optimize_portfolio(close_prices, tickers, periodo, intervalo, risk_free_rate, metodo_covarianza='ledoit_wolf'):
+    # Un solo cálculo de (mu, S, max_sharpe) por combinación de entradas; las repeticiones salen de la caché.
+    clave = clave_optimizacion(close_prices, tickers, periodo, intervalo, risk_free_rate, metodo_covarianza)
+    with _lock:
+        if clave in _cache:
+            _cache.move_to_end(clave)
+            return _cache[clave]
+    with profiling.etapa("Optimización de Markowitz", filas=len(close_prices)):
+        mu, S = estimacion_incremental(close_prices, intervalo, metodo_covarianza) if len(close_prices) >= MIN_OBSERVACIONES else (None, None)
+        resultado = calcular_optimizacion(close_prices, risk_free_rate, metodo_covarianza, mu=mu, S=S)
+    resultado['clave'] = clave
+    with _lock:
+        _cache[clave] = resultado
+        while len(_cache) > MAX_ENTRADAS: _cache.popitem(last=False)
+    return resultado
@@ -0,0 +1,254 @@
+# performance_benchmark.py (Banco de Rendimiento sin Red: Tiempo y Pico de Memoria de Cada Etapa de Cálculo)
+#
+# Uso: python performance_benchmark.py [--tamanos 10,50,200] [--anios 5] [--intervalo 1d] [--repeticiones 3]
+#      [--etapas estimacion,max_sharpe,...] [--salida benchmark_resultados.json] [--linea-base anterior.json] [--tolerancia 0.25]
+# Genera paneles de precios y fundamentales sintéticos de cada tamaño (tickers x años x frecuencia) y ejecuta sobre
+# ellos los núcleos de cálculo de las páginas, sin Streamlit ni red. Con --linea-base compara contra un archivo de
+# resultados anterior y termina con código 1 si alguna etapa supera su umbral de tiempo o de memoria.
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import sys
+import json
+import time
+import argparse
+import warnings
+import platform
+import statistics
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+TAMANOS = (10, 50, 200)
+BARRAS_POR_ANIO = {'1d': 252, '1mo': 12}
+TASA_LIBRE = 0.02
+TOLERANCIA = 0.25
+# Holgura absoluta de los umbrales: por debajo de unos milisegundos la variación entre ejecuciones es puro ruido.
+MARGEN_MINIMO_S = 0.01
+MARGEN_MINIMO_MB = 1.0
+# Etapas demasiado lentas para universos grandes: por encima de este número de tickers se omiten.
+MAX_TICKERS = {'backtest_bt': 200, 'frontera': 500}
+# Mismos rangos que data_providers.write_synthetic_dataset, más la cobertura de intereses que allí sale de los estados financieros.
+RANGOS_FUNDAMENTALES = {
+    "trailingPE": (5, 60), "pegRatio": (0.5, 4), "priceToSalesTrailing12Months": (0.5, 15), "priceToBook": (0.5, 20),
+    "enterpriseToRevenue": (0.5, 15), "enterpriseToEbitda": (3, 40), "returnOnAssets": (-0.05, 0.25), "returnOnEquity": (-0.1, 0.6),
+    "profitMargins": (-0.1, 0.4), "debtToEquity": (0, 3), "interestCoverage": (1, 50), "currentRatio": (0.5, 3), "quickRatio": (0.3, 2.5),
+    "dividendYield": (0, 0.06), "payoutRatio": (0, 1.2), "beta": (0.4, 2),
+}
+
+# --- SECCIÓN 2: DATOS SINTÉTICOS ---
+def panel_sintetico(n_tickers, anios=5, intervalo='1d', semilla=0):
+    # Cierres por movimiento browniano geométrico (como write_synthetic_dataset), generados en memoria para todo el panel.
+    rng = np.random.default_rng([semilla, n_tickers])
+    barras = int(BARRAS_POR_ANIO.get(intervalo, 252) * anios)
+    fin = pd.Timestamp('2025-01-01')
+    fechas = pd.bdate_range(end=fin, periods=barras) if intervalo == '1d' else pd.date_range(end=fin, periods=barras, freq='MS')
+    paso = 1 / BARRAS_POR_ANIO.get(intervalo, 252)
+    drift, vol = rng.uniform(0.02, 0.15, n_tickers), rng.uniform(0.15, 0.45, n_tickers)
+    retornos = (drift - 0.5 * vol ** 2) * paso + vol * np.sqrt(paso) * rng.standard_normal((barras, n_tickers))
+    close = rng.uniform(20, 300, n_tickers) * np.exp(np.cumsum(retornos, axis=0))
+    return pd.DataFrame(close, index=pd.DatetimeIndex(fechas, name='Date'), columns=[f"SIM{i:04d}" for i in range(n_tickers)])
+
+def fundamentales_sinteticos(tickers, semilla=0):
+    # Registros con la misma forma que fundamental_analysis.get_fundamental_data.
+    from fundamental_analysis import RATIO_MAP
+    rng = np.random.default_rng([semilla, len(tickers)])
+    registros = []
+    for ticker in tickers:
+        registro = {"Ticker": ticker, "Nombre": f"{ticker} Synthetic Corp."}
+        for rats in RATIO_MAP.values():
+            for nombre, clave in rats.items(): registro[nombre] = rng.uniform(*RANGOS_FUNDAMENTALES[clave])
+        registros.append(registro)
+    return registros
+
+# --- SECCIÓN 3: ETAPAS ---
+# Cada etapa recibe el contexto de un tamaño (precios, mu, S, pesos, fundamentales) y ejecuta el mismo cálculo que la
+# página correspondiente. Las importaciones van dentro: su coste se paga en la ronda de calentamiento, no en la medición.
+def _estimacion(ctx):
+    import optimization
+    from pypfopt import expected_returns
+    return expected_returns.ema_historical_return(ctx['precios']), optimization.matriz_covarianza(ctx['precios'], ctx['covarianza'])
+
+def _max_sharpe(ctx):
+    import optimization
+    return optimization.calcular_optimizacion(ctx['precios'], TASA_LIBRE, ctx['covarianza'], mu=ctx['mu'], S=ctx['S'])
+
+def _frontera(ctx):
+    import frontier
+    return frontier.calcular_frontera(ctx['mu'], ctx['S'])
+
+def _monte_carlo(ctx):
+    # Un solo proceso: mide el coste por núcleo, no el reparto del pool.
+    import monte_carlo
+    return monte_carlo.simular_portafolios(ctx['mu'], ctx['S'], risk_free_rate=TASA_LIBRE, n_workers=1)
+
+def _backtest_bt(ctx):
+    import strategy_analysis
+    return strategy_analysis.run_backtest_bt(ctx['precios'], ctx['pesos'])
+
+def _backtest_vectorizado(ctx):
+    import backtest_engine
+    return backtest_engine.run_backtest(ctx['precios'], ctx['pesos'])
+
+def _riesgo(ctx):
+    import backtest_engine
+    import risk_analytics
+    equity = backtest_engine.run_backtest(ctx['precios'], ctx['pesos'])['equity'].iloc[:, 0]
+    return risk_analytics.analizar(ctx['precios'], equity, ctx['intervalo'], TASA_LIBRE)
+
+def _indicadores(ctx):
+    # Panel completo, últimos valores e interpretación por ticker, como technical_analysis.display_page sin el estado incremental.
+    import indicators
+    import technical_analysis
+    panel = indicators.compute_indicator_panel(ctx['precios'], rsi_length=14, sma_lengths=(50, 200))
+    ultimos = indicators.latest_values(panel, ctx['precios'])
+    return [technical_analysis.interpretar_indicadores(f['RSI_14'], f['SMA_50'], f['SMA_200'], f['Close']) for _, f in ultimos.iterrows()]
+
+def _indicadores_incremental(ctx):
+    # Siembra el estado sin la última barra y lo actualiza con la ventana del período desplazada una barra (como al
+    # llegar un precio nuevo al almacén). Falla si la actualización vuelve a sembrar o se aparta del cálculo completo.
+    import indicators
+    clave = ('benchmark', time.perf_counter_ns())
+    indicators.update_states(ctx['precios'].iloc[:-1], clave=clave)
+    sembrados = {t: indicators._estados[(clave, t)] for t in ctx['precios'].columns}
+    ultimos = indicators.update_states(ctx['precios'].iloc[1:], clave=clave)
+    resembrados = [t for t, estado in sembrados.items() if indicators._estados.get((clave, t)) is not estado]
+    with indicators._lock_estados:
+        for t in ctx['precios'].columns: indicators._estados.pop((clave, t), None)
+    if resembrados: raise AssertionError(f"update_states volvió a sembrar {len(resembrados)} tickers tras una barra nueva")
+    completo = indicators.latest_values(indicators.compute_indicator_panel(ctx['precios'].iloc[1:]), ctx['precios'].iloc[1:])
+    if not np.allclose(ultimos.to_numpy(float), completo[ultimos.columns].to_numpy(float), rtol=1e-6, equal_nan=True):
+        raise AssertionError("update_states no coincide con el panel completo")
+    return ultimos
+
+def _fundamental(ctx):
+    import fundamental_analysis
+    df_numeric = fundamental_analysis.construir_matriz_ratios(ctx['fundamentales'])
+    fundamental_analysis.highlight_best(df_numeric)
+    return fundamental_analysis.generar_analisis_ia_por_rangos(df_numeric)
+
+ETAPAS = {
+    'estimacion': _estimacion, 'max_sharpe': _max_sharpe, 'frontera': _frontera, 'monte_carlo': _monte_carlo,
+    'backtest_bt': _backtest_bt, 'backtest_vectorizado': _backtest_vectorizado, 'riesgo': _riesgo,
+    'indicadores': _indicadores, 'indicadores_incremental': _indicadores_incremental, 'fundamental': _fundamental,
+}
+
+def contexto(n_tickers, anios=5, intervalo='1d', covarianza='ledoit_wolf', semilla=0):
+    precios = panel_sintetico(n_tickers, anios, intervalo, semilla)
+    ctx = {'precios': precios, 'intervalo': intervalo, 'covarianza': covarianza, 'pesos': {t: 1.0 / n_tickers for t in precios.columns},
+           'fundamentales': fundamentales_sinteticos(list(precios.columns), semilla)}
+    ctx['mu'], ctx['S'] = _estimacion(ctx)
+    return ctx
+
+# --- SECCIÓN 4: MEDICIÓN ---
+def medir_etapa(funcion, ctx, repeticiones=3, memoria=True):
+    # Mediana y mínimo de `repeticiones` ejecuciones; el pico de memoria se mide en una ejecución aparte con tracemalloc
+    # (que ralentiza el cálculo y no debe contaminar los tiempos).
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter(); funcion(ctx); tiempos.append(time.perf_counter() - inicio)
+    pico = None
+    if memoria:
+        tracemalloc.start()
+        try:
+            funcion(ctx); pico = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        finally:
+            tracemalloc.stop()
+    return {'s': statistics.median(tiempos), 's_min': min(tiempos), 'mb_pico': pico}
+
+def exponente_escalado(filas):
+    # Pendiente de log(tiempo) frente a log(tickers): ~1 lineal, ~2 cuadrático, ~3 cúbico.
+    puntos = [(f['tickers'], f['s']) for f in filas if f.get('s')]
+    if len(puntos) < 2: return None
+    x, y = np.log([p[0] for p in puntos]), np.log([p[1] for p in puntos])
+    return round(float(np.polyfit(x, y, 1)[0]), 2)
+
+def ejecutar(tamanos=TAMANOS, anios=5, intervalo='1d', etapas=tuple(ETAPAS), repeticiones=3, memoria=True, covarianza='ledoit_wolf'):
+    tamanos = sorted(tamanos)
+    # Calentamiento con el tamaño menor: importaciones, compilación de cvxpy y cachés de primera llamada.
+    calentamiento = contexto(tamanos[0], anios, intervalo, covarianza)
+    for etapa in etapas:
+        try: ETAPAS[etapa](calentamiento)
+        except Exception: pass
+    filas = []
+    for n in tamanos:
+        ctx = contexto(n, anios, intervalo, covarianza)
+        for etapa in etapas:
+            fila = {'etapa': etapa, 'tickers': n, 'barras': len(ctx['precios']), 'estado': 'ok'}
+            if n > MAX_TICKERS.get(etapa, n):
+                fila['estado'] = 'omitido'
+            else:
+                try: fila.update(medir_etapa(ETAPAS[etapa], ctx, repeticiones, memoria))
+                except ImportError as e: fila.update(estado='sin dependencia', error=str(e))
+                except Exception as e: fila.update(estado='error', error=f"{type(e).__name__}: {e}")
+            filas.append(fila)
+            print(f"  {etapa:<24} {n:>6} tickers  " + (f"{fila['s']:9.4f} s" + (f"  {fila['mb_pico']:9.1f} MB" if fila.get('mb_pico') is not None else "")
+                                                     if fila['estado'] == 'ok' else fila['estado']), flush=True)
+    escalado = {etapa: exponente_escalado([f for f in filas if f['etapa'] == etapa and f['estado'] == 'ok']) for etapa in etapas}
+    return filas, escalado
+
+# --- SECCIÓN 5: UMBRALES DE REGRESIÓN ---
+def umbrales(linea_base, tolerancia=TOLERANCIA):
+    # Por (etapa, tickers, barras): tiempo y memoria de la línea base más la tolerancia relativa (con una holgura mínima).
+    return {(f['etapa'], f['tickers'], f['barras']): {
+                's': max(f['s'] * (1 + tolerancia), f['s'] + MARGEN_MINIMO_S),
+                'mb_pico': None if f.get('mb_pico') is None else max(f['mb_pico'] * (1 + tolerancia), f['mb_pico'] + MARGEN_MINIMO_MB)}
+            for f in linea_base['resultados'] if f.get('estado') == 'ok'}
+
+def comparar(filas, linea_base, tolerancia=TOLERANCIA):
+    # Anota en cada fila su umbral y devuelve las regresiones (etapas medidas que superan el umbral de la línea base).
+    limites, regresiones = umbrales(linea_base, tolerancia), []
+    for fila in filas:
+        limite = limites.get((fila['etapa'], fila['tickers'], fila['barras']))
+        if limite is None or fila['estado'] != 'ok': continue
+        fila['umbral_s'], fila['umbral_mb'] = limite['s'], limite['mb_pico']
+        if fila['s'] > limite['s']:
+            regresiones.append({'etapa': fila['etapa'], 'tickers': fila['tickers'], 'medida': 's', 'valor': fila['s'], 'umbral': limite['s']})
+        if limite['mb_pico'] is not None and fila.get('mb_pico') is not None and fila['mb_pico'] > limite['mb_pico']:
+            regresiones.append({'etapa': fila['etapa'], 'tickers': fila['tickers'], 'medida': 'mb_pico', 'valor': fila['mb_pico'], 'umbral': limite['mb_pico']})
+    return regresiones
+
+# --- SECCIÓN 6: EJECUCIÓN ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tiempo y pico de memoria de cada etapa de cálculo sobre datos sintéticos, sin red.")
+    parser.add_argument("--tamanos", default=",".join(map(str, TAMANOS)), help="Números de tickers separados por comas.")
+    parser.add_argument("--anios", type=float, default=5)
+    parser.add_argument("--intervalo", choices=list(BARRAS_POR_ANIO), default='1d')
+    parser.add_argument("--covarianza", default='ledoit_wolf')
+    parser.add_argument("--etapas", default=",".join(ETAPAS), help="Etapas a medir, separadas por comas.")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--sin-memoria", action="store_true", help="No mide el pico de memoria (evita la ejecución extra con tracemalloc).")
+    parser.add_argument("--salida", default="benchmark_resultados.json")
+    parser.add_argument("--linea-base", help="Resultados anteriores contra los que detectar regresiones.")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA, help="Aumento relativo permitido sobre la línea base.")
+    args = parser.parse_args(argv)
+    etapas = [e.strip() for e in args.etapas.split(",") if e.strip()]
+    desconocidas = [e for e in etapas if e not in ETAPAS]
+    if desconocidas: parser.error(f"Etapas desconocidas: {', '.join(desconocidas)}. Disponibles: {', '.join(ETAPAS)}")
+    tamanos = [int(t) for t in args.tamanos.split(",") if t.strip()]
+    # Los avisos de precisión de cvxpy en la frontera no afectan a la medición y ensucian la tabla.
+    warnings.filterwarnings("ignore", category=UserWarning, module="cvxpy")
+
+    print(f"Banco de rendimiento: {tamanos} tickers x {args.anios:g} años ({args.intervalo}), {args.repeticiones} repeticiones")
+    filas, escalado = ejecutar(tamanos, args.anios, args.intervalo, etapas, args.repeticiones, not args.sin_memoria, args.covarianza)
+    print("\nExponente de escalado con el número de tickers (1 = lineal, 2 = cuadrático):")
+    for etapa, exponente in escalado.items(): print(f"  {etapa:<24} {'-' if exponente is None else exponente}")
+    regresiones = []
+    if args.linea_base:
+        with open(args.linea_base, "r", encoding="utf-8") as f: regresiones = comparar(filas, json.load(f), args.tolerancia)
+    resultado = {'python': sys.version.split()[0], 'plataforma': platform.platform(), 'fecha': pd.Timestamp.now().isoformat(timespec='seconds'),
+                 'parametros': {'tamanos': tamanos, 'anios': args.anios, 'intervalo': args.intervalo, 'covarianza': args.covarianza,
+                                'repeticiones': args.repeticiones, 'tolerancia': args.tolerancia, 'linea_base': args.linea_base},
+                 'resultados': filas, 'escalado': escalado, 'regresiones': regresiones}
+    with open(args.salida, "w", encoding="utf-8") as f: json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {args.salida}")
+    for r in regresiones:
+        unidad = 's' if r['medida'] == 's' else 'MB'
+        print(f"Regresión: {r['etapa']} con {r['tickers']} tickers: {r['valor']:.4f} {unidad} supera el umbral de {r['umbral']:.4f} {unidad}.")
+    # Una etapa con error (p. ej. una comprobación de indicadores_incremental) también cuenta como fallo.
+    errores = [f for f in filas if f['estado'] == 'error']
+    for f in errores: print(f"Error: {f['etapa']} con {f['tickers']} tickers: {f['error']}")
+    return 1 if regresiones or errores else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
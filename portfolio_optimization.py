@@ -3,9 +3,11 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from pypfopt import EfficientFrontier, risk_models, expected_returns
-from pypfopt import plotting
-import matplotlib.pyplot as plt
+
+import optimization
+import frontier
+import monte_carlo
+import profiling
 
 def generar_conclusion_optimizacion(pesos, rendimiento, volatilidad, sharpe, ticker_names):
     # ... (código de esta función sin cambios) ...
@@ -24,24 +26,17 @@ def generar_conclusion_optimizacion(pesos, rendimiento, volatilidad, sharpe, tic
     return texto_conclusion
 
 
-def display_page(close_prices, valid_tickers, frecuencia, risk_free_rate, ticker_names):
+def display_page(close_prices, valid_tickers, frecuencia, risk_free_rate, ticker_names, resultado=None):
     st.header("Optimización de Portafolio - Teoría de Markowitz")
     st.info(f"Cálculos realizados con una Tasa Libre de Riesgo del **{risk_free_rate:.2%}**.")
 
     # ... (validaciones de frecuencia, etc.) ...
 
     try:
-        close_prices = close_prices.dropna(how='all').fillna(method='ffill')
-        if len(close_prices) < 60:
-             raise ValueError("Datos históricos comunes insuficientes. Intente con un período más largo.")
-
-        mu = expected_returns.ema_historical_return(close_prices)
-        S = risk_models.risk_matrix(close_prices, method='ledoit_wolf')
-        
-        ef_calculo = EfficientFrontier(mu, S)
-        weights = ef_calculo.max_sharpe(risk_free_rate=risk_free_rate)
-        cleaned_weights = ef_calculo.clean_weights()
-        rendimiento, volatilidad, sharpe = ef_calculo.portfolio_performance(verbose=False, risk_free_rate=risk_free_rate)
+        # El resultado llega ya calculado (y cacheado) desde app.py; solo se recalcula si no se proporcionó.
+        if resultado is None: resultado = optimization.calcular_optimizacion(close_prices, risk_free_rate)
+        cleaned_weights = resultado['weights']
+        rendimiento, volatilidad, sharpe = resultado['rendimiento'], resultado['volatilidad'], resultado['sharpe']
 
         st.subheader("Portafolio Óptimo (Máximo Ratio de Sharpe)")
         pesos_df = pd.DataFrame.from_dict(cleaned_weights, orient='index', columns=['Peso'])
@@ -73,19 +68,19 @@ def display_page(close_prices, valid_tickers, frecuencia, risk_free_rate, ticker
         # --- CAMBIO CLAVE 2 y 3: REDUCIR Y OCULTAR GRÁFICO DE FRONTERA ---
         # Se coloca toda la sección del gráfico dentro de un expander para de-enfatizarla.
         with st.expander("Ver Análisis Gráfico de la Frontera Eficiente"):
-            ef_grafico = EfficientFrontier(mu, S)
-
-            # Se reduce el tamaño del gráfico a 7x4 para hacerlo más compacto.
-            fig_frontier, ax = plt.subplots(figsize=(7, 4))
-            
-            plotting.plot_efficient_frontier(ef_grafico, ax=ax, show_assets=True, show_tickers=True)
-            ax.scatter(volatilidad, rendimiento, marker="*", s=150, c="red", label="Portafolio Óptimo")
-            ax.set_title("Frontera Eficiente y CML", fontsize=12)
-            ax.legend(); plt.tight_layout()
-            st.pyplot(fig_frontier)
+            # La curva se calcula una sola vez por resultado de optimización y queda cacheada junto a mu/S.
+            with profiling.etapa("Frontera eficiente"):
+                frontera_df = frontier.frontera_cacheada(resultado)
+            fig_frontera = frontier.figura_frontera(resultado, frontera_df)
+            with st.spinner("Simulando portafolios aleatorios..."), profiling.etapa("Monte Carlo") as registro:
+                simulacion = monte_carlo.simulacion_cacheada(resultado)
+                registro['filas'] = simulacion['n_evaluados']
+            with profiling.etapa("Gráfico de la frontera", tipo='render'):
+                monte_carlo.agregar_nube(fig_frontera, simulacion)
+                st.plotly_chart(fig_frontera, use_container_width=True)
             
             st.info("""
-            **Interpretación Rápida:** La **estrella roja** representa su portafolio, ubicado en el punto óptimo de la **curva azul** (la Frontera Eficiente). Este punto ofrece el máximo retorno posible para el menor riesgo asumido.
+            **Interpretación Rápida:** La **estrella roja** representa su portafolio, ubicado en el punto óptimo de la **curva azul** (la Frontera Eficiente). Este punto ofrece el máximo retorno posible para el menor riesgo asumido. La **nube de puntos** muestra miles de portafolios aleatorios: ninguno supera a la frontera.
             """)
         
         st.markdown("---")
@@ -0,0 +1,121 @@
+# prefetch.py (Precarga en Segundo Plano de Metadatos y Precios mientras se Configura la Ejecución)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import price_store
+import ticker_metadata
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+# ANALYTIX_PREFETCH=0 desactiva la precarga. Un único hilo para todo el proceso: las precargas de todas las sesiones
+# se ejecutan en cola y nunca compiten entre sí por la API.
+ACTIVA = os.environ.get("ANALYTIX_PREFETCH", "1") != "0"
+# Segundos que deben pasar sin cambios en la configuración antes de consultar la red.
+RETARDO = 0.8
+# Universos más grandes no se precargan (el Screener trae su propio universo y su propia concurrencia).
+MAX_TICKERS = 50
+# Tiempo máximo que "Ejecutar Análisis" espera a una precarga ya en curso con la misma configuración.
+ESPERA_MAXIMA = 30
+VIGENCIA_METADATOS = 15 * 60
+
+_lock = threading.Lock()
+_trabajos = {}  # clave -> trabajo
+_por_sesion = {}  # id de sesión de Streamlit -> clave de su última precarga
+_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+
+# --- SECCIÓN 2: SOPORTE ---
+def _id_sesion():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        return ctx.session_id if ctx is not None else None
+    except Exception:
+        return None
+
+def _clave(tickers, periodo, intervalo, precios):
+    # Sin precios la clave no depende del período ni del intervalo: cambiarlos no relanza la validación.
+    return (tuple(sorted(tickers)), periodo if precios else None, intervalo if precios else None)
+
+def _vigencia(clave):
+    return price_store.REFRESH_SECONDS.get(clave[2], 15 * 60) if clave[1] is not None else VIGENCIA_METADATOS
+
+def _soltar(clave, sesion):
+    # La sesión deja de necesitar la precarga; si ninguna otra la comparte, se cancela (antes de empezar o en el
+    # siguiente punto de control: una descarga ya lanzada al proveedor termina igualmente).
+    trabajo = _trabajos.get(clave)
+    if trabajo is None: return
+    trabajo['sesiones'].discard(sesion)
+    if trabajo['sesiones'] or trabajo['hecho'].is_set(): return
+    trabajo['cancelado'].set()
+    trabajo['futuro'].cancel()
+    del _trabajos[clave]
+
+def _purgar(ahora):
+    for clave in [c for c, t in _trabajos.items() if t['hecho'].is_set() and ahora - t['terminado'] > _vigencia(c)]:
+        del _trabajos[clave]
+    for sesion in [s for s, c in _por_sesion.items() if c not in _trabajos]:
+        del _por_sesion[sesion]
+
+# --- SECCIÓN 3: TRABAJO EN SEGUNDO PLANO ---
+def _ejecutar(trabajo):
+    tickers, periodo, intervalo = trabajo['clave']
+    try:
+        # Espera de asentamiento: si la configuración cambia antes, la precarga se cancela sin haber tocado la red.
+        if trabajo['cancelado'].wait(RETARDO): return
+        trabajo['estado'] = 'validando'
+        validos = ticker_metadata.fetch_metadata(list(tickers))['valid_tickers']
+        if periodo is None or not validos or trabajo['cancelado'].is_set(): return
+        trabajo['estado'] = 'descargando'
+        price_store.actualizar(validos, periodo, intervalo)
+    except Exception:
+        trabajo['estado'] = 'error'
+    finally:
+        if trabajo['estado'] != 'error': trabajo['estado'] = 'cancelado' if trabajo['cancelado'].is_set() else 'listo'
+        trabajo['terminado'] = time.time()
+        trabajo['hecho'].set()
+
+# --- SECCIÓN 4: API PÚBLICA ---
+def programar(tickers, periodo, intervalo, precios=True):
+    # Se llama en cada ejecución del script con la configuración actual de la barra lateral. La misma configuración
+    # (de esta u otra sesión) reutiliza la precarga existente; una configuración nueva cancela la anterior de la sesión.
+    tickers = [t for t in dict.fromkeys(tickers) if t]
+    if not ACTIVA or not tickers or len(tickers) > MAX_TICKERS: return None
+    clave, sesion, ahora = _clave(tickers, periodo, intervalo, precios), _id_sesion(), time.time()
+    with _lock:
+        _purgar(ahora)
+        anterior = _por_sesion.get(sesion)
+        if anterior is not None and anterior != clave: _soltar(anterior, sesion)
+        trabajo = _trabajos.get(clave)
+        if trabajo is None:
+            trabajo = {'clave': clave, 'estado': 'pendiente', 'sesiones': set(), 'creado': ahora, 'terminado': None,
+                       'cancelado': threading.Event(), 'hecho': threading.Event()}
+            trabajo['futuro'] = _worker.submit(_ejecutar, trabajo)
+            _trabajos[clave] = trabajo
+        trabajo['sesiones'].add(sesion)
+        _por_sesion[sesion] = clave
+    return clave
+
+def esperar(tickers, periodo, intervalo, precios=True, timeout=ESPERA_MAXIMA):
+    # Al pulsar "Ejecutar Análisis": si la precarga de esta configuración ya está consultando la red se espera a que
+    # termine, así la ejecución encuentra los datos en disco y no repite las mismas peticiones. Una precarga que aún
+    # no empezó (o la de otra configuración) se cancela y la ejecución descarga por su cuenta.
+    tickers = [t for t in dict.fromkeys(tickers) if t]
+    if not ACTIVA or not tickers: return None
+    clave, sesion = _clave(tickers, periodo, intervalo, precios), _id_sesion()
+    with _lock:
+        anterior = _por_sesion.pop(sesion, None)
+        trabajo = _trabajos.get(clave)
+        en_curso = trabajo is not None and trabajo['estado'] in ('validando', 'descargando')
+        if anterior is not None and not (anterior == clave and en_curso): _soltar(anterior, sesion)
+    if not en_curso: return trabajo['estado'] if trabajo is not None else None
+    trabajo['hecho'].wait(timeout)
+    return trabajo['estado']
+
+def estado():
+    # Estado de la precarga de la sesión actual: 'pendiente', 'validando', 'descargando', 'listo', 'cancelado', 'error' o None.
+    with _lock:
+        trabajo = _trabajos.get(_por_sesion.get(_id_sesion()))
+        return trabajo['estado'] if trabajo is not None else None
@@ -0,0 +1,151 @@
+# price_store.py (Almacén Local de Precios con Descarga Incremental)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import os
+import json
+import time
+import threading
+import pandas as pd
+
+import data_providers
+import profiling
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+# Un archivo Parquet por ticker e intervalo, más un manifiesto JSON con la última barra y la cobertura descargada.
+# Cada proveedor de datos tiene su propia subcarpeta para no mezclar precios reales con datos de reproducción.
+STORE_DIR = os.environ.get("ANALYTIX_PRICE_STORE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".price_store"))
+CAMPOS_OHLCV = data_providers.CAMPOS_OHLCV
+# Segundos durante los cuales un ticker recién actualizado se sirve desde disco sin consultar la red.
+REFRESH_SECONDS = {"1d": 15 * 60, "1mo": 12 * 3600}
+# Diferencia relativa máxima en la barra solapada antes de asumir que el histórico fue re-ajustado (splits/dividendos).
+TOLERANCIA_AJUSTE = 1e-4
+
+_lock = threading.Lock()
+
+# --- SECCIÓN 2: PERSISTENCIA EN DISCO ---
+def _directorio():
+    return os.path.join(STORE_DIR, data_providers.get_provider().name)
+
+def _clave(ticker, interval):
+    return f"{ticker.replace(os.sep, '_')}_{interval}"
+
+def _ruta(ticker, interval):
+    return os.path.join(_directorio(), f"{_clave(ticker, interval)}.parquet")
+
+def _ruta_manifiesto():
+    return os.path.join(_directorio(), "manifest.json")
+
+def _leer_manifiesto():
+    try:
+        with open(_ruta_manifiesto(), "r", encoding="utf-8") as f: return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError): return {}
+
+def _guardar_manifiesto(manifiesto):
+    os.makedirs(_directorio(), exist_ok=True)
+    tmp = _ruta_manifiesto() + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f: json.dump(manifiesto, f, indent=1, sort_keys=True)
+    os.replace(tmp, _ruta_manifiesto())
+
+def _leer(ticker, interval):
+    try: return pd.read_parquet(_ruta(ticker, interval), memory_map=True)
+    except (FileNotFoundError, OSError): return None
+
+def _escribir(ticker, interval, df):
+    os.makedirs(_directorio(), exist_ok=True)
+    ruta = _ruta(ticker, interval); tmp = ruta + ".tmp"
+    df.to_parquet(tmp)
+    os.replace(tmp, ruta)
+
+# --- SECCIÓN 3: DESCARGA DESDE EL PROVEEDOR DE DATOS ---
+def _inicio_periodo(period):
+    return data_providers.inicio_periodo(period, data_providers.get_provider().fecha_referencia())
+
+def _normalizar(df):
+    df = df.dropna(how='all')
+    if getattr(df.index, 'tz', None) is not None: df.index = df.index.tz_localize(None)
+    df.index.name = 'Date'
+    return df[[c for c in CAMPOS_OHLCV if c in df.columns]].sort_index()
+
+def _separar_por_ticker(data, tickers):
+    # El proveedor devuelve columnas (Campo, Ticker) o planas según la versión y el número de tickers.
+    frames = {}
+    if data is None or data.empty: return frames
+    if isinstance(data.columns, pd.MultiIndex):
+        nivel = 1 if set(tickers) & set(data.columns.get_level_values(1)) else 0
+        for ticker in tickers:
+            if ticker in data.columns.get_level_values(nivel):
+                df = _normalizar(data.xs(ticker, axis=1, level=nivel))
+                if not df.empty: frames[ticker] = df
+    elif len(tickers) == 1:
+        df = _normalizar(data)
+        if not df.empty: frames[tickers[0]] = df
+    return frames
+
+def _descargar(tickers, interval, period=None, start=None):
+    data = data_providers.get_provider().download(tickers, interval, period=period, start=start)
+    return _separar_por_ticker(data, tickers)
+
+# --- SECCIÓN 4: ACTUALIZACIÓN INCREMENTAL ---
+def _fusionar(guardado, nuevo):
+    # Devuelve None si la barra solapada no coincide: el histórico ajustado cambió y hay que descargarlo completo.
+    solape = nuevo.index.intersection(guardado.index)
+    if len(solape):
+        anterior, actual = guardado.loc[solape[0], 'Close'], nuevo.loc[solape[0], 'Close']
+        if pd.notna(anterior) and pd.notna(actual) and abs(actual / anterior - 1) > TOLERANCIA_AJUSTE: return None
+    return pd.concat([guardado[guardado.index < nuevo.index[0]], nuevo])
+
+def _planificar(tickers, period, interval, manifiesto, ahora):
+    completos, incrementales = [], {}
+    inicio = _inicio_periodo(period)
+    for ticker in tickers:
+        entrada = manifiesto.get(_clave(ticker, interval))
+        if entrada is None or not os.path.exists(_ruta(ticker, interval)): completos.append(ticker); continue
+        cubre_desde = entrada.get('cubre_desde')
+        if cubre_desde != 'max' and (inicio is None or pd.Timestamp(cubre_desde) > inicio): completos.append(ticker); continue
+        if ahora - entrada.get('actualizado', 0) < REFRESH_SECONDS.get(interval, 15 * 60): continue
+        incrementales.setdefault(entrada['ultima_barra'], []).append(ticker)
+    return completos, incrementales
+
+def _registrar(manifiesto, ticker, interval, df, cubre_desde, ahora):
+    manifiesto[_clave(ticker, interval)] = {
+        'primera_barra': df.index[0].isoformat(), 'ultima_barra': df.index[-1].isoformat(),
+        'cubre_desde': cubre_desde, 'actualizado': ahora, 'filas': len(df)
+    }
+
+def actualizar(tickers, period, interval):
+    with _lock:
+        manifiesto = _leer_manifiesto(); ahora = time.time()
+        completos, incrementales = _planificar(tickers, period, interval, manifiesto, ahora)
+        for ultima_barra, grupo in incrementales.items():
+            nuevos = _descargar(grupo, interval, start=pd.Timestamp(ultima_barra).strftime("%Y-%m-%d"))
+            for ticker in grupo:
+                entrada = manifiesto[_clave(ticker, interval)]
+                if ticker not in nuevos: entrada['actualizado'] = ahora; continue
+                fusionado = _fusionar(_leer(ticker, interval), nuevos[ticker])
+                if fusionado is None: completos.append(ticker); continue
+                _escribir(ticker, interval, fusionado)
+                _registrar(manifiesto, ticker, interval, fusionado, entrada['cubre_desde'], ahora)
+        if completos:
+            inicio = _inicio_periodo(period)
+            cubre_desde = 'max' if inicio is None else inicio.isoformat()
+            nuevos = _descargar(completos, interval, period=period)
+            for ticker, df in nuevos.items():
+                _escribir(ticker, interval, df)
+                _registrar(manifiesto, ticker, interval, df, cubre_desde, ahora)
+        _guardar_manifiesto(manifiesto)
+
+# --- SECCIÓN 5: API PÚBLICA ---
+def get_prices(tickers, period, interval):
+    # Mismo formato que yf.download: columnas MultiIndex (Campo, Ticker) con OHLCV, servidas desde disco.
+    tickers = list(dict.fromkeys(tickers))
+    with profiling.etapa("Actualización incremental de precios", filas=len(tickers)):
+        actualizar(tickers, period, interval)
+    with profiling.etapa("Lectura de precios (Parquet)", tipo='disco') as registro:
+        inicio = _inicio_periodo(period); frames = {}
+        for ticker in tickers:
+            df = _leer(ticker, interval)
+            if df is None or df.empty: continue
+            frames[ticker] = df[df.index >= inicio] if inicio is not None else df
+        precios = data_providers.combinar_por_ticker(frames)
+        registro['filas'] = len(precios)
+    return precios
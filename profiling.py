@@ -0,0 +1,208 @@
+# profiling.py (Trazas por Etapa de Cada Ejecución: Tiempo, Red vs. Cálculo, Filas y Memoria)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import os
+import json
+import time
+import functools
+import threading
+import contextvars
+import tracemalloc
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+# Si se define, cada ejecución perfilada se guarda ahí en formato Chrome Trace (chrome://tracing, Perfetto).
+TRACE_DIR = os.environ.get("ANALYTIX_TRACE_DIR")
+# Tipos de etapa: 'red' cuenta como espera de red en el reparto; el resto es cálculo, disco o renderizado.
+TIPOS = ('calculo', 'red', 'disco', 'render')
+
+_actual = contextvars.ContextVar("traza_actual", default=None)
+
+# tracemalloc es global al proceso: se arranca una sola vez y se para cuando la última traza con memoria termina.
+# Si ya lo había arrancado otro (p. ej. el banco de rendimiento), no se para nunca desde aquí.
+_lock_tracemalloc = threading.Lock()
+_usuarios_tracemalloc = 0
+_tracemalloc_propio = False
+
+def _adquirir_tracemalloc():
+    global _usuarios_tracemalloc, _tracemalloc_propio
+    with _lock_tracemalloc:
+        if _usuarios_tracemalloc == 0 and not tracemalloc.is_tracing(): tracemalloc.start(); _tracemalloc_propio = True
+        _usuarios_tracemalloc += 1
+
+def _liberar_tracemalloc():
+    global _usuarios_tracemalloc, _tracemalloc_propio
+    with _lock_tracemalloc:
+        _usuarios_tracemalloc = max(_usuarios_tracemalloc - 1, 0)
+        if _usuarios_tracemalloc == 0 and _tracemalloc_propio:
+            if tracemalloc.is_tracing(): tracemalloc.stop()
+            _tracemalloc_propio = False
+
+def _reiniciar_pico():
+    # Con otra traza midiendo a la vez no se reinicia el pico: se le estropearía el suyo. El pico es siempre del proceso.
+    with _lock_tracemalloc:
+        if _usuarios_tracemalloc == 1: tracemalloc.reset_peak()
+
+# --- SECCIÓN 2: TRAZA DE UNA EJECUCIÓN ---
+class Traza:
+    def __init__(self, nombre, memoria=False):
+        self.nombre, self.memoria = nombre, memoria
+        self.creada = time.time()
+        self.inicio, self.fin = time.perf_counter(), None
+        self.etapas = []
+        self._pilas = threading.local()
+        self._lock = threading.Lock()
+        self._usa_tracemalloc = False
+
+    def _pila(self):
+        if not hasattr(self._pilas, 'pila'): self._pilas.pila = []
+        return self._pilas.pila
+
+    def _red(self):
+        # Unión de los intervalos de red de todos los hilos: las esperas en paralelo no se cuentan dos veces.
+        intervalos = sorted((e['inicio'], e['fin']) for e in self.etapas if e['tipo'] == 'red')
+        unidos = []
+        for a, b in intervalos:
+            if unidos and a <= unidos[-1][1]: unidos[-1][1] = max(unidos[-1][1], b)
+            else: unidos.append([a, b])
+        return np.array(unidos, dtype=float).reshape(-1, 2)
+
+    def resumen(self):
+        # Una fila por etapa en orden de inicio; 'Propio' descuenta las subetapas del mismo hilo y 'Red' es el tiempo
+        # de la etapa durante el que había alguna llamada de red en curso (en cualquier hilo).
+        fin = self.fin if self.fin is not None else time.perf_counter()
+        etapas = sorted(self.etapas, key=lambda e: e['inicio'])
+        columnas = ['Etapa', 'Tipo', 'Nivel', 'Hilo', 'Inicio (ms)', 'Duración (ms)', 'Propio (ms)', 'Red (ms)', 'Filas', 'Pico Memoria Proceso (MB)']
+        if not etapas: return pd.DataFrame(columns=columnas)
+        red = self._red()
+        cubierto = np.r_[0.0, np.cumsum(red[:, 1] - red[:, 0])]
+        def acumulado(t):
+            i = np.maximum(np.searchsorted(red[:, 0], t, side='right') - 1, 0)
+            return np.where(t >= red[i, 0], cubierto[i] + np.minimum(t, red[i, 1]) - red[i, 0], cubierto[i]) if len(red) else np.zeros_like(t)
+        inicios, fines = np.array([e['inicio'] for e in etapas]), np.array([e['fin'] for e in etapas])
+        red_ms = (acumulado(fines) - acumulado(inicios)) * 1000
+        return pd.DataFrame({
+            'Etapa': [e['nombre'] for e in etapas], 'Tipo': [e['tipo'] for e in etapas], 'Nivel': [e['nivel'] for e in etapas],
+            'Hilo': [e['hilo'] for e in etapas], 'Inicio (ms)': (inicios - self.inicio) * 1000, 'Duración (ms)': (fines - inicios) * 1000,
+            'Propio (ms)': [(e['fin'] - e['inicio'] - e['_hijos']) * 1000 for e in etapas], 'Red (ms)': red_ms,
+            'Filas': [e['filas'] for e in etapas], 'Pico Memoria Proceso (MB)': [e['pico_mb'] for e in etapas],
+        }, columns=columnas)
+
+    def totales(self):
+        fin = self.fin if self.fin is not None else time.perf_counter()
+        red = self._red()
+        red_s = float((red[:, 1] - red[:, 0]).sum()) if len(red) else 0.0
+        pico = [e['pico_mb'] for e in self.etapas if e['pico_mb'] is not None]
+        return {'total_ms': (fin - self.inicio) * 1000, 'red_ms': red_s * 1000, 'calculo_ms': (fin - self.inicio - red_s) * 1000,
+                'etapas': len(self.etapas), 'pico_mb': max(pico) if pico else None}
+
+    def chrome_trace(self):
+        eventos = [{'name': self.nombre, 'cat': 'ejecucion', 'ph': 'X', 'pid': os.getpid(), 'tid': 'ejecución', 'ts': 0.0,
+                    'dur': ((self.fin or time.perf_counter()) - self.inicio) * 1e6}]
+        for e in self.etapas:
+            eventos.append({'name': e['nombre'], 'cat': e['tipo'], 'ph': 'X', 'pid': os.getpid(), 'tid': e['hilo'],
+                            'ts': (e['inicio'] - self.inicio) * 1e6, 'dur': (e['fin'] - e['inicio']) * 1e6,
+                            'args': {'filas': e['filas'], 'pico_mb': e['pico_mb']}})
+        return {'traceEvents': eventos, 'displayTimeUnit': 'ms', 'otherData': {'ejecucion': self.nombre, 'creada': self.creada}}
+
+    def to_dict(self):
+        resumen = self.resumen()
+        return {'nombre': self.nombre, 'creada': self.creada, 'totales': self.totales(),
+                'etapas': json.loads(resumen.to_json(orient='records', force_ascii=False))}
+
+# --- SECCIÓN 3: INSTRUMENTACIÓN ---
+@contextmanager
+def etapa(nombre, tipo='calculo', filas=None):
+    # Sin traza activa no registra nada. El registro devuelto admite fijar 'filas' dentro del bloque.
+    traza = _actual.get()
+    if traza is None:
+        yield {}; return
+    pila = traza._pila()
+    registro = {'nombre': nombre, 'tipo': tipo, 'filas': filas, 'nivel': len(pila), 'hilo': threading.current_thread().name,
+                'pico_mb': None, '_hijos': 0.0, '_pico': 0}
+    if traza.memoria:
+        # tracemalloc guarda un único pico para todo el proceso: se traslada a la etapa padre antes de reiniciarlo
+        # para la hija. Es el pico del proceso durante la etapa, no el de esta sesión en exclusiva.
+        if pila: pila[-1]['_pico'] = max(pila[-1]['_pico'], tracemalloc.get_traced_memory()[1])
+        _reiniciar_pico()
+    pila.append(registro)
+    registro['inicio'] = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro['fin'] = time.perf_counter()
+        pila.pop()
+        if pila: pila[-1]['_hijos'] += registro['fin'] - registro['inicio']
+        if traza.memoria:
+            pico = max(registro['_pico'], tracemalloc.get_traced_memory()[1])
+            registro['pico_mb'] = pico / 1024 ** 2
+            if pila: pila[-1]['_pico'] = max(pila[-1]['_pico'], pico)
+        with traza._lock: traza.etapas.append(registro)
+
+def medido(nombre=None, tipo='calculo'):
+    # Decorador equivalente a envolver la función completa en `etapa`.
+    def decorador(funcion):
+        etiqueta = nombre or funcion.__qualname__
+        @functools.wraps(funcion)
+        def envuelta(*args, **kwargs):
+            if _actual.get() is None: return funcion(*args, **kwargs)
+            with etapa(etiqueta, tipo): return funcion(*args, **kwargs)
+        return envuelta
+    return decorador
+
+def propagar(funcion):
+    # Los pools de hilos no heredan la traza del hilo que los lanza: envuelva la función que se envía al pool.
+    traza = _actual.get()
+    if traza is None: return funcion
+    @functools.wraps(funcion)
+    def envuelta(*args, **kwargs):
+        token = _actual.set(traza)
+        try: return funcion(*args, **kwargs)
+        finally: _actual.reset(token)
+    return envuelta
+
+# --- SECCIÓN 4: CICLO DE VIDA DE UNA EJECUCIÓN ---
+def iniciar(nombre, memoria=False, activa=True):
+    # Descarta antes la traza que pudiera haber quedado abierta en este hilo si Streamlit interrumpió la ejecución
+    # anterior (rerun o stop). Con activa=False solo limpia y devuelve None.
+    anterior = _actual.get()
+    if anterior is not None and anterior._usa_tracemalloc: anterior._usa_tracemalloc = False; _liberar_tracemalloc()
+    _actual.set(None)
+    if not activa: return None
+    traza = Traza(nombre, memoria)
+    if memoria: _adquirir_tracemalloc(); traza._usa_tracemalloc = True
+    _actual.set(traza)
+    return traza
+
+def finalizar(traza):
+    traza.fin = time.perf_counter()
+    if _actual.get() is traza: _actual.set(None)
+    if traza._usa_tracemalloc: traza._usa_tracemalloc = False; _liberar_tracemalloc()
+    if TRACE_DIR: guardar(traza, os.path.join(TRACE_DIR, f"traza_{time.strftime('%Y%m%d_%H%M%S', time.localtime(traza.creada))}_{os.getpid()}.json"))
+    return traza
+
+def guardar(traza, ruta, formato='chrome'):
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(traza.chrome_trace() if formato == 'chrome' else traza.to_dict(), f, ensure_ascii=False, default=str)
+    return ruta
+
+def traza_actual():
+    return _actual.get()
+
+# --- SECCIÓN 5: PANEL DE DEPURACIÓN ---
+def display_panel(traza):
+    import streamlit as st
+    totales = traza.totales()
+    st.caption(f"**{traza.nombre}** · Total {totales['total_ms']:,.0f} ms · Red {totales['red_ms']:,.0f} ms · Cálculo {totales['calculo_ms']:,.0f} ms"
+               + (f" · Pico del proceso {totales['pico_mb']:,.1f} MB" if totales['pico_mb'] is not None else ""))
+    resumen = traza.resumen()
+    resumen['Etapa'] = ["· " * nivel + nombre for nivel, nombre in zip(resumen['Nivel'], resumen['Etapa'])]
+    columnas_ms = ['Inicio (ms)', 'Duración (ms)', 'Propio (ms)', 'Red (ms)']
+    st.dataframe(resumen.drop(columns=['Nivel']).style.format("{:,.1f}", subset=columnas_ms).format("{:,.1f}", subset=['Pico Memoria Proceso (MB)'], na_rep=""),
+                 hide_index=True)
+    nombre = f"traza_{time.strftime('%Y%m%d_%H%M%S', time.localtime(traza.creada))}"
+    st.download_button("📥 Traza (Chrome Trace)", json.dumps(traza.chrome_trace(), ensure_ascii=False, default=str), file_name=f"{nombre}.trace.json", mime="application/json", on_click="ignore")
+    st.download_button("📥 Traza (JSON)", json.dumps(traza.to_dict(), ensure_ascii=False, default=str), file_name=f"{nombre}.json", mime="application/json", on_click="ignore")
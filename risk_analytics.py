@@ -0,0 +1,111 @@
+# risk_analytics.py (Analítica de Riesgo Vectorizada: Volatilidad y Sharpe Móviles, VaR/CVaR y Drawdowns)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+BARRAS_POR_ANIO = {'1d': 252, '1mo': 12}
+# Ventana de las métricas móviles: un trimestre de barras diarias, un año de barras mensuales.
+VENTANAS = {'1d': 63, '1mo': 12}
+NIVELES = (0.95, 0.99)
+PORTAFOLIO = 'Portafolio'
+
+# --- SECCIÓN 2: VENTANAS MÓVILES EN O(n) ---
+def _suma_movil(A, ventana):
+    # Suma de las últimas `ventana` filas con una sola suma acumulada: el coste no depende del tamaño de la ventana.
+    acumulada = np.cumsum(A, axis=0)
+    acumulada[ventana:] -= acumulada[:-ventana].copy()
+    return acumulada
+
+def momentos_moviles(R, ventana):
+    # Media y desviación típica (ddof=1) de cada ventana completa, para todas las columnas a la vez. Los retornos se
+    # centran en la media de su columna antes de acumular, lo que evita la cancelación numérica de suma2 - suma²/n.
+    valido = ~np.isnan(R)
+    centro = np.where(valido, R, 0.0).sum(axis=0) / np.maximum(valido.sum(axis=0), 1)
+    Y = np.where(valido, R - centro, 0.0)
+    n, s1, s2 = _suma_movil(valido.astype(float), ventana), _suma_movil(Y, ventana), _suma_movil(Y * Y, ventana)
+    completa = n >= ventana - 0.5
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = np.where(completa, centro + s1 / n, np.nan)
+        varianza = np.where(completa, np.maximum(s2 - s1 * s1 / n, 0.0) / (n - 1), np.nan)
+    return media, np.sqrt(varianza)
+
+# --- SECCIÓN 3: VaR Y CVaR ---
+def var_historico(R, nivel):
+    # Pérdida (positiva) que no se supera con probabilidad `nivel` y pérdida media más allá de ella, por columna.
+    cuantil = np.nanquantile(R, 1 - nivel, axis=0)
+    cola = R <= cuantil
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cvar = -np.where(cola, R, 0.0).sum(axis=0) / cola.sum(axis=0)
+    return -cuantil, cvar
+
+def var_parametrico(media, desviacion, nivel):
+    # Aproximación normal: VaR = -(μ + zσ) y CVaR = -(μ - σ φ(z) / (1 - nivel)), con z el cuantil 1 - nivel.
+    normal = NormalDist()
+    z = normal.inv_cdf(1 - nivel)
+    return -(media + z * desviacion), -(media - desviacion * normal.pdf(z) / (1 - nivel))
+
+# --- SECCIÓN 4: DRAWDOWNS ---
+def curva_subacuatica(P):
+    # Distancia al máximo previo (0 en máximos, negativa bajo el agua); los NaN iniciales no cuentan como máximo.
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return P / np.fmax.accumulate(P, axis=0) - 1
+
+def duraciones(subacuatica):
+    # Barras consecutivas bajo el agua en cada fecha: la cuenta acumulada menos su valor en el último máximo.
+    bajo = subacuatica < 0
+    cuenta = np.cumsum(bajo, axis=0)
+    return cuenta - np.maximum.accumulate(np.where(bajo, 0, cuenta), axis=0)
+
+def episodios(serie, top=5):
+    # Los `top` drawdowns más profundos de una serie de precios o capital: inicio (último máximo), valle, recuperación
+    # (NaT si sigue abierto), profundidad y duración hasta la recuperación.
+    serie = serie.dropna()
+    sub = serie / serie.cummax() - 1
+    bajo = (sub < 0).to_numpy()
+    if not bajo.any(): return pd.DataFrame(columns=['Inicio', 'Valle', 'Recuperación', 'Profundidad', 'Duración (barras)', 'Duración (días)'])
+    grupo = pd.Series(np.cumsum(~bajo), index=sub.index)[bajo]
+    filas = []
+    for _, tramo in sub[bajo].groupby(grupo):
+        i, j = sub.index.get_loc(tramo.index[0]), sub.index.get_loc(tramo.index[-1])
+        recuperacion = sub.index[j + 1] if j + 1 < len(sub) else pd.NaT
+        fin = recuperacion if recuperacion is not pd.NaT else sub.index[-1]
+        filas.append({'Inicio': sub.index[max(i - 1, 0)], 'Valle': tramo.idxmin(), 'Recuperación': recuperacion, 'Profundidad': tramo.min(),
+                      'Duración (barras)': j - i + 1 + (recuperacion is not pd.NaT), 'Duración (días)': (fin - sub.index[max(i - 1, 0)]).days})
+    return pd.DataFrame(filas).nsmallest(top, 'Profundidad').reset_index(drop=True)
+
+# --- SECCIÓN 5: API PÚBLICA ---
+def analizar(close_prices, equity=None, intervalo='1d', risk_free_rate=0.0, ventana=None, niveles=NIVELES):
+    # Todas las métricas para el portafolio (si se pasa su curva de capital) y para cada activo en una sola pasada
+    # matricial sobre fechas x columnas. Los retornos de VaR/CVaR son por barra; volatilidad y Sharpe, anualizados.
+    precios = close_prices.astype(float)
+    if equity is not None: precios = pd.concat([equity.reindex(precios.index).rename(PORTAFOLIO), precios], axis=1)
+    anual = BARRAS_POR_ANIO.get(intervalo, 252)
+    ventana = ventana or VENTANAS.get(intervalo, 63)
+    P = precios.to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        R = np.r_[np.full((1, P.shape[1]), np.nan), P[1:] / P[:-1] - 1]
+    media_movil, desviacion_movil = momentos_moviles(R, ventana)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sharpe_movil = (media_movil * anual - risk_free_rate) / (desviacion_movil * np.sqrt(anual))
+    subacuatica = curva_subacuatica(P)
+    dur = duraciones(subacuatica)
+    media, desviacion = np.nanmean(R, axis=0), np.nanstd(R, axis=0, ddof=1)
+    resumen = {'Volatilidad Anual': desviacion * np.sqrt(anual),
+               'Sharpe Anual': (media * anual - risk_free_rate) / (desviacion * np.sqrt(anual))}
+    for nivel in niveles:
+        etiqueta = f"{nivel:.0%}"
+        resumen[f'VaR {etiqueta} Hist.'], resumen[f'CVaR {etiqueta} Hist.'] = var_historico(R, nivel)
+        resumen[f'VaR {etiqueta} Param.'], resumen[f'CVaR {etiqueta} Param.'] = var_parametrico(media, desviacion, nivel)
+    resumen.update({'Max. Drawdown': np.nanmin(subacuatica, axis=0), 'Duración Máx. DD (barras)': dur.max(axis=0),
+                    'Drawdown Actual': subacuatica[-1], 'Duración Actual DD (barras)': dur[-1],
+                    'Episodios DD': ((subacuatica < 0) & ~np.r_[np.zeros((1, P.shape[1]), bool), subacuatica[:-1] < 0]).sum(axis=0)})
+    marco = lambda datos: pd.DataFrame(datos, index=precios.index, columns=precios.columns)
+    return {
+        'resumen': pd.DataFrame(resumen, index=precios.columns), 'ventana': ventana,
+        'volatilidad_movil': marco(desviacion_movil * np.sqrt(anual)), 'sharpe_movil': marco(sharpe_movil),
+        'var_movil': marco(var_parametrico(media_movil, desviacion_movil, niveles[0])[0]), 'subacuatica': marco(subacuatica),
+        'episodios': episodios(precios[PORTAFOLIO]) if equity is not None else None,
+    }
@@ -0,0 +1,159 @@
+# screener.py (Screener Fundamental de Universos Completos sobre RATIO_MAP)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import re
+import ast
+import operator
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+import numpy as np
+import pandas as pd
+
+import fundamental_analysis
+import profiling
+from fundamental_analysis import RATIO_MAP
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+MAX_WORKERS = 16
+TOP_N = 50
+FILAS_POR_PAGINA = 25
+RATIOS = [rat for rats in RATIO_MAP.values() for rat in rats.keys()]
+CATEGORIA_POR_RATIO = {rat: cat for cat, rats in RATIO_MAP.items() for rat in rats.keys()}
+# Los filtros pueden usar el nombre del ratio entre comillas invertidas (`P/E` < 20) o su clave de la API (trailingPE < 20).
+CLAVE_POR_RATIO = {rat: clave for rats in RATIO_MAP.values() for rat, clave in rats.items()}
+
+# --- SECCIÓN 2: UNIVERSO Y MATRIZ DE RATIOS ---
+def cargar_universo(origen):
+    # Acepta una ruta o un archivo subido: lista de tickers separados por comas o saltos de línea,
+    # o un CSV con una columna Ticker/Symbol.
+    if hasattr(origen, 'read'): texto = origen.read()
+    else:
+        with open(origen, "r", encoding="utf-8") as f: texto = f.read()
+    if isinstance(texto, bytes): texto = texto.decode("utf-8")
+    filas = [linea.split(",") for linea in texto.splitlines() if linea.strip()]
+    if not filas: return []
+    cabecera = [c.strip().lower() for c in filas[0]]
+    columna = next((cabecera.index(n) for n in ('ticker', 'symbol', 'simbolo') if n in cabecera), None)
+    if columna is None: tickers = [c for fila in filas for c in fila]
+    else: tickers = [fila[columna] for fila in filas[1:] if len(fila) > columna]
+    return list(dict.fromkeys(t.strip().upper() for t in tickers if t.strip()))
+
+def matriz_universo(tickers, max_workers=MAX_WORKERS):
+    # Ticker x Ratio para todo el universo; las consultas salen del almacén de snapshots y se lanzan en paralelo.
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers)))) as pool:
+        registros = [d for d in pool.map(profiling.propagar(fundamental_analysis.get_fundamental_data), tickers) if d is not None]
+    if not registros: return pd.DataFrame(columns=['Nombre'] + RATIOS)
+    matriz = pd.DataFrame.from_records(registros, index='Ticker').reindex(columns=['Nombre'] + RATIOS)
+    matriz[RATIOS] = matriz[RATIOS].apply(pd.to_numeric, errors='coerce')
+    return matriz
+
+# --- SECCIÓN 3: PUNTUACIÓN Y FILTROS (VECTORIZADOS) ---
+def puntuar(matriz, pesos_categoria=None):
+    # Percentil de cada ratio en el universo, orientado para que 1 sea siempre lo mejor; los ratios sin dirección no puntúan.
+    # Puntuación por categoría = media de sus percentiles; la compuesta pondera cada ratio con el peso de su categoría.
+    orientacion = pd.Series(fundamental_analysis.orientacion_ratios(pd.Index(RATIOS, name='Ratio')), index=RATIOS)
+    orientacion = orientacion[orientacion != 0]
+    percentiles = (matriz[orientacion.index] * orientacion).rank(pct=True)
+    categorias = orientacion.index.map(CATEGORIA_POR_RATIO)
+    por_categoria = percentiles.T.groupby(categorias, sort=False).mean().T
+    pesos = np.array([(pesos_categoria or {}).get(cat, 1.0) for cat in categorias], dtype=float)
+    disponibles = percentiles.notna().to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        compuesta = np.nan_to_num(percentiles.to_numpy()) @ pesos / (disponibles @ pesos)
+    return por_categoria.assign(**{'Puntuación': compuesta, 'Ratios Disponibles': disponibles.sum(axis=1)})
+
+# El filtro se interpreta con un evaluador propio sobre el árbol sintáctico: solo comparaciones, and/or/not, números y
+# nombres de ratios. DataFrame.eval no es un entorno aislado (admite atributos, llamadas y referencias @).
+_COMPARADORES = {ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge, ast.Eq: operator.eq, ast.NotEq: operator.ne}
+
+def _evaluar_nodo(nodo, columnas):
+    if isinstance(nodo, ast.BoolOp):
+        valores = [_evaluar_booleano(v, columnas) for v in nodo.values]
+        return functools.reduce(operator.and_ if isinstance(nodo.op, ast.And) else operator.or_, valores)
+    if isinstance(nodo, ast.UnaryOp) and isinstance(nodo.op, ast.Not):
+        return ~_evaluar_booleano(nodo.operand, columnas)
+    if isinstance(nodo, ast.Compare):
+        if not all(type(op) in _COMPARADORES for op in nodo.ops): raise ValueError("Solo se admiten comparaciones <, <=, >, >=, == y !=.")
+        izquierda, resultado = _evaluar_nodo(nodo.left, columnas), None
+        for op, comparador in zip(nodo.ops, nodo.comparators):
+            derecha = _evaluar_nodo(comparador, columnas)
+            parcial = _COMPARADORES[type(op)](izquierda, derecha)
+            resultado = parcial if resultado is None else resultado & parcial
+            izquierda = derecha
+        return resultado
+    if isinstance(nodo, ast.Name):
+        if nodo.id not in columnas: raise ValueError(f"Ratio desconocido en el filtro: {nodo.id}")
+        return columnas[nodo.id]
+    # Números, con signo opcional (p. ej. returnOnAssets > -0.05).
+    signo = 1
+    if isinstance(nodo, ast.UnaryOp) and isinstance(nodo.op, (ast.USub, ast.UAdd)):
+        signo, nodo = (-1 if isinstance(nodo.op, ast.USub) else 1), nodo.operand
+    if isinstance(nodo, ast.Constant) and isinstance(nodo.value, (int, float)) and not isinstance(nodo.value, bool):
+        return signo * nodo.value
+    raise ValueError(f"Elemento no permitido en el filtro: {type(nodo).__name__}")
+
+def _evaluar_booleano(nodo, columnas):
+    valor = _evaluar_nodo(nodo, columnas)
+    if not isinstance(valor, pd.Series) or valor.dtype != bool:
+        raise ValueError("La expresión de filtro debe producir un valor verdadero/falso por ticker.")
+    return valor
+
+def aplicar_filtro(matriz, expresion):
+    # Expresión booleana sobre toda la matriz, p. ej. "`P/E` < 20 and returnOnEquity > 0.15". Los nombres entre comillas
+    # invertidas se sustituyen por identificadores antes de analizar la expresión.
+    if not expresion or not expresion.strip(): return pd.Series(True, index=matriz.index)
+    columnas = {rat: matriz[rat] for rat in RATIOS}
+    columnas.update({CLAVE_POR_RATIO[rat]: matriz[rat] for rat in RATIOS})
+    citados = {}
+    def citar(m):
+        if m.group(1) not in columnas: raise ValueError(f"Ratio desconocido en el filtro: {m.group(1)}")
+        citados[f"_ratio_{len(citados)}"] = columnas[m.group(1)]
+        return f"_ratio_{len(citados) - 1}"
+    texto = re.sub(r"`([^`]*)`", citar, expresion)
+    try:
+        arbol = ast.parse(texto.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Expresión de filtro inválida: {e.msg}") from e
+    return _evaluar_booleano(arbol.body, {**columnas, **citados})
+
+def screen(matriz, expresion=None, pesos_categoria=None, top_n=TOP_N):
+    # Los percentiles se calculan sobre el universo completo y después se filtra, así el filtro no altera las puntuaciones.
+    resultado = matriz.join(puntuar(matriz, pesos_categoria))
+    resultado = resultado[aplicar_filtro(matriz, expresion)].sort_values('Puntuación', ascending=False, na_position='last')
+    return resultado.head(top_n) if top_n else resultado
+
+# --- SECCIÓN 4: VISUALIZACIÓN ---
+def display_page(universo=None):
+    # `universo` llega al pulsar "Ejecutar Análisis"; la matriz queda en la sesión para filtrar y paginar sin volver a consultarla.
+    if universo is not None:
+        with st.spinner(f"Obteniendo ratios de {len(universo):,} tickers..."), profiling.etapa("Matriz del universo", filas=len(universo)):
+            st.session_state.screener_matriz = matriz_universo(universo)
+    matriz = st.session_state.get('screener_matriz')
+    if matriz is None: return
+    st.header("Screener Fundamental")
+    if matriz.empty:
+        st.error("No se pudieron obtener datos para ninguno de los tickers del universo.")
+        return
+    st.caption(f"{len(matriz):,} empresas con datos. Las puntuaciones son percentiles (1 = mejor) dentro del universo.")
+    expresion = st.text_input("Filtro", "", placeholder="`P/E` < 25 and ROE > 0.15 and debtToEquity < 150",
+                              help="Comparaciones entre ratios y números combinadas con and, or y not: use el nombre entre comillas invertidas o la clave de la API.")
+    columnas = st.columns([1] + [1] * len(RATIO_MAP))
+    top_n = columnas[0].number_input("Top N", min_value=1, max_value=max(1, len(matriz)), value=min(TOP_N, len(matriz)))
+    pesos = {cat: col.slider(cat, 0.0, 3.0, 1.0, 0.5) for cat, col in zip(RATIO_MAP, columnas[1:])}
+    try:
+        with profiling.etapa("Puntuación y filtros", filas=len(matriz)):
+            resultado = screen(matriz, expresion, pesos, int(top_n))
+    except ValueError as e:
+        st.error(str(e)); return
+    if resultado.empty:
+        st.info("Ninguna empresa cumple el filtro.")
+        return
+    paginas = -(-len(resultado) // FILAS_POR_PAGINA)
+    pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, value=1) if paginas > 1 else 1
+    inicio = (pagina - 1) * FILAS_POR_PAGINA
+    puntuaciones = list(RATIO_MAP) + ['Puntuación']
+    st.dataframe(resultado.iloc[inicio:inicio + FILAS_POR_PAGINA].style.format("{:.2f}", subset=RATIOS, na_rep="N/A")
+                 .format("{:.0%}", subset=[c for c in puntuaciones if c in resultado.columns], na_rep="N/A")
+                 .background_gradient(subset=['Puntuación'], cmap='Blues'), use_container_width=True)
+    fundamental_analysis.create_excel_download(resultado, "screener_fundamental.xlsx")
@@ -0,0 +1,210 @@
+# sensitivity.py (Rejilla de Sensibilidad del Optimizador: Tasa Libre, Ventana de Estimación y Modelo de Covarianza)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+import optimization
+import walk_forward
+import incremental_estimators
+import profiling
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+VENTANAS_ANIOS = (0.5, 1, 1.5, 2, 2.5, 3, 3.5, 4, 4.5, 5, 7, 10)
+ANIOS_PERIODO = {'1y': 1, '2y': 2, '5y': 5, '10y': 10, 'max': None}
+OBJETIVOS = {'max_sharpe': 'Máximo Sharpe', 'min_volatility': 'Mínima Volatilidad'}
+# Umbral de peso a partir del cual un activo cuenta como presente en un punto de la rejilla.
+PESO_MINIMO = 0.01
+MAX_ACTIVOS_MAPA = 30
+# pypfopt y plotly se importan dentro de las funciones que los usan: la barra lateral lee VENTANAS_ANIOS de este módulo.
+
+# --- SECCIÓN 2: PRECÁLCULO COMPARTIDO ---
+def ventanas_disponibles(periodo):
+    # Ventanas que caben en el período descargado (todas con 'max').
+    anios = ANIOS_PERIODO.get(periodo)
+    return [v for v in VENTANAS_ANIOS if anios is None or v <= anios]
+
+def barras_ventanas(close_prices, ventanas_anios, intervalo='1d'):
+    # Años -> barras, con el mínimo del optimizador; se descartan las ventanas que no caben en el histórico y las que,
+    # tras aplicar el mínimo, repiten número de barras.
+    por_anio = walk_forward.BARRAS_POR_ANIO.get(intervalo, 252)
+    barras = {}
+    for anios in sorted(ventanas_anios):
+        n = max(optimization.MIN_OBSERVACIONES, int(anios * por_anio))
+        if n <= len(close_prices) and n not in barras.values(): barras[anios] = n
+    return barras
+
+def estimar(close_prices, barras, metodos):
+    # (mu, S) por (ventana, método), todas terminando en la última fecha. mu no depende del método y se estima una vez
+    # por ventana. Para los métodos incrementales las ventanas se recorren de la más larga a la más corta: pasar de una
+    # a la siguiente solo resta las barras más antiguas, así que todas juntas cuestan lo mismo que la más larga.
+    fin = len(close_prices)
+    orden = sorted(barras.items(), key=lambda item: -item[1])
+    estimaciones = {}
+    for metodo in metodos:
+        if metodo in incremental_estimators.METODOS_INCREMENTALES:
+            with profiling.etapa(f"Estimación incremental ({metodo})", filas=fin):
+                pares = incremental_estimators.estimar_ventanas(close_prices, [(fin - n, fin) for _, n in orden], metodo)
+                for (anios, _), (mu, S) in zip(orden, pares): estimaciones[(anios, metodo)] = (mu, S)
+        else:
+            from pypfopt import expected_returns
+            with profiling.etapa(f"Estimación por ventana ({metodo})", filas=fin):
+                for anios, n in orden:
+                    ventana = close_prices.iloc[fin - n:]
+                    mu = next((e[0] for (a, _), e in estimaciones.items() if a == anios), None)
+                    if mu is None: mu = expected_returns.ema_historical_return(ventana)
+                    estimaciones[(anios, metodo)] = (mu, optimization.matriz_covarianza(ventana, metodo))
+    return estimaciones
+
+# --- SECCIÓN 3: RESOLUCIÓN DE CADA PUNTO (PROCESOS) ---
+_estimaciones_compartidas = None
+
+def _inicializar_worker(estimaciones):
+    # mu y S de todas las ventanas se envían una sola vez a cada proceso en lugar de con cada punto.
+    global _estimaciones_compartidas
+    _estimaciones_compartidas = estimaciones
+
+def _resolver(mu, S, objetivo, risk_free_rate):
+    from pypfopt import EfficientFrontier
+    from pypfopt.exceptions import OptimizationError
+    for solver in optimization.SOLVERS_ALTERNATIVOS:
+        ef = EfficientFrontier(mu, S, solver=solver)
+        try:
+            if objetivo == 'max_sharpe': ef.max_sharpe(risk_free_rate=risk_free_rate)
+            else: ef.min_volatility()
+            return dict(ef.clean_weights())
+        except OptimizationError:
+            if solver == optimization.SOLVERS_ALTERNATIVOS[-1]: raise
+
+def _resolver_punto(estimaciones, punto):
+    # Un error (p. ej. ningún activo supera la tasa libre) invalida solo su punto, no la rejilla.
+    clave, objetivo, risk_free_rate = punto
+    mu, S = estimaciones[clave]
+    try: return _resolver(mu, S, objetivo, risk_free_rate), None
+    except Exception as e: return None, str(e)
+
+def _resolver_en_worker(punto):
+    return _resolver_punto(_estimaciones_compartidas, punto)
+
+# --- SECCIÓN 4: API PÚBLICA ---
+def evaluar_rejilla(close_prices, tasas, ventanas_anios, metodos, intervalo='1d', objetivos=tuple(OBJETIVOS), n_workers=None):
+    # Evalúa cada combinación (tasa, ventana, método, objetivo) reutilizando los precios y el (mu, S) de cada ventana.
+    # La mínima volatilidad no depende de la tasa: se resuelve una vez por ventana y método y se repite en cada tasa.
+    # Devuelve una tabla de puntos (con rendimiento, volatilidad y Sharpe) y la matriz de pesos con el mismo índice.
+    inicio = time.perf_counter()
+    close_prices = close_prices.dropna()
+    tasas = sorted(dict.fromkeys(round(float(t), 10) for t in tasas))
+    barras = barras_ventanas(close_prices, ventanas_anios, intervalo)
+    if not barras: raise ValueError("Histórico insuficiente para las ventanas elegidas. Intente con un período más largo.")
+    estimaciones = estimar(close_prices, barras, metodos)
+    puntos = [(clave, 'max_sharpe', tasa) for clave in estimaciones for tasa in tasas if 'max_sharpe' in objetivos]
+    puntos += [(clave, 'min_volatility', None) for clave in estimaciones if 'min_volatility' in objetivos]
+    preparado = time.perf_counter()
+    n_workers = n_workers or min(os.cpu_count() or 1, len(puntos))
+    with profiling.etapa("Optimización de la rejilla", filas=len(puntos)):
+        if n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_inicializar_worker, initargs=(estimaciones,)) as pool:
+                soluciones = list(pool.map(_resolver_en_worker, puntos, chunksize=max(1, len(puntos) // (4 * n_workers))))
+        else:
+            soluciones = [_resolver_punto(estimaciones, punto) for punto in puntos]
+    filas, pesos = [], []
+    for ((anios, metodo), objetivo, tasa), (w, error) in zip(puntos, soluciones):
+        mu, S = estimaciones[(anios, metodo)]
+        w = pd.Series(w, dtype=float).reindex(mu.index) if w is not None else pd.Series(np.nan, index=mu.index)
+        rendimiento, volatilidad = float(w @ mu), float(np.sqrt(w @ S @ w))
+        for t in (tasas if tasa is None else [tasa]):
+            filas.append({'Objetivo': objetivo, 'Covarianza': metodo, 'Ventana (años)': anios, 'Barras': barras[anios], 'Tasa Libre': t,
+                          'Rendimiento': rendimiento, 'Volatilidad': volatilidad, 'Sharpe': (rendimiento - t) / volatilidad, 'Error': error})
+            pesos.append(w)
+    indice = pd.MultiIndex.from_frame(pd.DataFrame(filas)[['Objetivo', 'Covarianza', 'Ventana (años)', 'Tasa Libre']])
+    tabla = pd.DataFrame(filas, index=indice).drop(columns=['Objetivo', 'Covarianza', 'Ventana (años)', 'Tasa Libre']).sort_index()
+    matriz_pesos = pd.DataFrame([w.to_numpy() for w in pesos], index=indice, columns=close_prices.columns).sort_index()
+    fin = time.perf_counter()
+    return {'puntos': tabla, 'pesos': matriz_pesos, 'barras': barras, 'tasas': tasas, 'metodos': list(metodos),
+            'tiempos': {'precalculo_s': preparado - inicio, 'optimizacion_s': fin - preparado, 'total_s': fin - inicio,
+                        'puntos': len(puntos), 'workers': n_workers}}
+
+def estabilidad(pesos):
+    # Dispersión del peso de cada activo entre los puntos válidos de la rejilla.
+    pesos = pesos.dropna(how='all')
+    return pd.DataFrame({'Media': pesos.mean(), 'Desv. Estándar': pesos.std(ddof=0), 'Mínimo': pesos.min(), 'Máximo': pesos.max(),
+                         'Presencia': (pesos > PESO_MINIMO).mean()}).sort_values('Media', ascending=False)
+
+def rotacion(pesos, referencia):
+    # Fracción del portafolio que habría que rotar para pasar de `referencia` a cada punto: ½·Σ|w - w_ref|.
+    return 0.5 * (pesos - referencia).abs().sum(axis=1, min_count=1)
+
+# --- SECCIÓN 5: PÁGINA ---
+def _etiqueta(clave):
+    _, metodo, anios, tasa = clave
+    return f"{anios:g}a · {tasa:.2%} · {optimization.METODOS_COVARIANZA.get(metodo, metodo)}"
+
+def display_page(close_prices, tasas, ventanas_anios, metodos, intervalo, risk_free_rate, ticker_names):
+    import streamlit as st
+    import plotly.express as px
+    st.header("Sensibilidad de la Optimización")
+    with st.spinner(f"Evaluando {len(tasas)} tasas x {len(ventanas_anios)} ventanas x {len(metodos)} modelos de covarianza..."):
+        resultado = evaluar_rejilla(close_prices, tasas, ventanas_anios, metodos, intervalo)
+    tiempos, puntos, pesos = resultado['tiempos'], resultado['puntos'], resultado['pesos']
+    descartadas = [v for v in ventanas_anios if v not in resultado['barras']]
+    if descartadas: st.warning(f"Ventanas omitidas por falta de histórico o repetidas tras el mínimo de {optimization.MIN_OBSERVACIONES} barras: {', '.join(f'{v:g}' for v in descartadas)} años.")
+    st.caption(f"{tiempos['puntos']} optimizaciones en {tiempos['total_s']:.2f} s ({tiempos['precalculo_s']:.2f} s de estimación compartida de mu y S, "
+               f"{tiempos['optimizacion_s']:.2f} s resolviendo con {tiempos['workers']} proceso(s)).")
+
+    sharpe = pesos.loc['max_sharpe'] if 'max_sharpe' in pesos.index.get_level_values(0) else pesos.iloc[:0]
+    validos = sharpe.dropna(how='all')
+    if validos.empty:
+        st.error("Ningún punto de la rejilla tuvo solución de máximo Sharpe: ningún activo supera las tasas libres de riesgo elegidas.")
+        return
+    fallidos = len(sharpe) - len(validos)
+    if fallidos: st.info(f"{fallidos} de {len(sharpe)} puntos sin solución de máximo Sharpe (ningún activo supera esa tasa libre); se omiten.")
+
+    # Referencia: el punto más parecido a la página de optimización (tasa de la barra lateral, ventana más larga).
+    metodo_ref = resultado['metodos'][0]
+    tasa_ref = min(resultado['tasas'], key=lambda t: abs(t - risk_free_rate))
+    anios_ref = max(resultado['barras'])
+    referencia = sharpe.loc[(metodo_ref, anios_ref, tasa_ref)] if (metodo_ref, anios_ref, tasa_ref) in sharpe.index else validos.iloc[-1]
+    giro = rotacion(validos, referencia)
+    estable = estabilidad(validos)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Rotación Media vs. Referencia", f"{giro.mean():.1%}")
+    col2.metric("Rotación Máxima", f"{giro.max():.1%}")
+    col3.metric("Activos Presentes en Todos los Puntos", f"{int((estable['Presencia'] == 1).sum())} de {len(estable)}")
+    st.caption(f"Referencia: máximo Sharpe con tasa {tasa_ref:.2%}, ventana de {anios_ref:g} años y covarianza {optimization.METODOS_COVARIANZA.get(metodo_ref, metodo_ref)}.")
+
+    activos = estable.index[:MAX_ACTIVOS_MAPA]
+    etiquetas = [ticker_names.get(t, t) for t in activos]
+    st.subheader("Pesos de Máximo Sharpe en Cada Punto de la Rejilla")
+    mapa = validos[activos].T
+    fig = px.imshow(mapa.to_numpy(), x=[_etiqueta(('max_sharpe',) + c) for c in mapa.columns], y=etiquetas, zmin=0, zmax=1,
+                    color_continuous_scale='Blues', aspect='auto', labels=dict(color='Peso'))
+    fig.update_xaxes(showticklabels=len(mapa.columns) <= 60)
+    st.plotly_chart(fig, use_container_width=True)
+    if len(estable) > MAX_ACTIVOS_MAPA: st.caption(f"Se muestran los {MAX_ACTIVOS_MAPA} activos con mayor peso medio de {len(estable)}.")
+
+    st.subheader("Sharpe y Rotación por Tasa y Ventana")
+    tabs = st.tabs([optimization.METODOS_COVARIANZA.get(m, m) for m in resultado['metodos']])
+    for tab, metodo in zip(tabs, resultado['metodos']):
+        with tab:
+            tabla = puntos.loc[('max_sharpe', metodo)]
+            col1, col2 = st.columns(2)
+            for col, valores, titulo, escala in ((col1, tabla['Sharpe'], 'Ratio de Sharpe', 'RdYlGn'),
+                                                 (col2, giro.reindex(pd.MultiIndex.from_tuples([(metodo,) + c for c in tabla.index])).set_axis(tabla.index), 'Rotación vs. Referencia', 'Reds')):
+                matriz = valores.unstack('Tasa Libre')
+                fig = px.imshow(matriz.to_numpy(), x=[f"{t:.2%}" for t in matriz.columns], y=[f"{v:g} años" for v in matriz.index],
+                                color_continuous_scale=escala, aspect='auto', text_auto='.2f', labels=dict(x='Tasa Libre', y='Ventana', color=titulo))
+                fig.update_layout(title=titulo)
+                col.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("Estabilidad de los Pesos por Activo")
+    estable.index = [f"{ticker_names.get(t, t)} ({t})" for t in estable.index]
+    st.dataframe(estable.style.format({c: "{:.2%}" for c in ['Media', 'Desv. Estándar', 'Mínimo', 'Máximo']} | {'Presencia': "{:.0%}"})
+                 .background_gradient(subset=['Desv. Estándar'], cmap='Reds'))
+    if 'min_volatility' in pesos.index.get_level_values(0):
+        with st.expander("Portafolios de Mínima Volatilidad (no dependen de la tasa libre)"):
+            minima = pesos.loc['min_volatility'].groupby(level=['Covarianza', 'Ventana (años)']).first()
+            minima = minima.loc[:, (minima > PESO_MINIMO).any()]
+            st.dataframe(minima.style.format("{:.2%}"))
@@ -0,0 +1,92 @@
+# session_prices.py (Precios de Cierre Compartidos entre Sesiones con Presupuesto de Memoria)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import os
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+import optimization
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+# Cada sesión guarda solo una referencia; los cierres (float32, sin el resto del OHLCV) viven una vez por proceso.
+MEMORIA_MAXIMA = int(float(os.environ.get("ANALYTIX_SESSION_PRICES_MB", 512)) * 1024 ** 2)
+# Una sesión cuenta como activa si leyó sus precios en este intervalo (segundos).
+SESION_ACTIVA = 3600
+
+_entradas = OrderedDict()  # huella -> {'valores', 'index', 'columns', 'bytes'}
+_sesiones = {}  # id de sesión de Streamlit -> (huella, último acceso)
+_lock = threading.Lock()
+
+# --- SECCIÓN 2: SOPORTE ---
+def _id_sesion():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx is not None else None
+    except Exception:
+        return None
+
+def _registrar(clave):
+    # De paso se olvidan las sesiones inactivas: Streamlit no avisa cuando una sesión se cierra.
+    sesion, ahora = _id_sesion(), time.time()
+    for vieja in [s for s, (_, acceso) in _sesiones.items() if ahora - acceso > SESION_ACTIVA]: del _sesiones[vieja]
+    if sesion is not None: _sesiones[sesion] = (clave, ahora)
+
+def _expulsar():
+    # Se expulsa la entrada usada hace más tiempo hasta volver al presupuesto; la más reciente nunca se expulsa.
+    while len(_entradas) > 1 and sum(e['bytes'] for e in _entradas.values()) > MEMORIA_MAXIMA:
+        _entradas.popitem(last=False)
+
+def _frame(entrada):
+    # Sin copia: todas las sesiones ven el mismo buffer, que es de solo lectura para que ninguna lo altere a las demás.
+    return pd.DataFrame(entrada['valores'], index=entrada['index'], columns=entrada['columns'], copy=False)
+
+# --- SECCIÓN 3: API PÚBLICA ---
+def guardar(close_prices, tickers, periodo, intervalo):
+    # Devuelve la referencia que se guarda en la sesión. Dos sesiones con los mismos datos comparten la misma entrada.
+    close_prices = close_prices.astype(np.float32)
+    clave = optimization.huella_precios(close_prices)
+    with _lock:
+        if clave not in _entradas:
+            valores = np.array(close_prices.to_numpy(), order='C')
+            valores.flags.writeable = False
+            _entradas[clave] = {'valores': valores, 'index': close_prices.index, 'columns': close_prices.columns,
+                                'bytes': valores.nbytes + close_prices.index.memory_usage()}
+            _expulsar()
+        _entradas.move_to_end(clave)
+        _registrar(clave)
+    return {'clave': clave, 'tickers': list(tickers), 'periodo': periodo, 'intervalo': intervalo}
+
+def obtener(referencia):
+    # Cierres (fecha x ticker, float32) de una referencia. Si la entrada fue expulsada se recarga desde price_store
+    # y la referencia de la sesión se actualiza en el lugar; si los datos recargados ya no son los mismos, se avisa.
+    with _lock:
+        entrada = _entradas.get(referencia['clave'])
+        if entrada is not None:
+            _entradas.move_to_end(referencia['clave'])
+            _registrar(referencia['clave'])
+            return _frame(entrada)
+    import price_store
+    datos = price_store.get_prices(referencia['tickers'], referencia['periodo'], referencia['intervalo'])
+    anterior = referencia['clave']
+    referencia.update(guardar(datos['Close'], referencia['tickers'], referencia['periodo'], referencia['intervalo']))
+    if referencia['clave'] != anterior:
+        import streamlit as st
+        st.warning("Los precios se recargaron y ya no coinciden con los de la optimización (hay datos nuevos o corregidos). "
+                   "Los resultados mostrados pueden no corresponder a estos precios; vuelva a ejecutar el análisis.")
+    with _lock:
+        return _frame(_entradas[referencia['clave']])
+
+def reporte_memoria():
+    # Una fila por entrada compartida, con su tamaño y cuántas sesiones activas la usan.
+    ahora = time.time()
+    with _lock:
+        activas = [clave for clave, acceso in _sesiones.values() if ahora - acceso <= SESION_ACTIVA]
+        filas = [{'Huella': clave[:10], 'Tickers': len(e['columns']), 'Fechas': len(e['index']), 'MB': e['bytes'] / 1024 ** 2,
+                  'Sesiones Activas': activas.count(clave)} for clave, e in reversed(_entradas.items())]
+    reporte = pd.DataFrame(filas, columns=['Huella', 'Tickers', 'Fechas', 'MB', 'Sesiones Activas'])
+    return {'entradas': reporte, 'mb_total': float(reporte['MB'].sum()), 'mb_presupuesto': MEMORIA_MAXIMA / 1024 ** 2,
+            'sesiones_activas': len(activas)}
@@ -0,0 +1,115 @@
+# shared_cache.py (Caché de Proceso Compartida entre Sesiones: LRU por Memoria, TTL y Peticiones Coalescidas)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import os
+import time
+import pickle
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+import profiling
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+# Presupuesto de memoria de toda la caché; ANALYTIX_SHARED_CACHE_MB=0 la desactiva.
+MEMORIA_MAXIMA = int(float(os.environ.get("ANALYTIX_SHARED_CACHE_MB", 256)) * 1024 ** 2)
+# Vigencia (segundos) de cada espacio de claves; los precios siguen la ventana de refresco de price_store.
+TTL = {'precios': 15 * 60, 'historial': 15 * 60, 'info': 3600, 'financials': 6 * 3600}
+TTL_DEFECTO = 15 * 60
+
+_entradas = OrderedDict()  # (espacio, clave) -> {'valor', 'bytes', 'vence'}
+_en_vuelo = {}  # (espacio, clave) -> {'hecho', 'valor', 'error'}
+_estadisticas = {}  # espacio -> contadores
+_lock = threading.Lock()
+
+# --- SECCIÓN 2: SOPORTE ---
+def _tamano(valor):
+    if isinstance(valor, pd.DataFrame): return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series): return int(valor.memory_usage(deep=True))
+    try: return len(pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception: return 0
+
+def _copia(valor):
+    # Cada sesión recibe su propio contenedor: reasignar columnas o claves no altera lo que ven las demás.
+    if isinstance(valor, (pd.DataFrame, pd.Series)): return valor.copy(deep=False)
+    if isinstance(valor, dict): return dict(valor)
+    return valor
+
+def _contadores(espacio):
+    return _estadisticas.setdefault(espacio, {'aciertos': 0, 'fallos': 0, 'coalescidas': 0, 'expulsiones': 0})
+
+def _expulsar():
+    # Primero lo vencido; después, la entrada usada hace más tiempo hasta volver al presupuesto.
+    ahora, total = time.time(), sum(e['bytes'] for e in _entradas.values())
+    for clave in [c for c, e in _entradas.items() if e['vence'] < ahora]:
+        total -= _entradas.pop(clave)['bytes']
+    while _entradas and total > MEMORIA_MAXIMA:
+        clave, entrada = _entradas.popitem(last=False)
+        total -= entrada['bytes']; _contadores(clave[0])['expulsiones'] += 1
+
+# --- SECCIÓN 3: API PÚBLICA ---
+def obtener_varios(espacio, claves, cargar, ttl=None):
+    # Devuelve {clave: valor}. Las claves vigentes salen de memoria; las que otra sesión ya está pidiendo esperan a esa
+    # misma petición (single-flight); el resto se pide en una sola llamada a `cargar(faltantes) -> {clave: valor}`.
+    claves = list(dict.fromkeys(claves))
+    if MEMORIA_MAXIMA <= 0: return cargar(claves)
+    ttl = TTL.get(espacio, TTL_DEFECTO) if ttl is None else ttl
+    resultado, propias, ajenas, ahora = {}, [], {}, time.time()
+    with _lock:
+        contadores = _contadores(espacio)
+        for clave in claves:
+            entrada = _entradas.get((espacio, clave))
+            if entrada is not None and entrada['vence'] >= ahora:
+                _entradas.move_to_end((espacio, clave))
+                resultado[clave] = entrada['valor']; contadores['aciertos'] += 1
+            elif (espacio, clave) in _en_vuelo:
+                ajenas[clave] = _en_vuelo[(espacio, clave)]; contadores['coalescidas'] += 1
+            else:
+                _en_vuelo[(espacio, clave)] = {'hecho': threading.Event(), 'valor': None, 'error': None}
+                propias.append(clave); contadores['fallos'] += 1
+    if propias:
+        try:
+            cargados = cargar(propias)
+        except BaseException as e:
+            # El error se entrega también a quienes esperaban, pero no se guarda: la siguiente petición lo reintenta.
+            with _lock:
+                for clave in propias:
+                    vuelo = _en_vuelo.pop((espacio, clave)); vuelo['error'] = e; vuelo['hecho'].set()
+            raise
+        tamanos = {clave: _tamano(cargados.get(clave)) for clave in propias}
+        with _lock:
+            for clave in propias:
+                valor = cargados.get(clave)
+                if tamanos[clave] <= MEMORIA_MAXIMA:
+                    _entradas[(espacio, clave)] = {'valor': valor, 'bytes': tamanos[clave], 'vence': ahora + ttl}
+                vuelo = _en_vuelo.pop((espacio, clave)); vuelo['valor'] = valor; vuelo['hecho'].set()
+                resultado[clave] = valor
+            _expulsar()
+    if ajenas:
+        with profiling.etapa(f"Petición compartida ({espacio})", tipo='red', filas=len(ajenas)):
+            for clave, vuelo in ajenas.items():
+                vuelo['hecho'].wait()
+                if vuelo['error'] is not None: raise vuelo['error']
+                resultado[clave] = vuelo['valor']
+    return {clave: _copia(resultado[clave]) for clave in claves}
+
+def obtener(espacio, clave, cargar, ttl=None):
+    # Versión de una sola clave: `cargar()` sin argumentos.
+    return obtener_varios(espacio, [clave], lambda faltantes: {clave: cargar()}, ttl)[clave]
+
+def invalidar(espacio=None):
+    with _lock:
+        for clave in [c for c in _entradas if espacio is None or c[0] == espacio]: del _entradas[clave]
+
+def estadisticas():
+    # Una fila por espacio de claves con aciertos, fallos, peticiones coalescidas, expulsiones y memoria ocupada.
+    with _lock:
+        ocupado = {}
+        for (espacio, _), entrada in _entradas.items():
+            entradas, mb = ocupado.get(espacio, (0, 0.0))
+            ocupado[espacio] = (entradas + 1, mb + entrada['bytes'] / 1024 ** 2)
+        filas = [{'Espacio': espacio, 'Entradas': ocupado.get(espacio, (0, 0.0))[0], 'MB': ocupado.get(espacio, (0, 0.0))[1],
+                  'Aciertos': c['aciertos'], 'Fallos': c['fallos'], 'Coalescidas': c['coalescidas'], 'Expulsiones': c['expulsiones'],
+                  'Tasa de Acierto': (c['aciertos'] + c['coalescidas']) / max(1, c['aciertos'] + c['coalescidas'] + c['fallos'])}
+                 for espacio, c in _estadisticas.items()]
+    return pd.DataFrame(filas, columns=['Espacio', 'Entradas', 'MB', 'Aciertos', 'Fallos', 'Coalescidas', 'Expulsiones', 'Tasa de Acierto'])
@@ -0,0 +1,75 @@
+# startup_benchmark.py (Tiempo de Importación por Módulo y Arranque en Frío de app.py)
+#
+# Uso: python startup_benchmark.py [--repeticiones 3] [--json resultados.json] [--umbral-ms 2500]
+# Cada medición se hace en un intérprete nuevo, como en un contenedor recién levantado.
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+# streamlit y pandas los paga cualquier página: se miden aparte y el resto se mide por encima de ellos.
+BASE = ("streamlit", "pandas")
+MODULOS = (
+    "price_store", "optimization", "ticker_metadata", "data_providers", "fundamentals_store",
+    "fundamental_analysis", "screener", "portfolio_optimization", "strategy_analysis", "technical_analysis",
+    "pypfopt", "bt", "matplotlib.pyplot", "plotly.express", "yfinance",
+)
+
+# --- SECCIÓN 2: MEDICIONES ---
+def _importtime(modulo, precargar=BASE):
+    # Tiempo acumulado (ms) de `import modulo` según `python -X importtime`, con `precargar` ya importado.
+    codigo = "".join(f"import {m}; " for m in precargar) + f"import {modulo}"
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], cwd=DIRECTORIO, capture_output=True, text=True)
+    if proceso.returncode != 0: return None
+    acumulado = None
+    for linea in proceso.stderr.splitlines():
+        partes = linea.split("|")
+        if len(partes) == 3 and partes[2].strip() == modulo and partes[1].strip().isdigit(): acumulado = int(partes[1]) / 1000.0
+    return 0.0 if acumulado is None else acumulado
+
+def _arranque_app():
+    # Ejecuta app.py completo sin servidor (modo "bare" de Streamlit): imports, barra lateral y pantalla de bienvenida.
+    inicio = time.perf_counter()
+    proceso = subprocess.run([sys.executable, "-c", "import runpy; runpy.run_path('app.py', run_name='__main__')"],
+                             cwd=DIRECTORIO, capture_output=True, text=True)
+    return (time.perf_counter() - inicio) * 1000.0 if proceso.returncode == 0 else None
+
+def medir(repeticiones=3, modulos=MODULOS):
+    def mediana(muestras):
+        muestras = [m for m in muestras if m is not None]
+        return round(statistics.median(muestras), 1) if muestras else None
+    resultados = {m: mediana([_importtime(m, precargar=()) for _ in range(repeticiones)]) for m in BASE}
+    resultados.update({m: mediana([_importtime(m) for _ in range(repeticiones)]) for m in modulos})
+    resultados["app.py (arranque en frío)"] = mediana([_arranque_app() for _ in range(repeticiones)])
+    return resultados
+
+# --- SECCIÓN 3: EJECUCIÓN ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tiempo de importación por módulo y arranque en frío de app.py.")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--json", help="Ruta donde guardar los resultados en JSON.")
+    parser.add_argument("--umbral-ms", type=float, help="Falla (código 1) si el arranque en frío de app.py supera este tiempo.")
+    args = parser.parse_args(argv)
+    resultados = medir(args.repeticiones)
+    ancho = max(len(m) for m in resultados)
+    print(f"{'Módulo':<{ancho}}  {'ms':>9}")
+    for modulo, ms in resultados.items():
+        print(f"{modulo:<{ancho}}  {'error' if ms is None else f'{ms:9.1f}':>9}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'python': sys.version.split()[0], 'repeticiones': args.repeticiones, 'ms': resultados}, f, indent=2)
+    arranque = resultados["app.py (arranque en frío)"]
+    if args.umbral_ms is not None and (arranque is None or arranque > args.umbral_ms):
+        print(f"Regresión: el arranque de app.py ({arranque} ms) supera el umbral de {args.umbral_ms} ms.")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
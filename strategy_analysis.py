@@ -3,25 +3,24 @@
 # --- SECCIÓN 0: IMPORTACIONES ---
 import streamlit as st
 import pandas as pd
-import yfinance as yf
 import plotly.express as px
-import bt
-import matplotlib.pyplot as plt
+import ticker_metadata
+import backtest_engine
+import walk_forward
+import risk_analytics
+import chart_data
+import session_prices
+import profiling
 
 # --- SECCIÓN 1: ANÁLISIS ESTRATÉGICO (SECTORES) ---
 @st.cache_data
 def get_sector_data(tickers):
-    sectors = {}
-    for ticker in tickers:
-        try:
-            sectors[ticker] = yf.Ticker(ticker).info.get('sector', 'Desconocido')
-        except Exception:
-            sectors[ticker] = 'Desconocido'
-    return sectors
+    sectors = ticker_metadata.fetch_metadata(tickers)['sectors']
+    return {ticker: sectors.get(ticker, 'Desconocido') for ticker in tickers}
 
-def display_sector_analysis(weights, tickers):
+def display_sector_analysis(weights, tickers, sectors=None):
     st.subheader("🔬 Acto I: El ADN del Portafolio")
-    sectors = get_sector_data(tickers)
+    if sectors is None or not set(tickers) <= set(sectors): sectors = get_sector_data(tickers)
     df_sectors = pd.DataFrame.from_dict(sectors, orient='index', columns=['Sector'])
     df_weights = pd.DataFrame.from_dict(weights, orient='index', columns=['Peso'])
     df_portfolio = df_weights.join(df_sectors)
@@ -54,6 +53,7 @@ def display_sector_analysis(weights, tickers):
 
 # --- SECCIÓN 2: SIMULACIÓN HISTÓRICA (BACKTESTING CON `bt`) ---
 def run_backtest_bt(close_prices, weights):
+    import bt  # Solo se importa si se elige el motor basado en eventos.
     strategy = bt.Strategy('RebalanceoMensual', [
         bt.algos.RunMonthly(),
         bt.algos.SelectAll(),
@@ -64,20 +64,26 @@ def run_backtest_bt(close_prices, weights):
     results = bt.run(backtest)
     return results
 
-def display_backtesting_analysis(all_prices, weights):
+def display_backtesting_analysis(close_prices, weights, motor='vectorizado'):
     st.subheader("🎭 Acto II: El Viaje en el Tiempo (Backtesting)")
     with st.spinner("Ejecutando simulación histórica... Esto puede tardar unos segundos..."):
-        close_prices = all_prices['Close'].dropna()
-        results = run_backtest_bt(close_prices, weights)
-        stats = results.stats
+        close_prices = close_prices.dropna()
+        with profiling.etapa("Backtest (bt.run)" if motor == 'bt' else "Backtest vectorizado", filas=len(close_prices)):
+            if motor == 'bt':
+                results = run_backtest_bt(close_prices, weights)
+                stats = results.stats
+            else:
+                results = backtest_engine.run_backtest(close_prices, weights)
+                stats = results['stats']
         strategy_name = stats.columns[0]
         
         st.write("**Métricas Clave de la Simulación:**")
+        # ffn (y calcular_estadisticas) ya anualizan monthly_vol y monthly_sharpe con √12: se muestran tal cual, como en el Acto III.
         col1, col2, col3, col4 = st.columns(4)
         col1.metric("Retorno Total [%]", f"{stats.loc['total_return', strategy_name] * 100:.2f}%")
-        col2.metric("Volatilidad Anual [%]", f"{stats.loc['monthly_vol', strategy_name] * (12**0.5) * 100:.2f}%")
+        col2.metric("Volatilidad Anual [%]", f"{stats.loc['monthly_vol', strategy_name] * 100:.2f}%")
         col3.metric("Max. Drawdown [%]", f"{stats.loc['max_drawdown', strategy_name] * 100:.2f}%", delta_color="inverse")
-        col4.metric("Ratio de Sharpe Anual", f"{stats.loc['monthly_sharpe', strategy_name] * (12**0.5):.2f}")
+        col4.metric("Ratio de Sharpe Anual", f"{stats.loc['monthly_sharpe', strategy_name]:.2f}")
         
         # --- INICIO DEL CAMBIO: RESTAURACIÓN DE LA NARRATIVA ---
         
@@ -108,25 +114,102 @@ def display_backtesting_analysis(all_prices, weights):
         # --- FIN DEL CAMBIO ---
 
         st.write("**Gráfico de Crecimiento del Capital:**")
-        plt.rcParams.update({'font.size': 10, 'figure.figsize': (12, 6)})
-        fig = results.plot()
-        fig.grid(False)
-        st.pyplot(plt.gcf())
-        plt.clf()
+        with profiling.etapa("Gráfico de capital", tipo='render'):
+            equity = results.prices if motor == 'bt' else results['equity']
+            fig = chart_data.figura_lineas(equity, titulo='Equity Progression', showlegend=False, margin=dict(l=10, r=10, t=40, b=10))
+            st.plotly_chart(fig, use_container_width=True)
+    return equity.iloc[:, 0]
+
+def display_risk_analysis(close_prices, equity, weights, opt_results, activos_en_grafico=5):
+    st.subheader("🛡️ Radiografía del Riesgo")
+    with profiling.etapa("Analítica de riesgo", filas=close_prices.size):
+        riesgo = risk_analytics.analizar(close_prices.dropna(), equity, opt_results['intervalo'], opt_results['risk_free_rate_decimal'])
+    portafolio = riesgo['resumen'].loc[risk_analytics.PORTAFOLIO]
+    barra = "diaria" if opt_results['intervalo'] == '1d' else "mensual"
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric(f"VaR 95% Histórico ({barra})", f"{portafolio['VaR 95% Hist.'] * 100:.2f}%")
+    col2.metric(f"CVaR 95% Histórico ({barra})", f"{portafolio['CVaR 95% Hist.'] * 100:.2f}%")
+    col3.metric("Drawdown más largo (barras)", f"{portafolio['Duración Máx. DD (barras)']:,.0f}")
+    col4.metric("Drawdown actual", f"{portafolio['Drawdown Actual'] * 100:.2f}%", delta_color="inverse")
+    st.caption(f"Con barras {barra}s, la pérdida de una barra supera el VaR 95% solo en el 5% de los casos; el CVaR es la pérdida media de ese 5% peor. "
+               f"Las métricas móviles usan ventanas de {riesgo['ventana']} barras.")
+    # Gráficos: el portafolio y sus activos de mayor peso; la tabla incluye todos los activos.
+    principales = [t for t, _ in sorted(weights.items(), key=lambda par: -par[1]) if t in close_prices.columns][:activos_en_grafico]
+    columnas = [risk_analytics.PORTAFOLIO] + principales
+    estilos = {risk_analytics.PORTAFOLIO: dict(width=3, color='#3b82f6')}
+    with profiling.etapa("Gráficos de riesgo", tipo='render'):
+        tab1, tab2, tab3 = st.tabs(["Volatilidad Móvil", "Sharpe Móvil", "Curva Subacuática"])
+        with tab1:
+            st.plotly_chart(chart_data.figura_lineas(riesgo['volatilidad_movil'][columnas], titulo='Volatilidad Anualizada Móvil', estilos=estilos,
+                                                     yaxis_tickformat='.0%', margin=dict(l=10, r=10, t=40, b=10)), use_container_width=True)
+        with tab2:
+            st.plotly_chart(chart_data.figura_lineas(riesgo['sharpe_movil'][columnas], titulo='Ratio de Sharpe Móvil', estilos=estilos,
+                                                     margin=dict(l=10, r=10, t=40, b=10)), use_container_width=True)
+        with tab3:
+            fig = chart_data.figura_lineas(riesgo['subacuatica'][columnas], titulo='Distancia al Máximo Previo', estilos=estilos,
+                                           yaxis_tickformat='.0%', margin=dict(l=10, r=10, t=40, b=10))
+            fig.update_traces(fill='tozeroy', selector=dict(name=risk_analytics.PORTAFOLIO))
+            st.plotly_chart(fig, use_container_width=True)
+    if riesgo['episodios'] is not None and not riesgo['episodios'].empty:
+        st.write("**Peores Episodios de Drawdown del Portafolio:**")
+        st.dataframe(riesgo['episodios'].style.format({'Profundidad': "{:.2%}", 'Inicio': "{:%Y-%m-%d}", 'Valle': "{:%Y-%m-%d}"})
+                     .format("{:%Y-%m-%d}", subset=['Recuperación'], na_rep="En curso"), hide_index=True, use_container_width=True)
+    with st.expander("Tabla de riesgo por activo"):
+        porcentajes = [c for c in riesgo['resumen'].columns if not c.startswith(('Sharpe', 'Duración', 'Episodios'))]
+        st.dataframe(riesgo['resumen'].style.format("{:.2%}", subset=porcentajes).format("{:.2f}", subset=['Sharpe Anual'])
+                     .format("{:,.0f}", subset=['Duración Máx. DD (barras)', 'Duración Actual DD (barras)', 'Episodios DD']), use_container_width=True)
+
+def display_walk_forward_analysis(close_prices, opt_results):
+    st.subheader("🧭 Acto III: La Prueba de Fuego (Walk-Forward Fuera de Muestra)")
+    with st.spinner("Re-optimizando el portafolio ventana a ventana... Esto puede tardar unos segundos..."):
+        close_prices = close_prices.dropna()
+        with profiling.etapa("Walk-forward", filas=len(close_prices)):
+            resultado = walk_forward.run_walk_forward(close_prices, opt_results['risk_free_rate_decimal'], opt_results['intervalo'],
+                                                      metodo_covarianza=opt_results.get('metodo_covarianza', 'ledoit_wolf'))
+    stats = resultado['stats'].iloc[:, 0]
+    st.caption(f"El portafolio se re-optimiza al inicio de cada mes usando solo las {resultado['barras_estimacion']} barras anteriores y se mantiene hasta el mes siguiente ({len(resultado['pesos'])} optimizaciones).")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Retorno Total [%]", f"{stats['total_return'] * 100:.2f}%")
+    col2.metric("Volatilidad Anual [%]", f"{stats['monthly_vol'] * 100:.2f}%")
+    col3.metric("Max. Drawdown [%]", f"{stats['max_drawdown'] * 100:.2f}%", delta_color="inverse")
+    col4.metric("Ratio de Sharpe Anual", f"{stats['monthly_sharpe']:.2f}")
+    with profiling.etapa("Gráfico walk-forward", tipo='render'):
+        fig = chart_data.figura_lineas(resultado['equity'], titulo='Capital Fuera de Muestra (Walk-Forward)', yaxis_title='Capital', xaxis_title='Fecha',
+                                       showlegend=False, margin=dict(l=10, r=10, t=40, b=10))
+        st.plotly_chart(fig, use_container_width=True)
+    st.info("A diferencia del Acto II, aquí los pesos nunca se calculan con datos del período que se está evaluando, por lo que el resultado es una estimación más honesta del rendimiento futuro.")
 
 # --- SECCIÓN 3: FUNCIÓN PRINCIPAL DE VISUALIZACIÓN ---
-def display_page(opt_results):
+def display_page(opt_results, motor='vectorizado', walk_forward_activo=False):
     st.header("Análisis y Backtesting de Estrategia")
     weights = opt_results['weights']
     tickers = opt_results['valid_tickers']
-    all_prices = opt_results['all_prices']
+    close_prices = session_prices.obtener(opt_results['precios'])
     
-    display_sector_analysis(weights, tickers)
+    with profiling.etapa("Análisis sectorial", filas=len(tickers)):
+        display_sector_analysis(weights, tickers, opt_results.get('sectors'))
     st.markdown("---")
     
+    equity = None
     try:
-        display_backtesting_analysis(all_prices, weights)
+        equity = display_backtesting_analysis(close_prices, weights, motor)
     except Exception as e:
         st.error("🔴 Ocurrió un error durante la simulación de backtesting.")
         st.warning("Esto puede suceder si el período de tiempo es muy corto o si no hay suficientes datos históricos para los activos seleccionados.")
-        st.code(f"Detalle del error: {e}")
\ No newline at end of file
+        st.code(f"Detalle del error: {e}")
+
+    if equity is not None:
+        st.markdown("---")
+        try:
+            display_risk_analysis(close_prices, equity, weights, opt_results)
+        except Exception as e:
+            st.error("🔴 Ocurrió un error durante el análisis de riesgo.")
+            st.code(f"Detalle del error: {e}")
+
+    if walk_forward_activo:
+        st.markdown("---")
+        try:
+            display_walk_forward_analysis(close_prices, opt_results)
+        except Exception as e:
+            st.error("🔴 Ocurrió un error durante la validación walk-forward.")
+            st.code(f"Detalle del error: {e}")
\ No newline at end of file
@@ -3,9 +3,11 @@
 # --- SECCIÓN 0: IMPORTACIONES ---
 import streamlit as st
 import pandas as pd
-import pandas_ta as ta
-import plotly.graph_objects as go
-import numpy as np
+
+import indicators
+import price_store
+import chart_data
+import profiling
 
 # --- SECCIÓN 1: LÓGICA DE INTERPRETACIÓN DE IA ---
 def interpretar_indicadores(rsi, sma_50, sma_200, precio_actual):
@@ -30,46 +32,49 @@ def interpretar_indicadores(rsi, sma_50, sma_200, precio_actual):
     return resumen, veredicto
 
 # --- SECCIÓN 2: FUNCIÓN PRINCIPAL DE VISUALIZACIÓN ---
-def display_page(weights_df, prices_df, ticker_names):
+def display_page(weights_df, prices_df, ticker_names, intervalo=None, periodo=None):
     st.header("Análisis Técnico de Punto de Entrada")
     st.info("Este módulo analiza las acciones seleccionadas por el optimizador para evaluar si el **momento actual** es bueno para la compra.")
     acciones_a_analizar = weights_df[weights_df['Peso'] > 0].index
+    if isinstance(prices_df, pd.Series): prices_df = prices_df.to_frame(name=acciones_a_analizar[0] if len(acciones_a_analizar) else 'Close')
+    precios = prices_df.reindex(columns=[t for t in acciones_a_analizar if t in prices_df.columns])
+    # El momento de entrada se evalúa con el almacén de precios, que solo descarga las barras nuevas, y no con la copia
+    # congelada al optimizar; si el almacén falla se usa esa copia.
+    if periodo is not None and intervalo is not None and len(precios.columns):
+        try:
+            with profiling.etapa("Precios actualizados", tipo='disco', filas=len(precios.columns)):
+                recientes = price_store.get_prices(list(precios.columns), periodo, intervalo)['Close']
+            if isinstance(recientes, pd.Series): recientes = recientes.to_frame(name=precios.columns[0])
+            precios = recientes.reindex(columns=precios.columns)
+        except Exception: pass
+    # El veredicto sale del estado incremental: con una barra nueva solo se actualiza esa barra.
+    with profiling.etapa("Estado incremental de indicadores", filas=len(precios.columns)):
+        ultimos = indicators.update_states(precios, clave=intervalo)
     for ticker in acciones_a_analizar:
         nombre_empresa = ticker_names.get(ticker, ticker)
         with st.expander(f"**Análisis para {nombre_empresa} ({ticker})**"):
-            df = pd.DataFrame(prices_df[ticker])
-            df.rename(columns={ticker: 'Close'}, inplace=True)
-            df.ta.rsi(length=14, append=True)
-            df.ta.sma(length=50, append=True)
-            df.ta.sma(length=200, append=True)
-            if df.empty:
+            if ticker not in precios.columns or precios[ticker].empty:
                 st.warning("No hay datos históricos disponibles para este ticker.")
                 continue
-            
-            ultimo_rsi_series = df.get('RSI_14')
-            ultimo_sma50_series = df.get('SMA_50')
-            ultimo_sma200_series = df.get('SMA_200')
-            
-            ultimo_rsi = ultimo_rsi_series.iloc[-1] if ultimo_rsi_series is not None and not ultimo_rsi_series.empty else np.nan
-            ultimo_sma50 = ultimo_sma50_series.iloc[-1] if ultimo_sma50_series is not None and not ultimo_sma50_series.empty else np.nan
-            ultimo_sma200 = ultimo_sma200_series.iloc[-1] if ultimo_sma200_series is not None and not ultimo_sma200_series.empty else np.nan
-            ultimo_precio = df['Close'].iloc[-1]
+            ultimo_rsi, ultimo_sma50, ultimo_sma200, ultimo_precio = ultimos.loc[ticker, ['RSI_14', 'SMA_50', 'SMA_200', 'Close']]
             
             resumen, veredicto = interpretar_indicadores(ultimo_rsi, ultimo_sma50, ultimo_sma200, ultimo_precio)
             st.markdown(f"##### {resumen}")
             st.markdown(veredicto)
             
             st.write("**Gráfico de Precios y Tendencia:**")
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(x=df.index, y=df['Close'], mode='lines', name='Precio de Cierre', line=dict(color='skyblue', width=2)))
-            if ultimo_sma50_series is not None:
-                fig.add_trace(go.Scatter(x=df.index, y=df['SMA_50'], mode='lines', name='SMA 50 Días', line=dict(color='orange', width=1.5)))
-            if ultimo_sma200_series is not None:
-                fig.add_trace(go.Scatter(x=df.index, y=df['SMA_200'], mode='lines', name='SMA 200 Días', line=dict(color='red', width=1.5)))
-            fig.update_layout(
-                title=f'Análisis de Tendencia para {nombre_empresa}',
-                yaxis_title='Precio',
-                xaxis_title='Fecha',
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-            )
-            st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+            # Cada traza se reduce a un número fijo de puntos (LTTB): el gráfico pesa lo mismo con 1 año que con 'max'.
+            estilos = {'Close': dict(color='skyblue', width=2), 'SMA_50': dict(color='orange', width=1.5), 'SMA_200': dict(color='red', width=1.5)}
+            nombres = {'Close': 'Precio de Cierre', 'SMA_50': 'SMA 50 Días', 'SMA_200': 'SMA 200 Días'}
+            # El gráfico solo dibuja las medias: se calculan para este ticker, sin RSI ni el resto de columnas.
+            with profiling.etapa(f"Gráfico {ticker}", tipo='render', filas=len(precios)):
+                serie = precios[[ticker]]
+                df = pd.DataFrame({'Close': serie[ticker], 'SMA_50': indicators.sma(serie, 50)[ticker], 'SMA_200': indicators.sma(serie, 200)[ticker]})
+                fig = chart_data.figura_lineas(df[['Close', 'SMA_50', 'SMA_200']], estilos=estilos, nombres=nombres)
+                fig.update_layout(
+                    title=f'Análisis de Tendencia para {nombre_empresa}',
+                    yaxis_title='Precio',
+                    xaxis_title='Fecha',
+                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+                )
+                st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
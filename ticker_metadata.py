@@ -0,0 +1,39 @@
+# ticker_metadata.py (Validación Concurrente de Tickers y Metadatos)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+from concurrent.futures import ThreadPoolExecutor
+
+import data_providers
+import fundamentals_store
+import profiling
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+# Límite de consultas simultáneas al proveedor de datos para no saturar la API.
+MAX_WORKERS = 8
+
+# --- SECCIÓN 2: CONSULTA POR TICKER ---
+def _consultar_ticker(ticker):
+    # El `info` sale del almacén de snapshots: los tickers ya conocidos se validan sin red y los nuevos quedan guardados.
+    info = fundamentals_store.get_info(ticker, campos=('longName', 'sector'))
+    if info.get('longName') is None and data_providers.get_provider().history(ticker, "1d").empty: raise ValueError("Inválido")
+    return info
+
+# --- SECCIÓN 3: API PÚBLICA ---
+def fetch_metadata(tickers, max_workers=MAX_WORKERS):
+    # Valida todos los tickers en paralelo y reúne en una sola pasada el nombre, el sector y el `info` completo.
+    tickers = list(dict.fromkeys(t for t in tickers if t))
+    resultado = {'valid_tickers': [], 'invalid_tickers': [], 'ticker_names': {}, 'sectors': {}, 'info': {}}
+    if not tickers: return resultado
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tickers))) as pool:
+        consultar = profiling.propagar(_consultar_ticker)
+        futuros = {ticker: pool.submit(consultar, ticker) for ticker in tickers}
+    for ticker in tickers:
+        try:
+            info = futuros[ticker].result()
+        except Exception:
+            resultado['invalid_tickers'].append(ticker); continue
+        resultado['valid_tickers'].append(ticker)
+        resultado['ticker_names'][ticker] = info.get('longName', ticker)
+        resultado['sectors'][ticker] = info.get('sector', 'Desconocido')
+        resultado['info'][ticker] = info
+    return resultado
@@ -0,0 +1,105 @@
+# walk_forward.py (Optimización y Backtesting Walk-Forward Fuera de Muestra en un Pool de Procesos)
+
+# --- SECCIÓN 0: IMPORTACIONES ---
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+import optimization
+import backtest_engine
+import incremental_estimators
+
+# --- SECCIÓN 1: CONFIGURACIÓN ---
+# Ventana de estimación en años; se mide en barras según la frecuencia de los datos y nunca baja del mínimo del optimizador.
+ANIOS_ESTIMACION = 2
+BARRAS_POR_ANIO = {'1d': 252, '1mo': 12}
+MAX_VENTANAS_CACHEADAS = 2048
+
+# Pesos por ventana ya optimizada: (huella de la ventana, tasa, método) -> pesos. Reutilizados entre ejecuciones.
+_cache_ventanas = OrderedDict()
+_lock = threading.Lock()
+
+# --- SECCIÓN 2: VENTANAS ---
+def calcular_ventanas(index, barras_estimacion, paso='M'):
+    # Una ventana por período (mes por defecto): se estima con las `barras_estimacion` barras previas al primer día
+    # del período y se invierte fuera de muestra hasta el primer día del período siguiente.
+    periodos = index.to_period(paso).asi8
+    cortes = np.flatnonzero(np.r_[True, periodos[1:] != periodos[:-1]])
+    return [(int(c - barras_estimacion), int(c)) for c in cortes if c >= barras_estimacion]
+
+def huellas_ventanas(close_prices, ventanas):
+    # Huella de cada ventana a partir de su contenido (precios y fechas), no de su posición: al llegar una barra nueva o
+    # desplazarse el inicio del período, las ventanas que no cambian conservan su clave y su optimización cacheada.
+    filas = pd.util.hash_pandas_object(close_prices, index=True).to_numpy()
+    columnas = repr(list(close_prices.columns)).encode()
+    return [hashlib.sha1(columnas + filas[inicio:fin].tobytes()).hexdigest() for inicio, fin in ventanas]
+
+# --- SECCIÓN 3: TRABAJO POR VENTANA (PROCESOS) ---
+_precios_compartidos = None
+
+def _inicializar_worker(precios):
+    # Los precios se envían una sola vez a cada proceso en lugar de con cada ventana.
+    global _precios_compartidos
+    _precios_compartidos = precios
+
+def _pesos_ventana(precios, inicio, fin, risk_free_rate, metodo_covarianza, mu=None, S=None):
+    ventana = precios.iloc[inicio:fin]
+    try:
+        return optimization.calcular_optimizacion(ventana, risk_free_rate, metodo_covarianza, mu=mu, S=S)['weights']
+    except Exception:
+        # Si ningún activo supera la tasa libre de riesgo (o el solver falla) se usa el portafolio de mínima volatilidad.
+        from pypfopt import EfficientFrontier, expected_returns
+        if mu is None: mu = expected_returns.ema_historical_return(ventana)
+        if S is None: S = optimization.matriz_covarianza(ventana, metodo_covarianza)
+        ef = EfficientFrontier(mu, S)
+        ef.min_volatility()
+        return dict(ef.clean_weights())
+
+def _pesos_bloque(precios, ventanas, risk_free_rate, metodo_covarianza):
+    # Ventanas consecutivas de un mismo bloque: mu y S se actualizan sumando las barras que entran y restando las que
+    # salen (incremental_estimators) en lugar de recalcularse sobre toda la ventana. El modelo factorial no tiene versión
+    # incremental y se estima ventana a ventana.
+    if metodo_covarianza not in incremental_estimators.METODOS_INCREMENTALES:
+        return [_pesos_ventana(precios, inicio, fin, risk_free_rate, metodo_covarianza) for inicio, fin in ventanas]
+    estimaciones = incremental_estimators.estimar_ventanas(precios, ventanas, metodo_covarianza)
+    return [_pesos_ventana(precios, inicio, fin, risk_free_rate, metodo_covarianza, mu, S) for (inicio, fin), (mu, S) in zip(ventanas, estimaciones)]
+
+def _optimizar_bloque(args):
+    ventanas, risk_free_rate, metodo_covarianza = args
+    return _pesos_bloque(_precios_compartidos, ventanas, risk_free_rate, metodo_covarianza)
+
+# --- SECCIÓN 4: API PÚBLICA ---
+def run_walk_forward(close_prices, risk_free_rate, intervalo='1d', anios_estimacion=ANIOS_ESTIMACION, metodo_covarianza='ledoit_wolf',
+                     n_workers=None, initial_capital=10000.0):
+    close_prices = close_prices.dropna()
+    barras = max(optimization.MIN_OBSERVACIONES, int(anios_estimacion * BARRAS_POR_ANIO.get(intervalo, 252)))
+    ventanas = calcular_ventanas(close_prices.index, barras)
+    if not ventanas: raise ValueError("Histórico insuficiente para una ventana de estimación. Intente con un período más largo.")
+    claves = [(huella, round(float(risk_free_rate), 10), metodo_covarianza) for huella in huellas_ventanas(close_prices, ventanas)]
+    with _lock:
+        pesos = {clave: _cache_ventanas[clave] for clave in claves if clave in _cache_ventanas}
+    pendientes = [clave for clave in claves if clave not in pesos]
+    ventanas_pendientes = [ventana for clave, ventana in zip(claves, ventanas) if clave not in pesos]
+    n_workers = n_workers or min(os.cpu_count() or 1, len(ventanas_pendientes))
+    if n_workers > 1 and len(ventanas_pendientes) > 1:
+        # Cada proceso recorre un bloque de ventanas contiguas: solo la primera de cada bloque se estima desde cero.
+        bloques = [b for b in np.array_split(np.arange(len(ventanas_pendientes)), min(len(ventanas_pendientes), 2 * n_workers)) if len(b)]
+        tareas = [([ventanas_pendientes[i] for i in bloque], risk_free_rate, metodo_covarianza) for bloque in bloques]
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_inicializar_worker, initargs=(close_prices,)) as pool:
+            resultados = [w for pesos_bloque in pool.map(_optimizar_bloque, tareas) for w in pesos_bloque]
+    else:
+        resultados = _pesos_bloque(close_prices, ventanas_pendientes, risk_free_rate, metodo_covarianza)
+    with _lock:
+        for clave, w in zip(pendientes, resultados):
+            pesos[clave] = w; _cache_ventanas[clave] = w
+        while len(_cache_ventanas) > MAX_VENTANAS_CACHEADAS: _cache_ventanas.popitem(last=False)
+    fechas = close_prices.index[[fin for _, fin in ventanas]]
+    pesos_rebalanceo = pd.DataFrame([pesos[clave] for clave in claves], index=fechas).fillna(0.0)
+    resultado = backtest_engine.run_backtest_dinamico(close_prices, pesos_rebalanceo, initial_capital)
+    resultado['pesos'] = pesos_rebalanceo
+    resultado['barras_estimacion'] = barras
+    return resultado